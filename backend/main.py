@@ -15,8 +15,23 @@ import traceback
 import os
 from fastapi.openapi.utils import get_openapi
 from fastapi.routing import APIRoute
+from typing import Any, Dict, Optional
 from router.dashboard import router as dashboadrd_router
 from router.avatar import router as avatar_router
+from router.admin import router as admin_router
+from utils.db import init_db, close_db
+from services.log import audit_log_writer
+from utils.indexes import start_index_build
+from utils.password_hash import start_password_pool, stop_password_pool
+from utils.thumbnails import start_thumbnail_pool, stop_thumbnail_pool
+from utils.db_profiler import DB_PROFILING, query_profiler
+from utils.scheduler import MAINTENANCE_ENABLED, maintenance_scheduler
+from services.token import TOKEN_CLEANUP_INTERVAL_SECONDS, cleanup_expired_tokens, cleanup_refresh_families
+from services.avatar import AVATAR_MAX_BYTES, AVATAR_SWEEP_INTERVAL_SECONDS, sweep_avatar_blobs
+from services.purchase_item import PURCHASE_SEARCH_BACKFILL_SECONDS, purchase_item_service
+from services.purchase_spend import PURCHASE_SPEND_RECONCILE_SECONDS, rebuild_spend_rollups
+from services.purchase_budget import PURCHASE_BUDGET_RECONCILE_SECONDS, rebuild_budget_ledger
+from services.dashboard import DASHBOARD_STATS_REBUILD_SECONDS, refresh_dashboard_stats
 
 
 
@@ -30,7 +45,7 @@ app = FastAPI(
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers=exc.headers)
 
 @app.exception_handler(Exception)
 async def unhandled_exception_handler(request: Request, exc: Exception):
@@ -38,6 +53,41 @@ async def unhandled_exception_handler(request: Request, exc: Exception):
     print(tb)
     return JSONResponse(status_code=500, content={"detail": "Internal Server Error"})
 
+# Room for the multipart boundaries and part headers around the avatar itself
+AVATAR_MULTIPART_OVERHEAD = 64 * 1024
+
+@app.middleware("http")
+async def avatar_upload_size_guard(request: Request, call_next):
+    """Refuse oversized avatar uploads from Content-Length alone, before the body is read"""
+    if request.method == "POST" and request.url.path.startswith("/avatar"):
+        length = request.headers.get("content-length", "")
+        if length.isdigit() and int(length) > AVATAR_MAX_BYTES + AVATAR_MULTIPART_OVERHEAD:
+            return JSONResponse(status_code=413, content={"detail": f"Avatar exceeds the {AVATAR_MAX_BYTES} byte limit"})
+    return await call_next(request)
+
+if DB_PROFILING:
+    _route_paths: Dict[Any, str] = {}
+
+    def _route_template(request: Request) -> Optional[str]:
+        """Path template of the route that served the request, from the endpoint the router matched"""
+        endpoint = request.scope.get("endpoint")
+        if endpoint is None:
+            return None
+        if not _route_paths:
+            for route in app.routes:
+                if isinstance(route, APIRoute):
+                    _route_paths.setdefault(route.endpoint, route.path)
+        path = _route_paths.get(endpoint)
+        return f"{request.method} {path}" if path else None
+
+    @app.middleware("http")
+    async def db_profiling_middleware(request: Request, call_next):
+        stats, token = query_profiler.begin_request()
+        try:
+            return await call_next(request)
+        finally:
+            query_profiler.end_request(stats, token, _route_template(request))
+
 
 app.include_router(auth_router)
 app.include_router(user_router)
@@ -47,6 +97,7 @@ app.include_router(purchase_item_router)
 app.include_router(checklist_router)
 app.include_router(dashboadrd_router)
 app.include_router(avatar_router)
+app.include_router(admin_router)
 
 class TestModel(BaseModel):
     name: str
@@ -71,22 +122,22 @@ def test_model(data: TestModel):
 async def create_default_admins():
     """Create default admin accounts on startup"""
     try:
-        from utils.db import get_db
-        from utils.password_hash import hash_password
+        from utils.db import get_async_db
+        from utils.password_hash import hash_password_async
         from datetime import datetime
         from bson import ObjectId
         
-        db = get_db()
+        db = get_async_db()
         admins = db["admins"]
         
-        if admins.count_documents({}) > 0:
+        if await admins.count_documents({}) > 0:
             print("✅ Admins already exist, skipping default admin creation")
             return
         admin_data = {
             "_id": ObjectId(),
             "employee_id": "00001",
             "full_name": "مدیر اصلی سیستم",
-            "password_hash": hash_password("admin123!"),
+            "password_hash": await hash_password_async("admin123!"),
             "role": "admin1",
             "status": "active",
             "phone": "09123456789",
@@ -96,7 +147,7 @@ async def create_default_admins():
             "updated_at": datetime.now()
         }
         
-        admins.insert_one(admin_data)
+        await admins.insert_one(admin_data)
         print("✅ Default super admin created successfully!")
         print("   Employee ID: 00001")
         print("   Password: admin123!")
@@ -110,7 +161,21 @@ async def startup_event():
     """Application startup event"""
     print("🚀 Starting Employee Management System...")
     
+    init_db()
+    await audit_log_writer.start()
+    await start_password_pool()
+    start_thumbnail_pool()
+    app.state.index_build = start_index_build()
     await create_default_admins()
+    maintenance_scheduler.add_job("token_cleanup", TOKEN_CLEANUP_INTERVAL_SECONDS, cleanup_expired_tokens, initial_delay=60)
+    maintenance_scheduler.add_job("refresh_family_cleanup", TOKEN_CLEANUP_INTERVAL_SECONDS, cleanup_refresh_families, initial_delay=90)
+    maintenance_scheduler.add_job("avatar_blob_sweep", AVATAR_SWEEP_INTERVAL_SECONDS, sweep_avatar_blobs, initial_delay=120)
+    maintenance_scheduler.add_job("purchase_search_backfill", PURCHASE_SEARCH_BACKFILL_SECONDS, purchase_item_service.backfill_search_keys, initial_delay=30)
+    maintenance_scheduler.add_job("purchase_spend_reconcile", PURCHASE_SPEND_RECONCILE_SECONDS, rebuild_spend_rollups, initial_delay=180)
+    maintenance_scheduler.add_job("purchase_budget_reconcile", PURCHASE_BUDGET_RECONCILE_SECONDS, rebuild_budget_ledger, initial_delay=210)
+    maintenance_scheduler.add_job("dashboard_stats_rebuild", DASHBOARD_STATS_REBUILD_SECONDS, refresh_dashboard_stats, initial_delay=240)
+    if MAINTENANCE_ENABLED:
+        await maintenance_scheduler.start()
     
     if os.getenv("DEBUG_OPENAPI", "1") != "1":
         return
@@ -135,3 +200,13 @@ async def startup_event():
             print("  endpoint=", endpoint.__module__, getattr(endpoint, "__name__", str(endpoint)))
             print("  location=", filename, ":", lineno)
             print("  detail=", repr(exc))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Application shutdown event"""
+    await maintenance_scheduler.stop()
+    await audit_log_writer.stop()
+    stop_password_pool()
+    stop_thumbnail_pool()
+    close_db()
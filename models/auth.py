@@ -6,6 +6,9 @@ class LoginRequest(BaseModel):
     employee_id: str
     password: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
 class AdminBootstrapRequest(BaseModel):
     employee_id: str
     password: str
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, ConfigDict
 from bson import ObjectId
+from typing import Dict, Optional
 
 
 class avatarCreat(BaseModel):
@@ -20,3 +21,5 @@ class avatarOut(BaseModel):
     id: str = Field(..., description="avatar_id")
     user_id: str
     avatar_url: str = Field(..., description="avatar url address")
+    content_hash: Optional[str] = Field(None, description="sha256 of the image, addresses /avatar/blobs/{content_hash}")
+    thumbnails: Dict[str, str] = Field(default_factory=dict, description="thumbnail path by size in pixels")
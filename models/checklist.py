@@ -53,6 +53,7 @@ class ChecklistUpdate(BaseModel):
     role: Optional[EmployeeRole] = None
     role_payload: Optional[Dict[str, Any]] = None
     updated_at: datetime = Field(default_factory=datetime.now)
+    version: Optional[int] = Field(None, ge=0, description="Expected version, rejects the update with 409 if the checklist changed")
 
 
 class ChecklistOut(BaseModel):
@@ -72,4 +73,5 @@ class ChecklistOut(BaseModel):
     role_payload: Optional[Dict[str, Any]] = None
     created_by: str = Field(default_factory=lambda: str(ObjectId()))
     created_at: datetime
-    updated_at: datetime
\ No newline at end of file
+    updated_at: datetime
+    version: int = 0
@@ -11,6 +11,7 @@ class DashboardStats(BaseModel):
     total_leave_request:int
     leave_request_by_status:dict
     user_id : Optional[str]=None
+    avatar_url : Optional[str]=None
 
 class config:
     json_encoders={ObjectId:str}
@@ -35,6 +35,7 @@ class LeaveRequestUpdate(BaseModel):
     start_date: Optional[date] = None
     end_date: Optional[date] = None
     reason: Optional[str] = Field(None, max_length=300)
+    version: Optional[int] = Field(None, ge=0, description="Expected version, rejects the update with 409 if the request changed")
 
 
 class LeaveRequestOut(BaseModel):
@@ -54,4 +55,5 @@ class LeaveRequestOut(BaseModel):
     approval_phase2_at: Optional[datetime] = None
     status: LeaveStatus
     created_at: datetime
-    updated_at: Optional[datetime] = None
\ No newline at end of file
+    updated_at: Optional[datetime] = None
+    version: int = 0
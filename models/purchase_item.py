@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, ConfigDict, validator
 from datetime import datetime
-from typing import Optional, Literal, List
+from typing import Optional, Literal, List, Dict
 from bson import ObjectId
 from enum import Enum
 
@@ -12,6 +12,11 @@ class PyObjectId(ObjectId):
         return field_schema
 
 
+NameMatchMode = Literal["text", "exact", "prefix"]
+SpendDimension = Literal["budget_code", "supplier", "category"]
+SpendGranularity = Literal["day", "week", "month"]
+
+
 class PriorityLevel(str, Enum):
     LOW = "low"
     MEDIUM = "medium"
@@ -97,6 +102,7 @@ class PurchaseItemUpdate(BaseModel):
     
     required_date: Optional[datetime] = Field(None, description="Required date")
     updated_at: datetime = Field(default_factory=datetime.now, description="Updated at")
+    version: Optional[int] = Field(None, ge=0, description="Expected version, rejects the update with 409 if the item changed")
     
     @validator('name')
     def validate_name(cls, v):
@@ -138,6 +144,7 @@ class PurchaseItemOut(BaseModel):
     created_by: str = Field(..., description="Created by")
     created_at: datetime = Field(..., description="Created at")
     updated_at: datetime = Field(..., description="Updated at")
+    version: int = Field(0, description="Version")
     
     @validator('total_price', pre=True, always=True)
     def calculate_total_price(cls, v, values):
@@ -157,6 +164,7 @@ class PurchaseItemFilter(BaseModel):
     )
     
     name: Optional[str] = Field(None, description="Search in name")
+    name_match: NameMatchMode = Field("text", description="How name is matched: text, exact or prefix")
     category: Optional[PurchaseCategory] = Field(None, description="Filter by category")
     priority: Optional[PriorityLevel] = Field(None, description="Filter by priority")
     status: Optional[PurchaseStatus] = Field(None, description="Filter by status")
@@ -174,6 +182,34 @@ class PurchaseItemFilter(BaseModel):
     max_price: Optional[float] = Field(None, ge=0, description="Maximum price")
 
 
+class PurchaseItemFacetedResult(BaseModel):
+    items: List[PurchaseItemOut] = Field(..., description="Page of matching items")
+    total: int = Field(..., description="Number of items matching the filter")
+    facets: Dict[str, Dict[str, int]] = Field(..., description="Counts by category, priority and status over the filtered set")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page")
+
+
+class SpendBucket(BaseModel):
+    period: datetime = Field(..., description="Start of the day, week or month")
+    value: str = Field(..., description="Budget code, supplier or category; empty when unassigned")
+    amount: float = Field(..., description="Sum of total_price")
+    count: int = Field(..., description="Number of items")
+    by_status: Dict[str, float] = Field(default_factory=dict, description="Amount by item status")
+
+
+class BudgetLedgerOut(BaseModel):
+    budget_code: str = Field(..., description="Budget code")
+    limit: Optional[float] = Field(None, description="Spending limit; no limit when empty")
+    committed: float = Field(..., description="Total price of pending and approved items")
+    spent: float = Field(..., description="Total price of purchased and delivered items")
+    available: Optional[float] = Field(None, description="Limit left after committed and spent")
+    updated_at: Optional[datetime] = Field(None, description="Last ledger change")
+
+
+class BudgetLimitUpdate(BaseModel):
+    limit: Optional[float] = Field(..., ge=0, description="New limit, or null to remove it")
+
+
 class PurchaseItemSummary(BaseModel):
     model_config = ConfigDict(
         arbitrary_types_allowed=True,
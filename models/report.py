@@ -28,6 +28,7 @@ class report_update(BaseModel):
         json_encoders={ObjectId: str}
     )
     content: Optional[str] = Field(None, min_length=3, max_length=2000)
+    version: Optional[int] = Field(None, ge=0, description="Expected version, rejects the update with 409 if the report changed")
 
 
 class report_out(BaseModel):
@@ -42,4 +43,5 @@ class report_out(BaseModel):
     status: ReportStatus
     created_at: datetime
     updated_at: Optional[datetime] = None
+    version: int = 0
     
\ No newline at end of file
@@ -71,6 +71,7 @@ class employee_update(BaseModel):
     role: Optional[EmployeeRole] = None
     status: Optional[EmployeeStatus] = None
     password: Optional[str] = Field(None, min_length=6)
+    version: Optional[int] = Field(None, ge=0, description="Expected version, rejects the update with 409 if the user changed")
 
 
 class employee_out(BaseModel):
@@ -102,6 +103,7 @@ class employee_out_with_password(BaseModel):
     password_hash: str
     created_at: datetime
     updated_at: datetime
+    version: int = 0
 
 
 class employee_out_with_token(BaseModel):
@@ -0,0 +1,90 @@
+from fastapi import APIRouter, Depends, HTTPException, Path, status
+
+from services.auth import require_roles, token_cache
+from services.dashboard import avatar_url_cache as dashboard_avatar_cache, stats_cache as dashboard_stats_cache
+from services.token import bump_token_generation, generation_cache
+from services.principal import principal_cache
+from utils.db_profiler import query_profiler
+from utils.password_hash import password_pool_stats
+from utils.scheduler import maintenance_scheduler
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.get("/db-stats")
+async def get_db_stats(
+    current_user: dict = Depends(require_roles("admin1", "admin2")),
+):
+    """Per-route database command counts, latency and bytes since startup or the last reset"""
+    try:
+        return query_profiler.snapshot()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e),
+        )
+
+@router.delete("/db-stats", status_code=status.HTTP_204_NO_CONTENT)
+async def reset_db_stats(
+    current_user: dict = Depends(require_roles("admin1", "admin2")),
+):
+    query_profiler.reset()
+
+@router.get("/cache-stats")
+async def get_cache_stats(
+    current_user: dict = Depends(require_roles("admin1", "admin2")),
+):
+    """Hit and miss counters of the in-process caches"""
+    return {
+        "jwt": token_cache.stats(),
+        "dashboard": dashboard_stats_cache.stats(),
+        "dashboard_avatar": dashboard_avatar_cache.stats(),
+        "token_generation": generation_cache.stats(),
+        "principal": principal_cache.stats(),
+    }
+
+@router.get("/password-stats")
+async def get_password_stats(
+    current_user: dict = Depends(require_roles("admin1", "admin2")),
+):
+    """Password pool saturation, rejected operations, bcrypt cost and latency histograms"""
+    return password_pool_stats()
+
+@router.get("/maintenance")
+async def get_maintenance_stats(
+    current_user: dict = Depends(require_roles("admin1", "admin2")),
+):
+    """Interval, duration and rows touched of every background maintenance job"""
+    return maintenance_scheduler.stats()
+
+@router.post("/maintenance/{job_name}/run")
+async def run_maintenance_job(
+    job_name: str = Path(...),
+    current_user: dict = Depends(require_roles("admin1", "admin2")),
+):
+    """Run one maintenance job immediately and return its stats; 409 while another worker runs it"""
+    job = maintenance_scheduler.jobs.get(job_name)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Maintenance job not found")
+    await job.run()
+    if job.last_skipped:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Maintenance job is running on another worker")
+    return {"job": job_name, **job.stats()}
+
+@router.post("/users/{user_id}/sign-out")
+async def force_sign_out(
+    user_id: str = Path(...),
+    current_user: dict = Depends(require_roles("admin1", "admin2")),
+):
+    """Revoke every token issued to the user"""
+    try:
+        generation = await bump_token_generation(user_id)
+        return {"message": "User signed out", "user_id": user_id, "generation": generation}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e),
+        )
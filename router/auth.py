@@ -1,13 +1,14 @@
-from fastapi import APIRouter, HTTPException, status, Body, Depends, Response, Query
+from fastapi import APIRouter, HTTPException, status, Body, Depends, Request, Response, Query
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any
 from utils.error_handler import exception_handler
-from utils.db import get_db
+from utils.db import get_async_db
 from utils.password_hash import verify_password
 from services.auth import get_current_user, require_roles
-from services.token import deactivate_token
-from models.auth import LoginRequest, AdminCreate, AdminOut, AdminBootstrapRequest
-from services.auth import login, create_admin, admin_login, create_bootstrap_admin
+from services.token import deactivate_token, bump_token_generation
+from models.auth import LoginRequest, AdminCreate, AdminOut, AdminBootstrapRequest, RefreshRequest
+from services.auth import login, create_admin, admin_login, create_bootstrap_admin, check_login_rate_limit, refresh_access_token
+from utils.jwt import REFRESH_TOKEN_EXPIRE_DAYS
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -17,23 +18,37 @@ class TokenOut(BaseModel):
     token_type: str = "bearer"
     role: str
     user_id: str
+    refresh_token: Optional[str] = None
+
+
+def _set_refresh_cookie(response: Response, refresh_token: str) -> None:
+    response.set_cookie(
+        key="refresh_token",
+        value=refresh_token,
+        httponly=True,
+        secure=False,
+        samesite="lax",
+        max_age=60*60*24*REFRESH_TOKEN_EXPIRE_DAYS,
+        path="/auth/refresh"
+    )
 
 
 
 @router.post("/login", response_model=TokenOut)
-def login_employee(data: LoginRequest = Body(...), response: Response = None):
+async def login_employee(request: Request, data: LoginRequest = Body(...), response: Response = None):
     """
     Login for employees (non-admin users)
     """
     try:
-        login_data = login(data.employee_id, data.password)
+        await check_login_rate_limit(data.employee_id, request.client.host if request.client else None, "user")
+        login_data = await login(data.employee_id, data.password)
         token = login_data["token"]
         user_id = login_data["user_id"]
         role = login_data["role"]
         
         try:
             from services.token import create_token
-            create_token(user_id, token, expires_in_minutes=30)
+            await create_token(user_id, token, expires_in_minutes=30)
         except Exception as e:
             print(f"Warning: Could not store token in database: {e}")
 
@@ -48,10 +63,11 @@ def login_employee(data: LoginRequest = Body(...), response: Response = None):
                     max_age=60*30
                 )
                 response.headers["Authorization"] = f"Bearer {token}"
+                _set_refresh_cookie(response, login_data["refresh_token"])
             except Exception:
                 pass
 
-        return TokenOut(access_token=token, role=role, user_id=user_id)
+        return TokenOut(access_token=token, role=role, user_id=user_id, refresh_token=login_data["refresh_token"])
     except HTTPException:
         raise
     except Exception as e:
@@ -59,19 +75,20 @@ def login_employee(data: LoginRequest = Body(...), response: Response = None):
 
 
 @router.post("/admin/login", response_model=TokenOut)
-def login_admin(data: LoginRequest = Body(...), response: Response = None):
+async def login_admin(request: Request, data: LoginRequest = Body(...), response: Response = None):
     """
     Login for admins
     """
     try:
-        login_data = admin_login(data.employee_id, data.password)
+        await check_login_rate_limit(data.employee_id, request.client.host if request.client else None, "admin")
+        login_data = await admin_login(data.employee_id, data.password)
         token = login_data["token"]
         user_id = login_data["user_id"]
         role = login_data["role"]
         
         try:
             from services.token import create_token
-            create_token(user_id, token, expires_in_minutes=30)
+            await create_token(user_id, token, expires_in_minutes=30)
         except Exception as e:
             print(f"Warning: Could not store token in database: {e}")
 
@@ -86,10 +103,11 @@ def login_admin(data: LoginRequest = Body(...), response: Response = None):
                     max_age=60*30
                 )
                 response.headers["Authorization"] = f"Bearer {token}"
+                _set_refresh_cookie(response, login_data["refresh_token"])
             except Exception:
                 pass
 
-        return TokenOut(access_token=token, role=role, user_id=user_id)
+        return TokenOut(access_token=token, role=role, user_id=user_id, refresh_token=login_data["refresh_token"])
     except HTTPException:
         raise
     except Exception as e:
@@ -97,12 +115,42 @@ def login_admin(data: LoginRequest = Body(...), response: Response = None):
 
 
 
+@router.post("/refresh", response_model=TokenOut)
+async def refresh(request: Request, response: Response, data: Optional[RefreshRequest] = Body(None)):
+    """
+    Exchange a refresh token for a new access token and a rotated refresh token
+    """
+    try:
+        refresh_token = (data.refresh_token if data else None) or request.cookies.get("refresh_token")
+        if not refresh_token:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing refresh token")
+        refreshed = await refresh_access_token(refresh_token)
+        token = refreshed["token"]
+        response.set_cookie(
+            key="access_token",
+            value=f"Bearer {token}",
+            httponly=True,
+            secure=False,
+            samesite="lax",
+            max_age=60*30
+        )
+        _set_refresh_cookie(response, refreshed["refresh_token"])
+        return TokenOut(access_token=token, role=refreshed["role"], user_id=refreshed["user_id"], refresh_token=refreshed["refresh_token"])
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e) or "Internal Server Error")
+
+
 @router.post("/logout")
-async def logout(current_user: dict = Depends(get_current_user)):
+async def logout(response: Response, current_user: dict = Depends(get_current_user)):
     """
-    Logout from system
+    Logout from system, revoking every token issued to the user
     """
     try:
+        await bump_token_generation(current_user["user_id"])
+        response.delete_cookie("access_token")
+        response.delete_cookie("refresh_token", path="/auth/refresh")
         return {"message": "Logout successful"}
     except HTTPException:
         raise
@@ -112,12 +160,12 @@ async def logout(current_user: dict = Depends(get_current_user)):
 
 
 @router.post("/admin/bootstrap")
-def bootstrap_first_admin(data: AdminBootstrapRequest = Body(...)):
+async def bootstrap_first_admin(data: AdminBootstrapRequest = Body(...)):
     """
     Bootstrap the first admin (only works if no admins exist)
     """
     try:
-        return create_bootstrap_admin(
+        return await create_bootstrap_admin(
             employee_id=data.employee_id,
             password=data.password,
             full_name=data.full_name,
@@ -130,13 +178,13 @@ def bootstrap_first_admin(data: AdminBootstrapRequest = Body(...)):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e) or "Internal Server Error")
 
 @router.post("/admin/create", response_model=AdminOut)
-def create_new_admin(
+async def create_new_admin(
     data: AdminCreate = Body(...),
     current_user: dict = Depends(require_roles("admin1"))
 ):
  
     try:
-        result = create_admin(
+        result = await create_admin(
             employee_id=data.employee_id,
             password=data.password,
             full_name=data.full_name,
@@ -146,9 +194,9 @@ def create_new_admin(
             is_super_admin=data.is_super_admin
         )
         
-        db = get_db()
+        db = get_async_db()
         admins = db["admins"]
-        admin = admins.find_one({"employee_id": data.employee_id})
+        admin = await admins.find_one({"employee_id": data.employee_id})
         
         if admin:
             return AdminOut(
@@ -173,15 +221,15 @@ def create_new_admin(
 
 
 @router.get("/admin/list")
-def list_admins(current_user: dict = Depends(require_roles("admin1", "admin2"))):
+async def list_admins(current_user: dict = Depends(require_roles("admin1", "admin2"))):
     
     
     try:
-        db = get_db()
+        db = get_async_db()
         admins = db["admins"]
         
         admin_list = []
-        for admin in admins.find({}):
+        async for admin in admins.find({}):
             admin_list.append(AdminOut(
                 id=str(admin["_id"]),
                 employee_id=admin["employee_id"],
@@ -205,7 +253,7 @@ def list_admins(current_user: dict = Depends(require_roles("admin1", "admin2")))
 
 
 @router.post("/user/create")
-def create_user_by_admin(
+async def create_user_by_admin(
     user_data: dict = Body(...),
     current_user: dict = Depends(require_roles("admin1", "admin2"))
 ):
@@ -224,7 +272,7 @@ def create_user_by_admin(
             status=user_data.get("status", "active")
         )
         
-        result = create_user(user, current_user, return_token=True)
+        result = await create_user(user, current_user, return_token=True)
         return result
         
     except HTTPException:
@@ -234,14 +282,14 @@ def create_user_by_admin(
 
 
 @router.get("/user/list")
-def list_users(current_user: dict = Depends(require_roles("admin1", "admin2"))):
+async def list_users(current_user: dict = Depends(require_roles("admin1", "admin2"))):
     """
     List all users
     Only admins can view user list
     """
     try:
         from services.user import get_all_users
-        return get_all_users(current_user)
+        return await get_all_users(current_user)
         
     except HTTPException:
         raise
@@ -1,7 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Path, UploadFile, File
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Path, Query, Request, UploadFile, File
+from fastapi.responses import Response
 from models.avatar import avatarOut
-from services.avatar import upload_avatar, get_avatar, delete_avatar, delete_my_avatar as delete_my_avatar_service
+from services.avatar import upload_avatar, get_avatar, get_avatar_blob, pick_rendition, avatar_media_type, delete_avatar, delete_my_avatar as delete_my_avatar_service
 from services.auth import get_current_user
+from utils.static_files import conditional_file_response
+
+AVATAR_CACHE_MAX_AGE = int(os.getenv("AVATAR_CACHE_MAX_AGE", "60"))
+# Blob URLs name their content, so a response never goes stale and shared
+# caches such as reverse proxies may keep it; public also lets them store
+# responses to requests that carried credentials
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
 
 
 router = APIRouter(prefix="/avatar", tags=["avatar"])
@@ -27,7 +37,59 @@ async def get_user_avatar(
 ):
     try:
         resolved_id = str(current_user.get("user_id")) if user_id.lower() in {"me", "string"} else user_id
-        return get_avatar(resolved_id, current_user)
+        return await get_avatar(resolved_id, current_user)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get("/blobs/{content_hash}", response_class=Response)
+async def get_avatar_blob_file(
+    request: Request,
+    content_hash: str = Path(..., pattern="^[0-9a-f]{64}$", description="sha256 of the avatar"),
+    size: Optional[int] = Query(None, ge=1, description="Smallest thumbnail edge in pixels, the original when omitted"),
+    current_user: dict = Depends(get_current_user),
+):
+    """Content-addressed avatar bytes, cacheable forever"""
+    try:
+        blob = await get_avatar_blob(content_hash)
+        path, rendition = pick_rendition(blob["path"], blob.get("thumbnails"), size)
+        return await conditional_file_response(
+            request,
+            path,
+            cache_control=IMMUTABLE_CACHE_CONTROL,
+            media_type=avatar_media_type(path),
+            etag=f"{content_hash}-{rendition}" if rendition else content_hash,
+        )
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get("/{user_id}/file", response_class=Response)
+async def get_user_avatar_file(
+    request: Request,
+    user_id: str = Path(..., description="User ID"),
+    size: Optional[int] = Query(None, ge=1, description="Smallest thumbnail edge in pixels, the original when omitted"),
+    current_user: dict = Depends(get_current_user),
+):
+    """Avatar bytes with a strong ETag, 304 revalidation and byte ranges"""
+    try:
+        resolved_id = str(current_user.get("user_id")) if user_id.lower() in {"me", "string"} else user_id
+        avatar = await get_avatar(resolved_id, current_user)
+        path, rendition = pick_rendition(avatar.avatar_url, avatar.thumbnails, size)
+        etag = None
+        if avatar.content_hash:
+            etag = f"{avatar.content_hash}-{rendition}" if rendition else avatar.content_hash
+        return await conditional_file_response(
+            request,
+            path,
+            cache_control=f"private, max-age={AVATAR_CACHE_MAX_AGE}",
+            media_type=avatar_media_type(path),
+            etag=etag,
+        )
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -42,8 +104,8 @@ async def delete_user_avatar(
     try:
         # If placeholder or 'me', route to dedicated self-delete to avoid permission issues
         if user_id.lower() in {"me", "string"}:
-            return delete_my_avatar_service(current_user)
-        return delete_avatar(user_id, current_user)
+            return await delete_my_avatar_service(current_user)
+        return await delete_avatar(user_id, current_user)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -55,7 +117,7 @@ async def delete_my_avatar_route(
     current_user: dict = Depends(get_current_user),
 ):
     try:
-        return delete_my_avatar_service(current_user)
+        return await delete_my_avatar_service(current_user)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -67,7 +129,7 @@ async def get_my_avatar(
     current_user: dict = Depends(get_current_user),
 ):
     try:
-        return get_avatar(str(current_user.get("user_id")), current_user)
+        return await get_avatar(str(current_user.get("user_id")), current_user)
     except HTTPException as e:
         raise e
     except Exception as e:
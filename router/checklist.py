@@ -1,10 +1,11 @@
 from typing import Optional, List, Dict, Any
-from fastapi import APIRouter, Body, Depends, HTTPException, Query, Path, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Path, Response, status
 from models.checklist import ChecklistCreate, ChecklistOut, ChecklistUpdate
 from services.checklist import create_checklist, update_checklist, get_checklist, delete_checklist
 from services.auth import get_current_user, require_roles
 from models.user import EmployeeRole
 from utils.error_handler import exception_handler
+from utils.pagination import NEXT_CURSOR_HEADER
 
 router = APIRouter(prefix="/checklists", tags=["checklists"])
 
@@ -15,27 +16,33 @@ async def create_new_checklist(
         data: ChecklistCreate = Body(...),
         current_user: dict = Depends(require_roles("manager_women", "manager_men"))
 ):
-    return create_checklist(data, current_user)
+    return await create_checklist(data, current_user)
 
 
 @exception_handler
 @router.get("/", response_model=List[ChecklistOut])
 async def list_checklists(
+        response: Response,
         task_id: Optional[str] = Query(None),
         title: Optional[str] = Query(None),
         description: Optional[str] = Query(None),
         limit: int = Query(20, ge=1, le=100),
-        offset: int = Query(0, ge=0),
+        offset: int = Query(0, ge=0, deprecated=True, description="Use cursor instead"),
+        cursor: Optional[str] = Query(None, description="Cursor returned in the X-Next-Cursor header"),
         current_user: dict = Depends(require_roles("admin1", "admin2", "manager_women", "manager_men"))
 ):
-    return get_checklist(
+    items, next_cursor = await get_checklist(
         task_id=task_id,
         title=title,
         description=description,
         limit=limit,
         offset=offset,
         current_user=current_user,
+        cursor=cursor,
     )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return items
 
 
 @exception_handler
@@ -45,7 +52,7 @@ async def update_existing_checklist(
         update_data: ChecklistUpdate = Body(...),
         current_user: dict = Depends(require_roles("manager_women", "manager_men"))
 ):
-    return update_checklist(checklist_id, update_data, current_user)
+    return await update_checklist(checklist_id, update_data, current_user)
 
 
 @exception_handler
@@ -54,7 +61,7 @@ async def delete_existing_checklist(
         checklist_id: str = Path(..., description="checklist id"),
         current_user: dict = Depends(require_roles("manager_women", "manager_men"))
 ):
-    return delete_checklist(checklist_id, current_user)
+    return await delete_checklist(checklist_id, current_user)
 
 
 @exception_handler
@@ -6,9 +6,9 @@ from services.auth import get_current_user
 router=APIRouter(prefix="/dashboard",tags=["dashboard"])
 
 @router.get("/",response_model=DashboardStats)
-def get_dashboard_endpoint(current_user:dict=Depends(get_current_user)):
+async def get_dashboard_endpoint(current_user:dict=Depends(get_current_user)):
     try:
-        return get_dashboard(current_user)
+        return await get_dashboard(current_user)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -2,7 +2,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Query, Path, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Path, Response, status
 from models.leave_request import LeaveRequestCreate, LeaveRequestUpdate, LeaveRequestOut
 from services.leave_request import (
     create_leave_request,
@@ -14,6 +14,7 @@ from services.leave_request import (
     reject_leave_request,
 )
 from services.auth import get_current_user, require_roles
+from utils.pagination import NEXT_CURSOR_HEADER
 from typing import Optional, List
 
 router = APIRouter(prefix="/leave-requests", tags=["leave_requests"])
@@ -25,7 +26,7 @@ async def create_new_leave_request(
     current_user: dict = Depends(require_roles("employee"))
 ):
     try:
-        return create_leave_request(data, current_user)
+        return await create_leave_request(data, current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -34,18 +35,24 @@ async def create_new_leave_request(
 
 @router.get("/", response_model=List[LeaveRequestOut])
 async def list_leave_requests(
+    response: Response,
     user_id: Optional[str] = Query(None),
     current_user: dict = Depends(require_roles("employee", "manager_women", "manager_men", "admin1", "admin2")),
     limit: int = Query(20, ge=1, le=100),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0, deprecated=True, description="Use cursor instead"),
+    cursor: Optional[str] = Query(None, description="Cursor returned in the X-Next-Cursor header")
 ):
     try:
-        return get_leave_requests(
+        items, next_cursor = await get_leave_requests(
             user_id=user_id,
             limit=limit,
             offset=offset,
-            current_user=current_user
+            current_user=current_user,
+            cursor=cursor
         )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return items
     except HTTPException:
         raise
     except Exception as e:
@@ -59,7 +66,7 @@ async def update_existing_leave_request(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        return update_leave_request(request_id, update_data, current_user)
+        return await update_leave_request(request_id, update_data, current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -72,7 +79,7 @@ async def delete_existing_leave_request(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        return delete_leave_request(request_id, current_user)
+        return await delete_leave_request(request_id, current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -82,7 +89,7 @@ async def delete_existing_leave_request(
 @router.post("/{request_id}/approve-phase1", response_model=LeaveRequestOut)
 async def approve_phase1(request_id: str = Path(...), current_user: dict = Depends(require_roles("manager_women", "manager_men", "admin1", "admin2"))):
     try:
-        return approve_leave_phase1(request_id, current_user)
+        return await approve_leave_phase1(request_id, current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -92,7 +99,7 @@ async def approve_phase1(request_id: str = Path(...), current_user: dict = Depen
 @router.post("/{request_id}/approve-phase2", response_model=LeaveRequestOut)
 async def approve_phase2(request_id: str = Path(...), current_user: dict = Depends(require_roles("manager_women", "manager_men", "admin1", "admin2"))):
     try:
-        return approve_leave_phase2(request_id, current_user)
+        return await approve_leave_phase2(request_id, current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -106,7 +113,7 @@ async def reject_leave(
     current_user: dict = Depends(require_roles("manager_women", "manager_men", "admin1", "admin2"))
 ):
     try:
-        return reject_leave_request(request_id, current_user, reason)
+        return await reject_leave_request(request_id, current_user, reason)
     except HTTPException:
         raise
     except Exception as e:
@@ -119,7 +126,7 @@ async def approve_leave_men(
     current_user: dict = Depends(require_roles("manager_men", "admin1", "admin2"))
 ):
     try:
-        return approve_leave_phase1(request_id, current_user)
+        return await approve_leave_phase1(request_id, current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -133,7 +140,7 @@ async def reject_leave_men(
     current_user: dict = Depends(require_roles("manager_men", "admin1", "admin2"))
 ):
     try:
-        return reject_leave_request(request_id, current_user, reason)
+        return await reject_leave_request(request_id, current_user, reason)
     except HTTPException:
         raise
     except Exception as e:
@@ -146,7 +153,7 @@ async def approve_leave_women(
     current_user: dict = Depends(require_roles("manager_women", "admin1", "admin2"))
 ):
     try:
-        return approve_leave_phase1(request_id, current_user)
+        return await approve_leave_phase1(request_id, current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -160,7 +167,7 @@ async def reject_leave_women(
     current_user: dict = Depends(require_roles("manager_women", "admin1", "admin2"))
 ):
     try:
-        return reject_leave_request(request_id, current_user, reason)
+        return await reject_leave_request(request_id, current_user, reason)
     except HTTPException:
         raise
     except Exception as e:
@@ -1,21 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from typing import List, Optional
 
 from models.log import logOut, logCreate
 from services.log import get_logs, create_log
 from services.auth import require_roles
+from utils.pagination import NEXT_CURSOR_HEADER
 
 router = APIRouter(prefix="/logs", tags=["logs"])
 
 @router.get("/", response_model=List[logOut])
-def list_logs(
+async def list_logs(
+    response: Response,
     limit: int = Query(20, ge=1),
-    offset: int = Query(0, ge=0),
+    offset: int = Query(0, ge=0, deprecated=True, description="Use cursor instead"),
     recent_hours: Optional[int] = Query(None, description="Filter logs in recent hours"),
+    cursor: Optional[str] = Query(None, description="Cursor returned in the X-Next-Cursor header"),
     current_user: dict = Depends(require_roles("manager_men", "manager_women", "admin1", "admin2")),
 ):
     try:
-        return get_logs(current_user, limit, offset, recent_hours)
+        items, next_cursor = await get_logs(current_user, limit, offset, recent_hours, cursor)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return items
     except HTTPException:
         raise
     except Exception as e:
@@ -25,12 +31,12 @@ def list_logs(
         )
 
 @router.post("/", response_model=logOut, status_code=status.HTTP_201_CREATED)
-def create_log_endpoint(
+async def create_log_endpoint(
     payload: logCreate,
     current_user: dict = Depends(require_roles("manager_men", "manager_women", "admin1", "admin2")),
 ):
     try:
-        return create_log(payload, current_user)
+        return await create_log(payload, current_user)
     except HTTPException:
         raise
     except Exception as e:
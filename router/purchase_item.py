@@ -2,7 +2,8 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Query, Path, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Path, Response, status
+from fastapi.responses import StreamingResponse
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
@@ -13,9 +14,16 @@ from models.purchase_item import (
     PurchaseItemUpdate,
     PurchaseItemFilter,
     PurchaseItemSummary,
+    PurchaseItemFacetedResult,
+    SpendBucket,
+    SpendDimension,
+    SpendGranularity,
+    BudgetLedgerOut,
+    BudgetLimitUpdate,
     PurchaseStatus,
     PriorityLevel,
-    PurchaseCategory
+    PurchaseCategory,
+    NameMatchMode
 )
 from services.purchase_item import (
     create_purchase_item,
@@ -24,7 +32,11 @@ from services.purchase_item import (
     get_purchase_items,
     purchase_item_service
 )
+from services.purchase_spend import get_spend_rollups
+from services.purchase_budget import get_budget, get_budgets, set_budget_limit
 from services.auth import require_roles
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.export import ExportFormat, export_headers, export_media_type
 
 router = APIRouter(
     prefix="/purchase-items",
@@ -37,6 +49,47 @@ router = APIRouter(
 )
 
 
+def purchase_item_filter(
+    name: Optional[str] = Query(None, description="Search in item name and description"),
+    name_match: NameMatchMode = Query(
+        "text",
+        description="text: full-text search ranked by relevance (ignores sort_by); exact: whole name; prefix: name starts with the value",
+    ),
+    category: Optional[PurchaseCategory] = Query(None, description="Filter by category"),
+    priority: Optional[PriorityLevel] = Query(None, description="Filter by priority"),
+    status: Optional[PurchaseStatus] = Query(None, description="Filter by status"),
+    
+    supplier: Optional[str] = Query(None, description="Filter by supplier"),
+    budget_code: Optional[str] = Query(None, description="Filter by budget code"),
+    created_by: Optional[str] = Query(None, description="Filter by creator"),
+    
+    created_from: Optional[datetime] = Query(None, description="Created from date"),
+    created_to: Optional[datetime] = Query(None, description="Created to date"),
+    required_from: Optional[datetime] = Query(None, description="Required from date"),
+    required_to: Optional[datetime] = Query(None, description="Required to date"),
+    
+    min_price: Optional[float] = Query(None, ge=0, description="Minimum price"),
+    max_price: Optional[float] = Query(None, ge=0, description="Maximum price"),
+) -> PurchaseItemFilter:
+    """Query parameters shared by the list and faceted search endpoints"""
+    return PurchaseItemFilter(
+        name=name,
+        name_match=name_match,
+        category=category,
+        priority=priority,
+        status=status,
+        supplier=supplier,
+        budget_code=budget_code,
+        created_by=created_by,
+        created_from=created_from,
+        created_to=created_to,
+        required_from=required_from,
+        required_to=required_to,
+        min_price=min_price,
+        max_price=max_price
+    )
+
+
 @exception_handler
 @router.post(
     "/",
@@ -50,7 +103,7 @@ async def create_new_purchase_item(
     current_user: dict = Depends(require_roles("manager_women", "manager_men"))
 ):
     try:
-        return create_purchase_item(data, current_user)
+        return await create_purchase_item(data, current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -60,6 +113,56 @@ async def create_new_purchase_item(
         )
 
 
+@exception_handler
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    summary="Export purchase items",
+    description="Stream every purchase item matching the filters as CSV or NDJSON, optionally gzip-compressed"
+)
+async def export_purchase_items(
+    export_format: ExportFormat = Query("csv", alias="format", description="csv or ndjson"),
+    compress: bool = Query(False, alias="gzip", description="Gzip-compress the file"),
+    filters: PurchaseItemFilter = Depends(purchase_item_filter),
+    current_user: dict = Depends(require_roles("admin1", "admin2", "manager_women", "manager_men"))
+):
+    try:
+        stream = await purchase_item_service.export_purchase_items(filters, export_format, compress, current_user)
+        return StreamingResponse(
+            stream,
+            media_type=export_media_type(export_format, compress),
+            headers=export_headers("purchase-items", export_format, compress),
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error exporting purchase items: {str(e)}"
+        )
+
+
+@exception_handler
+@router.get(
+    "/budgets",
+    response_model=List[BudgetLedgerOut],
+    summary="Budget ledger",
+    description="Limit, committed and spent totals of every budget code"
+)
+async def list_budgets(
+    current_user: dict = Depends(require_roles("admin1", "admin2"))
+):
+    try:
+        return await get_budgets()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error getting budget ledger: {str(e)}"
+        )
+
+
 @exception_handler
 @router.get(
     "/{item_id}",
@@ -72,7 +175,7 @@ async def get_single_purchase_item(
     current_user: dict = Depends(require_roles("admin1", "admin2", "manager_women", "manager_men"))
 ):
     try:
-        return purchase_item_service.get_purchase_item_by_id(item_id, current_user)
+        return await purchase_item_service.get_purchase_item_by_id(item_id, current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -90,56 +193,31 @@ async def get_single_purchase_item(
     description="Get list of purchase items with filtering and sorting options"
 )
 async def list_purchase_items(
+    response: Response,
     limit: int = Query(20, ge=1, le=200, description="Number of items per page"),
-    offset: int = Query(0, ge=0, description="Number of items to skip"),
+    offset: int = Query(0, ge=0, deprecated=True, description="Number of items to skip (use cursor instead)"),
+    cursor: Optional[str] = Query(None, description="Cursor returned in the X-Next-Cursor header"),
     
     sort_by: str = Query("created_at", description="Sort field"),
     sort_order: str = Query("desc", description="Sort order (asc/desc)"),
     
-    name: Optional[str] = Query(None, description="Search in item name"),
-    category: Optional[PurchaseCategory] = Query(None, description="Filter by category"),
-    priority: Optional[PriorityLevel] = Query(None, description="Filter by priority"),
-    status: Optional[PurchaseStatus] = Query(None, description="Filter by status"),
-    
-    supplier: Optional[str] = Query(None, description="Filter by supplier"),
-    budget_code: Optional[str] = Query(None, description="Filter by budget code"),
-    created_by: Optional[str] = Query(None, description="Filter by creator"),
-    
-    created_from: Optional[datetime] = Query(None, description="Created from date"),
-    created_to: Optional[datetime] = Query(None, description="Created to date"),
-    required_from: Optional[datetime] = Query(None, description="Required from date"),
-    required_to: Optional[datetime] = Query(None, description="Required to date"),
-    
-    min_price: Optional[float] = Query(None, ge=0, description="Minimum price"),
-    max_price: Optional[float] = Query(None, ge=0, description="Maximum price"),
+    filters: PurchaseItemFilter = Depends(purchase_item_filter),
     
     current_user: dict = Depends(require_roles("admin1", "admin2", "manager_women", "manager_men"))
 ):
     try:
-        filters = PurchaseItemFilter(
-            name=name,
-            category=category,
-            priority=priority,
-            status=status,
-            supplier=supplier,
-            budget_code=budget_code,
-            created_by=created_by,
-            created_from=created_from,
-            created_to=created_to,
-            required_from=required_from,
-            required_to=required_to,
-            min_price=min_price,
-            max_price=max_price
-        )
-        
-        return purchase_item_service.get_purchase_items(
+        items, next_cursor = await purchase_item_service.get_purchase_items(
             filters=filters,
             limit=limit,
             offset=offset,
             sort_by=sort_by,
             sort_order=sort_order,
-            current_user=current_user
+            current_user=current_user,
+            cursor=cursor
         )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return items
     except HTTPException:
         raise
     except Exception as e:
@@ -162,7 +240,7 @@ async def update_existing_purchase_item(
     current_user: dict = Depends(require_roles("manager_women", "manager_men"))
 ):
     try:
-        return update_purchase_item(item_id=item_id, update_data=update_data, current_user=current_user)
+        return await update_purchase_item(item_id=item_id, update_data=update_data, current_user=current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -184,7 +262,7 @@ async def delete_existing_purchase_item(
     current_user: dict = Depends(require_roles("manager_women", "manager_men"))
 ):
     try:
-        return delete_purchase_item(item_id=item_id, current_user=current_user)
+        return await delete_purchase_item(item_id=item_id, current_user=current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -194,6 +272,113 @@ async def delete_existing_purchase_item(
         )
 
 
+@exception_handler
+@router.get(
+    "/search/facets",
+    response_model=PurchaseItemFacetedResult,
+    summary="Faceted purchase item search",
+    description="One page of matching items together with category, priority and status counts for the whole filtered set"
+)
+async def search_purchase_items_faceted(
+    response: Response,
+    limit: int = Query(20, ge=1, le=200, description="Number of items per page"),
+    cursor: Optional[str] = Query(None, description="Cursor returned as next_cursor"),
+    sort_by: str = Query("created_at", description="Sort field"),
+    sort_order: str = Query("desc", description="Sort order (asc/desc)"),
+    filters: PurchaseItemFilter = Depends(purchase_item_filter),
+    current_user: dict = Depends(require_roles("admin1", "admin2", "manager_women", "manager_men"))
+):
+    try:
+        result = await purchase_item_service.search_purchase_items_faceted(
+            filters=filters,
+            limit=limit,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            cursor=cursor
+        )
+        if result.next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = result.next_cursor
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error searching purchase items: {str(e)}"
+        )
+
+
+@exception_handler
+@router.get(
+    "/spend/rollups",
+    response_model=List[SpendBucket],
+    summary="Spend rollups",
+    description="Spend per budget code, supplier or category, bucketed by day, week or month"
+)
+async def get_spend(
+    dimension: SpendDimension = Query("budget_code", description="Breakdown dimension"),
+    granularity: SpendGranularity = Query("month", description="Bucket size"),
+    start: Optional[datetime] = Query(None, description="First period to include"),
+    end: Optional[datetime] = Query(None, description="Periods starting at or after this are excluded"),
+    value: Optional[str] = Query(None, description="Only this budget code, supplier or category"),
+    current_user: dict = Depends(require_roles("admin1", "admin2"))
+):
+    try:
+        return await get_spend_rollups(dimension, granularity, start, end, value)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error getting spend rollups: {str(e)}"
+        )
+
+
+@exception_handler
+@router.get(
+    "/budgets/{budget_code}",
+    response_model=BudgetLedgerOut,
+    summary="Get budget",
+    description="Limit, committed and spent totals of a budget code"
+)
+async def get_budget_ledger(
+    budget_code: str = Path(..., description="Budget code"),
+    current_user: dict = Depends(require_roles("admin1", "admin2"))
+):
+    try:
+        return await get_budget(budget_code)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error getting budget: {str(e)}"
+        )
+
+
+@exception_handler
+@router.put(
+    "/budgets/{budget_code}",
+    response_model=BudgetLedgerOut,
+    summary="Set budget limit",
+    description="Set or remove the spending limit enforced when purchase items are created or updated"
+)
+async def update_budget_limit(
+    budget_code: str = Path(..., description="Budget code"),
+    data: BudgetLimitUpdate = Body(...),
+    current_user: dict = Depends(require_roles("admin1", "admin2"))
+):
+    try:
+        return await set_budget_limit(budget_code, data.limit)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error setting budget limit: {str(e)}"
+        )
+
+
 @exception_handler
 @router.get(
     "/summary/stats",
@@ -202,10 +387,11 @@ async def delete_existing_purchase_item(
     description="Get overall statistics and summary of purchase items"
 )
 async def get_purchase_summary(
+    refresh: bool = Query(False, description="Recompute the summary from all purchase items"),
     current_user: dict = Depends(require_roles("admin1", "admin2"))
 ):
     try:
-        return purchase_item_service.get_purchase_summary(current_user)
+        return await purchase_item_service.get_purchase_summary(current_user, refresh)
     except HTTPException:
         raise
     except Exception as e:
@@ -2,7 +2,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import APIRouter, Body, Depends, HTTPException, status, Path, Query
+from fastapi import APIRouter, Body, Depends, HTTPException, status, Path, Query, Response
 from typing import List, Optional
 
 from models.report import report_create, report_update, report_out
@@ -10,6 +10,7 @@ from services.report import (
     create_report, get_reports, update_report, delete_report, approve_report
 )
 from services.auth import get_current_user, require_roles
+from utils.pagination import NEXT_CURSOR_HEADER
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 from utils.error_handler import exception_handler
@@ -21,7 +22,7 @@ async def create_new_report(
     current_user: dict = Depends(require_roles("employee", "manager_women", "manager_men", "admin1", "admin2"))
 ):
     try:
-        return create_report(data, current_user)
+        return await create_report(data, current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -30,14 +31,19 @@ async def create_new_report(
 
 @router.get("/", response_model=List[report_out])
 async def list_reports(
+    response: Response,
     user_id: Optional[str] = Query(None),
     report_status: Optional[str] = Query(None),
     limit: int = Query(20, ge=1),
-    offset: int = Query(0, ge=0),
+    offset: int = Query(0, ge=0, deprecated=True, description="Use cursor instead"),
+    cursor: Optional[str] = Query(None, description="Cursor returned in the X-Next-Cursor header"),
     current_user: dict = Depends(require_roles("employee", "manager_women", "manager_men", "admin1", "admin2"))
 ):
     try:
-        return get_reports(user_id, report_status, limit, offset, current_user)
+        items, next_cursor = await get_reports(user_id, report_status, limit, offset, current_user, cursor)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return items
     except HTTPException:
         raise
     except Exception as e:
@@ -51,7 +57,7 @@ async def update_existing_report(
     current_user: dict = Depends(require_roles("employee"))
 ):
     try:
-        return update_report(report_id, update_data, current_user)
+        return await update_report(report_id, update_data, current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -64,7 +70,7 @@ async def delete_existing_report(
     current_user: dict = Depends(require_roles("employee"))
 ):
     try:
-        return delete_report(report_id, current_user)
+        return await delete_report(report_id, current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -77,7 +83,7 @@ async def approve_existing_report(
     current_user: dict = Depends(require_roles("manager_women", "manager_men", "admin1", "admin2"))
 ):
     try:
-        return approve_report(report_id, current_user)
+        return await approve_report(report_id, current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -90,7 +96,7 @@ async def approve_report_men(
     current_user: dict = Depends(require_roles("manager_men", "admin1", "admin2"))
 ):
     try:
-        return approve_report(report_id, current_user)
+        return await approve_report(report_id, current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -103,7 +109,7 @@ async def approve_report_women(
     current_user: dict = Depends(require_roles("manager_women", "admin1", "admin2"))
 ):
     try:
-        return approve_report(report_id, current_user)
+        return await approve_report(report_id, current_user)
     except HTTPException:
         raise
     except Exception as e:
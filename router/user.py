@@ -14,16 +14,16 @@ router = APIRouter(prefix="/employees", tags=["employees"])
 
 
 @router.post("/first-admin", response_model=employee_out_with_token, status_code=status.HTTP_201_CREATED)
-def create_first_admin(user: employee_create):
+async def create_first_admin(user: employee_create):
     try:
-        from utils.db import get_db
-        db = get_db()
+        from utils.db import get_async_db
+        db = get_async_db()
         user_collection = db["employees"]
-        existing_admin = user_collection.find_one({"role": "admin1"})
+        existing_admin = await user_collection.find_one({"role": "admin1"})
         if existing_admin:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Admin user already exists. Use regular create endpoint with authentication.")
         mock_admin = {"role": "admin1", "user_id": "initial_setup"}
-        return create_user(user, mock_admin, return_token=True)
+        return await create_user(user, mock_admin, return_token=True)
     except HTTPException:
         raise
     except Exception as e:
@@ -31,9 +31,9 @@ def create_first_admin(user: employee_create):
 
 
 @router.get("/", response_model=List[employee_out_with_password], status_code=status.HTTP_200_OK)
-def get_users(current_user: dict = Depends(require_roles("admin1", "admin2", "manager_women", "manager_men"))):
+async def get_users(current_user: dict = Depends(require_roles("admin1", "admin2", "manager_women", "manager_men"))):
     try:
-        return get_all_users(current_user)
+        return await get_all_users(current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -41,10 +41,10 @@ def get_users(current_user: dict = Depends(require_roles("admin1", "admin2", "ma
 
 
 @router.get("/list", response_model=List[employee_out_with_password], status_code=status.HTTP_200_OK)
-def get_users_public():
+async def get_users_public():
     try:
         mock_admin = {"role": "admin1", "user_id": "test"}
-        return get_all_users(mock_admin)
+        return await get_all_users(mock_admin)
     except HTTPException:
         raise
     except Exception as e:
@@ -52,9 +52,9 @@ def get_users_public():
 
 
 @router.post("/", response_model=employee_out_with_token, status_code=status.HTTP_201_CREATED)
-def create_new_user(user: employee_create, current_user: dict = Depends(require_roles("admin1", "admin2"))):
+async def create_new_user(user: employee_create, current_user: dict = Depends(require_roles("admin1", "admin2"))):
     try:
-        return create_user(user, current_user, return_token=True)
+        return await create_user(user, current_user, return_token=True)
     except HTTPException:
         raise
     except Exception as e:
@@ -62,13 +62,13 @@ def create_new_user(user: employee_create, current_user: dict = Depends(require_
 
 
 @router.put("/{user_id}", response_model=employee_out_with_password, status_code=status.HTTP_200_OK)
-def update_existing_user(
+async def update_existing_user(
     user_id: str = Path(...),
     user_data: employee_update = Body(...),
     current_user: dict = Depends(require_roles("admin1", "admin2"))
 ):
     try:
-        return update_user(user_id, user_data, current_user)
+        return await update_user(user_id, user_data, current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -76,12 +76,12 @@ def update_existing_user(
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_200_OK)
-def delete_existing_user(
+async def delete_existing_user(
     user_id: str = Path(...),
     current_user: dict = Depends(require_roles("admin1", "admin2"))
 ):
     try:
-        return delete_user(user_id, current_user)
+        return await delete_user(user_id, current_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -89,12 +89,12 @@ def delete_existing_user(
 
 
 @router.put("/me", response_model=employee_out_with_password, status_code=status.HTTP_200_OK)
-def update_me(
+async def update_me(
     user_data: employee_update = Body(...),
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        return update_user(current_user["user_id"], user_data, current_user)
+        return await update_user(current_user["user_id"], user_data, current_user)
     except HTTPException:
         raise
     except Exception as e:
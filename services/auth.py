@@ -1,11 +1,38 @@
+import hashlib
+import os
+import secrets
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from utils.db import get_db
-from utils.jwt import create_access_token, verify_token, TokenError
-from utils.password_hash import verify_password, hash_password
+from utils.db import get_async_db
+from utils.jwt import create_access_token, create_refresh_token, verify_token, TokenError, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
+from utils.password_hash import verify_password_async, hash_password_async
+from utils.cache import TTLCache
+from utils.rate_limit import SlidingWindowLimiter, MemoryWindowStore, MongoWindowStore
 from services.log import logger
+from services.token import bump_token_generation, get_token_generation, is_token_revoked
+from services.principal import load_principal
+
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+LOGIN_RATE_LIMIT_BACKEND = os.getenv("LOGIN_RATE_LIMIT_BACKEND", "memory")
+LOGIN_RATE_WINDOW_SECONDS = float(os.getenv("LOGIN_RATE_WINDOW_SECONDS", "60"))
+LOGIN_RATE_LIMIT_PER_ACCOUNT = int(os.getenv("LOGIN_RATE_LIMIT_PER_ACCOUNT", "5"))
+LOGIN_RATE_LIMIT_PER_IP = int(os.getenv("LOGIN_RATE_LIMIT_PER_IP", "30"))
 
 security = HTTPBearer(auto_error=False)
+token_cache = TTLCache(maxsize=JWT_CACHE_SIZE, ttl=float(ACCESS_TOKEN_EXPIRE_MINUTES * 60))
+
+def _login_store():
+    return MongoWindowStore("login_attempts") if LOGIN_RATE_LIMIT_BACKEND == "mongo" else MemoryWindowStore()
+
+
+# Separate stores, so account keys sprayed from a few addresses cannot crowd
+# the per-IP counters out of memory
+account_login_limiter = SlidingWindowLimiter(LOGIN_RATE_LIMIT_PER_ACCOUNT, LOGIN_RATE_WINDOW_SECONDS, _login_store())
+ip_login_limiter = SlidingWindowLimiter(LOGIN_RATE_LIMIT_PER_IP, LOGIN_RATE_WINDOW_SECONDS, _login_store())
 
 def _normalize_token(raw_token: str | None) -> str | None:
     if not raw_token:
@@ -37,10 +64,7 @@ def _normalize_token(raw_token: str | None) -> str | None:
     
     return token
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    request: Request = None,
-):
+def _extract_token(credentials: HTTPAuthorizationCredentials | None, request: Request | None) -> str | None:
     token_value: str | None = None
     if credentials and credentials.credentials:
         token_value = _normalize_token(credentials.credentials)
@@ -50,56 +74,76 @@ def get_current_user(
             parts = cookie_val.split()
             token_candidate = parts[1] if len(parts) == 2 and parts[0].lower() == "bearer" else cookie_val
             token_value = _normalize_token(token_candidate)
-    if not token_value:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing credentials")
-    payload = verify_token(token_value)
-    if isinstance(payload, dict):
-        return payload
-    error_detail = "Invalid token"
+    return token_value
+
+def _token_error_detail(payload, default: str) -> str:
     if isinstance(payload, TokenError):
         if payload == TokenError.EXPIRED:
-            error_detail = "Token expired"
+            return "Token expired"
         elif payload == TokenError.INVALID_SIGNATURE:
-            error_detail = "Invalid token signature"
+            return "Invalid token signature"
         elif payload == TokenError.INVALID_ALGORITHM:
-            error_detail = "Invalid token algorithm"
+            return "Invalid token algorithm"
         elif payload == TokenError.INVALID_FORMAT:
-            error_detail = "Invalid token format"
+            return "Invalid token format"
         elif payload == TokenError.INVALID_PAYLOAD:
-            error_detail = "Invalid token payload"
-    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=error_detail)
+            return "Invalid token payload"
+    return default
+
+def _verify_token_cached(token_value: str):
+    """verify_token behind an LRU keyed by the token hash, entries live until the token's exp"""
+    key = hashlib.sha256(token_value.encode("utf-8")).hexdigest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return dict(payload)
+    payload = verify_token(token_value)
+    if isinstance(payload, dict):
+        remaining = payload.get("exp", 0) - time.time()
+        if remaining > 0:
+            token_cache.set(key, dict(payload), ttl=remaining)
+    return payload
+
+async def _authenticate(credentials: HTTPAuthorizationCredentials | None, request: Request | None, default_error: str) -> dict:
+    """Resolve the token payload once per request, later dependencies reuse request.state"""
+    if request is not None:
+        cached = getattr(request.state, "auth_payload", None)
+        if cached is not None:
+            return cached
+    token_value = _extract_token(credentials, request)
+    if not token_value:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing credentials")
+    payload = _verify_token_cached(token_value)
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=_token_error_detail(payload, default_error))
+    if payload.get("type", "access") != "access":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token type")
+    if await is_token_revoked(payload):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+    if payload.get("user_id"):
+        # Role and status come from the principal cache rather than the token,
+        # so deactivation and role changes apply within the cache TTL
+        principal = await load_principal(payload["user_id"])
+        if principal is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        if principal["status"] != "active":
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is inactive")
+        payload.update(principal)
+    if request is not None:
+        request.state.auth_payload = payload
+    return payload
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    request: Request = None,
+):
+    return await _authenticate(credentials, request, "Invalid token")
 
 def require_roles(*roles):
-    def role_dependency(
+    async def role_dependency(
         credentials: HTTPAuthorizationCredentials = Depends(security),
         request: Request = None,
     ):
-        token_value: str | None = None
-        if credentials and credentials.credentials:
-            token_value = _normalize_token(credentials.credentials)
-        if not token_value and request is not None:
-            cookie_val = request.cookies.get("access_token")
-            if cookie_val:
-                parts = cookie_val.split()
-                token_candidate = parts[1] if len(parts) == 2 and parts[0].lower() == "bearer" else cookie_val
-                token_value = _normalize_token(token_candidate)
-        if not token_value:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing credentials")
-        payload = verify_token(token_value)
-        if not isinstance(payload, dict):
-            error_detail = "Invalid or expired token"
-            if isinstance(payload, TokenError):
-                if payload == TokenError.EXPIRED:
-                    error_detail = "Token expired"
-                elif payload == TokenError.INVALID_SIGNATURE:
-                    error_detail = "Invalid token signature"
-                elif payload == TokenError.INVALID_ALGORITHM:
-                    error_detail = "Invalid token algorithm"
-                elif payload == TokenError.INVALID_FORMAT:
-                    error_detail = "Invalid token format"
-                elif payload == TokenError.INVALID_PAYLOAD:
-                    error_detail = "Invalid token payload"
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=error_detail)
+        payload = await _authenticate(credentials, request, "Invalid or expired token")
         if "role" not in payload:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token format")
         if payload["role"] not in roles:
@@ -107,37 +151,124 @@ def require_roles(*roles):
         return payload
     return role_dependency
 
-def login(employee_id: str, password: str):
-    db = get_db()
+async def issue_refresh_token(user_id: str, role: str, generation: int) -> str:
+    """Start a refresh family for a fresh login and return its first refresh token.
+
+    A family is one small document holding the id of the only refresh token
+    that may still be redeemed; rotation swaps that id in place.
+    """
+    family_id = str(ObjectId())
+    jti = secrets.token_urlsafe(16)
+    now = datetime.utcnow()
+    await get_async_db()["refresh_families"].insert_one({
+        "_id": family_id,
+        "user_id": user_id,
+        "role": role,
+        "gen": generation,
+        "jti": jti,
+        "revoked": False,
+        "created_at": now,
+        "expires_at": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    })
+    return create_refresh_token(user_id, {"fam": family_id, "jti": jti})
+
+async def refresh_access_token(refresh_token: str) -> dict:
+    """Rotate a refresh token and mint a new access token without touching the user or bcrypt.
+
+    Redeeming a refresh token that was already rotated away means it leaked,
+    so the whole family is revoked.
+    """
+    payload = verify_token(_normalize_token(refresh_token) or "")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=_token_error_detail(payload, "Invalid refresh token"))
+    family_id, jti = payload.get("fam"), payload.get("jti")
+    if payload.get("type") != "refresh" or not family_id or not jti:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+
+    families = get_async_db()["refresh_families"]
+    new_jti = secrets.token_urlsafe(16)
+    now = datetime.utcnow()
+    family = await families.find_one_and_update(
+        {"_id": family_id, "jti": jti, "revoked": False},
+        {"$set": {"jti": new_jti, "rotated_at": now, "expires_at": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not family:
+        revoked = await families.update_one({"_id": family_id, "revoked": False}, {"$set": {"revoked": True, "revoked_at": now}})
+        if revoked.modified_count:
+            logger.warning("Refresh token reuse detected, family %s revoked", family_id)
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token reuse detected")
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token revoked")
+    # Logout, forced sign-out and credential changes bump the generation
+    if family["gen"] < await get_token_generation(family["user_id"]):
+        await families.update_one({"_id": family_id}, {"$set": {"revoked": True, "revoked_at": now}})
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token revoked")
+
+    principal = await load_principal(family["user_id"])
+    if principal is None or principal["status"] != "active":
+        await families.update_one({"_id": family_id}, {"$set": {"revoked": True, "revoked_at": now}})
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token revoked")
+
+    access_payload = {"user_id": family["user_id"], "role": principal["role"], "gen": family["gen"]}
+    return {
+        "user_id": family["user_id"],
+        "role": principal["role"],
+        "token": create_access_token(access_payload, subject=family["user_id"]),
+        "refresh_token": create_refresh_token(family["user_id"], {"fam": family_id, "jti": new_jti}),
+    }
+
+async def check_login_rate_limit(employee_id: str, client_ip: str | None, scope: str = "user"):
+    """Reject with 429 before any user lookup or bcrypt work once the client IP or the account is over its limit.
+
+    The IP is checked first, so a client over its own limit is turned away
+    before it can create counters for further account keys.
+    """
+    checks = []
+    if client_ip:
+        checks.append((ip_login_limiter, f"ip:{client_ip}"))
+    checks.append((account_login_limiter, f"{scope}:{str(employee_id).strip().lower()}"))
+    for limiter, key in checks:
+        allowed, retry_after = await limiter.hit(key)
+        if not allowed:
+            logger.warning("Login rate limit exceeded for %s", key)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts, try again later",
+                headers={"Retry-After": str(int(retry_after))},
+            )
+
+async def login(employee_id: str, password: str):
+    db = get_async_db()
     employees = db["employees"]
     try:
         emp_id = int(employee_id)
     except ValueError:
         emp_id = employee_id
-    user = employees.find_one({"employee_id": emp_id})
-    if not user or not user.get("password_hash") or not verify_password(password, user["password_hash"]):
+    user = await employees.find_one({"employee_id": emp_id})
+    if not user or not user.get("password_hash") or not await verify_password_async(password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid employee ID or password")
+    if user.get("status", "active") != "active":
+        raise HTTPException(status_code=403, detail="User is inactive")
     
-    try:
-        from services.token import deactivate_user_tokens
-        deactivate_user_tokens(str(user["_id"]))
-    except Exception as e:
-        print(f"Warning: Could not deactivate old tokens: {e}")
+    # Single active session: the new generation revokes every earlier token
+    generation = await bump_token_generation(str(user["_id"]))
     
-    payload = {"user_id": str(user["_id"]), "role": user["role"]}
+    payload = {"user_id": str(user["_id"]), "role": user["role"], "gen": generation}
     token = create_access_token(payload, subject=str(user["_id"]))
+    refresh_token = await issue_refresh_token(str(user["_id"]), user["role"], generation)
     return {
         "user_id": str(user["_id"]),
         "role": user["role"],
-        "token": token
+        "token": token,
+        "refresh_token": refresh_token
     }
 
-def create_bootstrap_admin(employee_id: str, password: str, full_name: str, phone: str, email: str):
+async def create_bootstrap_admin(employee_id: str, password: str, full_name: str, phone: str, email: str):
     """Create the first admin of the system"""
-    db = get_db()
+    db = get_async_db()
     admins = db["admins"]
     
-    if admins.count_documents({}) > 0:
+    if await admins.count_documents({}) > 0:
         raise HTTPException(status_code=400, detail="Admin already exists")
     
     try:
@@ -145,7 +276,7 @@ def create_bootstrap_admin(employee_id: str, password: str, full_name: str, phon
     except ValueError:
         emp_id = employee_id
     
-    hashed = hash_password(password)
+    hashed = await hash_password_async(password)
     from datetime import datetime
     from bson import ObjectId
     
@@ -163,12 +294,12 @@ def create_bootstrap_admin(employee_id: str, password: str, full_name: str, phon
         "updated_at": datetime.now()
     }
     
-    admins.insert_one(admin_data)
+    await admins.insert_one(admin_data)
     return {"message": "First admin created successfully"}
 
-def create_admin(employee_id: str, password: str, full_name: str, phone: str, email: str, role: str = "admin1", is_super_admin: bool = False):
+async def create_admin(employee_id: str, password: str, full_name: str, phone: str, email: str, role: str = "admin1", is_super_admin: bool = False):
     """Create a new admin"""
-    db = get_db()
+    db = get_async_db()
     admins = db["admins"]
     
     try:
@@ -176,10 +307,10 @@ def create_admin(employee_id: str, password: str, full_name: str, phone: str, em
     except ValueError:
         emp_id = employee_id
     
-    if admins.find_one({"employee_id": emp_id}):
+    if await admins.find_one({"employee_id": emp_id}):
         raise HTTPException(status_code=400, detail="Admin ID already exists")
     
-    hashed = hash_password(password)
+    hashed = await hash_password_async(password)
     from datetime import datetime
     from bson import ObjectId
     
@@ -197,36 +328,35 @@ def create_admin(employee_id: str, password: str, full_name: str, phone: str, em
         "updated_at": datetime.now()
     }
     
-    admins.insert_one(admin_data)
+    await admins.insert_one(admin_data)
     return {"message": "Admin created successfully"}
 
-def admin_login(employee_id: str, password: str):
+async def admin_login(employee_id: str, password: str):
     """Login for admins"""
-    db = get_db()
+    db = get_async_db()
     admins = db["admins"]
     
-    admin = admins.find_one({"employee_id": employee_id})
+    admin = await admins.find_one({"employee_id": employee_id})
     if not admin:
         try:
             emp_id = int(employee_id)
-            admin = admins.find_one({"employee_id": emp_id})
+            admin = await admins.find_one({"employee_id": emp_id})
         except ValueError:
             pass
     
-    if not admin or not admin.get("password_hash") or not verify_password(password, admin["password_hash"]):
+    if not admin or not admin.get("password_hash") or not await verify_password_async(password, admin["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid admin ID or password")
     
-    try:
-        from services.token import deactivate_user_tokens
-        deactivate_user_tokens(str(admin["_id"]))
-    except Exception as e:
-        print(f"Warning: Could not deactivate old tokens: {e}")
+    # Single active session: the new generation revokes every earlier token
+    generation = await bump_token_generation(str(admin["_id"]))
     
-    payload = {"user_id": str(admin["_id"]), "role": admin["role"]}
+    payload = {"user_id": str(admin["_id"]), "role": admin["role"], "gen": generation}
     token = create_access_token(payload, subject=str(admin["_id"]))
+    refresh_token = await issue_refresh_token(str(admin["_id"]), admin["role"], generation)
     return {
         "user_id": str(admin["_id"]),
         "role": admin["role"],
-        "token": token
+        "token": token,
+        "refresh_token": refresh_token
     }
 
@@ -1,70 +1,306 @@
 from fastapi import HTTPException, UploadFile, status
 from bson import ObjectId
-from typing import Dict
+from typing import Dict, Optional, Set, Tuple
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from models.avatar import avatarOut
-from utils.db import get_db
+from utils.db import get_async_db
+from utils.thumbnails import generate_thumbnails
+from services.log import logger
+from services.dashboard import avatar_url_cache
+import asyncio
+import hashlib
 import os
 import uuid
 
 upload_dir = "./uploads/avatars"
 
+AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", str(5 * 1024 * 1024)))
+AVATAR_CHUNK_SIZE = int(os.getenv("AVATAR_CHUNK_SIZE", str(64 * 1024)))
+# Enough to tell PNG from JPEG
+SNIFF_BYTES = 16
+
+AVATAR_MEDIA_TYPES = {"png": "image/png", "jpg": "image/jpeg", "jpeg": "image/jpeg", "webp": "image/webp"}
+
+BLOB_COLLECTION = "avatar_blobs"
+# How long an unreferenced blob is kept before the sweep may delete it
+AVATAR_BLOB_GRACE_SECONDS = float(os.getenv("AVATAR_BLOB_GRACE_SECONDS", "3600"))
+AVATAR_SWEEP_BATCH = int(os.getenv("AVATAR_SWEEP_BATCH", "500"))
+AVATAR_SWEEP_INTERVAL_SECONDS = float(os.getenv("AVATAR_SWEEP_INTERVAL_SECONDS", "3600"))
+# A sweep mark older than this is from a sweep that died; uploads may take the blob back
+AVATAR_SWEEP_STALE_SECONDS = 300
+BLOB_ACQUIRE_ATTEMPTS = 20
+BLOB_ACQUIRE_BACKOFF_SECONDS = 0.05
+
 if not os.path.exists(upload_dir):
     os.makedirs(upload_dir)
-    
-try:
-    # Ensure unique avatar per user
-    _db = get_db()
-    _db["avatar"].create_index("user_id", unique=True)
-except Exception:
-    # Index creation should not block app startup
-    pass
+
+# Keeps background thumbnail jobs referenced until they finish
+_thumbnail_tasks: Set[asyncio.Task] = set()
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Avatar exceeds the {AVATAR_MAX_BYTES} byte limit",
+    )
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        if path and os.path.exists(path):
+            os.remove(path)
+    except OSError:
+        pass
+
+
+def _remove_avatar_files(doc: Optional[Dict]) -> None:
+    """Remove the original and every thumbnail recorded on a document"""
+    if not doc:
+        return
+    _remove_quietly(doc.get("avatar_url") or doc.get("path", ""))
+    for path in (doc.get("thumbnails") or {}).values():
+        _remove_quietly(path)
+
+
+def sniff_image_extension(head: bytes) -> Optional[str]:
+    """png or jpg from the leading magic bytes, None for anything else"""
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if head[:3] == b"\xff\xd8\xff":
+        return "jpg"
+    return None
+
+
+def avatar_media_type(path: str) -> str:
+    """Media type to serve an avatar file with; unknown extensions from older uploads are never rendered"""
+    return AVATAR_MEDIA_TYPES.get(os.path.splitext(path)[1].lstrip(".").lower(), "application/octet-stream")
+
+
+def blob_path(content_hash: str, file_extension: str) -> str:
+    """Content-addressed location, fanned out over 256 directories by the first hash byte"""
+    return os.path.join(upload_dir, content_hash[:2], f"{content_hash}.{file_extension}")
+
+
+async def _acquire_blob(content_hash: str, file_extension: str, size: int) -> Dict:
+    """Take a reference on the blob with this hash, registering it on first use.
+
+    A blob marked by sweep_avatar_blobs is having its files removed, so the
+    reference waits until the sweep has deleted the document and then
+    registers the blob afresh.
+    """
+    blobs = get_async_db()[BLOB_COLLECTION]
+    for _ in range(BLOB_ACQUIRE_ATTEMPTS):
+        now = datetime.utcnow()
+        try:
+            return await blobs.find_one_and_update(
+                {
+                    "_id": content_hash,
+                    "$or": [
+                        {"sweeping_at": None},
+                        {"sweeping_at": {"$lt": now - timedelta(seconds=AVATAR_SWEEP_STALE_SECONDS)}},
+                    ],
+                },
+                {
+                    "$inc": {"refcount": 1},
+                    "$set": {"released_at": None, "sweeping_at": None, "sweep_id": None, "updated_at": now},
+                    "$setOnInsert": {
+                        "path": blob_path(content_hash, file_extension),
+                        "size": size,
+                        "thumbnails": {},
+                        "created_at": now,
+                    },
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # The document exists but is marked for sweeping
+            await asyncio.sleep(BLOB_ACQUIRE_BACKOFF_SECONDS)
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Avatar storage is busy, retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def _release_blob(content_hash: str) -> None:
+    """Drop one reference; an unreferenced blob is left for sweep_avatar_blobs"""
+    blobs = get_async_db()[BLOB_COLLECTION]
+    doc = await blobs.find_one_and_update(
+        {"_id": content_hash},
+        {"$inc": {"refcount": -1}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc and doc["refcount"] <= 0:
+        await blobs.update_one(
+            {"_id": content_hash, "refcount": {"$lte": 0}},
+            {"$set": {"released_at": datetime.utcnow()}},
+        )
+
+
+async def _release_avatar(doc: Optional[Dict]) -> None:
+    if not doc:
+        return
+    if doc.get("content_hash"):
+        await _release_blob(doc["content_hash"])
+    else:
+        # Uploads from before content addressing own their files outright
+        await asyncio.get_running_loop().run_in_executor(None, _remove_avatar_files, doc)
+
+
+async def sweep_avatar_blobs() -> int:
+    """Delete up to AVATAR_SWEEP_BATCH blobs that have been unreferenced for the grace period.
+
+    The grace period keeps a blob that is re-uploaded right after its last
+    release from being swept from under the new reference. Each blob is marked
+    before its files are unlinked and deleted only afterwards, so an upload of
+    the same bytes waits in _acquire_blob instead of gaining a reference to
+    files that are about to disappear.
+    """
+    blobs = get_async_db()[BLOB_COLLECTION]
+    cutoff = datetime.utcnow() - timedelta(seconds=AVATAR_BLOB_GRACE_SECONDS)
+    candidates = await blobs.find(
+        {"refcount": {"$lte": 0}, "released_at": {"$lt": cutoff}},
+        {"_id": 1},
+    ).limit(AVATAR_SWEEP_BATCH).to_list(length=AVATAR_SWEEP_BATCH)
+    removed = 0
+    for candidate in candidates:
+        # Re-check the count: a new reference since the scan keeps the blob
+        sweep_id = uuid.uuid4().hex
+        doc = await blobs.find_one_and_update(
+            {"_id": candidate["_id"], "refcount": {"$lte": 0}},
+            {"$set": {"sweeping_at": datetime.utcnow(), "sweep_id": sweep_id}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if not doc:
+            continue
+        await asyncio.get_running_loop().run_in_executor(None, _remove_avatar_files, doc)
+        result = await blobs.delete_one({"_id": candidate["_id"], "sweep_id": sweep_id})
+        if result.deleted_count:
+            removed += 1
+    return removed
+
+
+async def _attach_thumbnails(content_hash: str, file_path: str) -> None:
+    try:
+        thumbnails = await generate_thumbnails(file_path)
+    except Exception as e:
+        logger.error(f"Thumbnail generation failed for {file_path}: {str(e)}")
+        return
+    database = get_async_db()
+    result = await database[BLOB_COLLECTION].update_one(
+        {"_id": content_hash},
+        {"$set": {"thumbnails": thumbnails}},
+    )
+    if result.matched_count == 0:
+        for path in thumbnails.values():
+            await asyncio.get_running_loop().run_in_executor(None, _remove_quietly, path)
+        return
+    await database["avatar"].update_many({"content_hash": content_hash}, {"$set": {"thumbnails": thumbnails}})
+
+
+def _schedule_thumbnails(content_hash: str, file_path: str) -> None:
+    task = asyncio.create_task(_attach_thumbnails(content_hash, file_path))
+    _thumbnail_tasks.add(task)
+    task.add_done_callback(_thumbnail_tasks.discard)
+
+
+def pick_rendition(original: str, thumbnails: Optional[Dict[str, str]], size: Optional[int] = None) -> Tuple[str, Optional[str]]:
+    """(path, size key) of the smallest thumbnail at least size pixels wide, the original when none fits or is ready"""
+    if size:
+        for rendition in sorted((thumbnails or {}).items(), key=lambda item: int(item[0])):
+            if int(rendition[0]) >= size:
+                return rendition[1], rendition[0]
+    return original, None
+
+
+def avatar_file_path(avatar: avatarOut, size: Optional[int] = None) -> str:
+    return pick_rendition(avatar.avatar_url, avatar.thumbnails, size)[0]
+
+
+async def get_avatar_blob(content_hash: str) -> Dict:
+    doc = await get_async_db()[BLOB_COLLECTION].find_one({"_id": content_hash, "refcount": {"$gt": 0}})
+    if not doc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
+    return doc
+
+
+def _write_chunk(buffer, hasher, chunk: bytes) -> None:
+    hasher.update(chunk)
+    buffer.write(chunk)
+
+
+def _place_blob(tmp_path: str, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Replacing an existing blob swaps in identical bytes, and also restores
+    # a file that went missing while its document survived
+    os.replace(tmp_path, path)
+
+
+async def _stream_to_temp(file: UploadFile, head: bytes) -> Tuple[str, str, int]:
+    """Copy the upload to a temporary file chunk by chunk and return (path, sha256, size).
+
+    The hash is computed while writing, so the content address is known
+    without reading the file back. File I/O runs in the default executor to
+    keep the event loop free.
+    """
+    tmp_path = os.path.join(upload_dir, f".{uuid.uuid4()}.tmp")
+    loop = asyncio.get_running_loop()
+    hasher = hashlib.sha256()
+    written = 0
+    buffer = await loop.run_in_executor(None, open, tmp_path, "wb")
+    try:
+        chunk: Optional[bytes] = head
+        while chunk:
+            written += len(chunk)
+            if written > AVATAR_MAX_BYTES:
+                raise _too_large()
+            await loop.run_in_executor(None, _write_chunk, buffer, hasher, chunk)
+            chunk = await file.read(AVATAR_CHUNK_SIZE)
+        await loop.run_in_executor(None, buffer.close)
+    except BaseException:
+        buffer.close()
+        await loop.run_in_executor(None, _remove_quietly, tmp_path)
+        raise
+    return tmp_path, hasher.hexdigest(), written
 
 
 async def upload_avatar(file: UploadFile, current_user: Dict) -> avatarOut:
     user_id = str(current_user.get("user_id"))
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
-    content_type = (file.content_type or "").lower()
-    allowed_types = {"image/jpeg", "image/jpg", "image/png", "image/*"}
-
-    # Read content first to allow type sniffing when needed
-    content = await file.read()
-
-    # Determine extension: prefer filename ext, else infer from content-type, else sniff
-    filename = file.filename or ""
-    file_extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
-    ct_to_ext = {"image/jpeg": "jpg", "image/jpg": "jpg", "image/png": "png", "image/*": ""}
-    if not file_extension and content_type in ct_to_ext:
-        file_extension = ct_to_ext.get(content_type, "")
-
-    # If content-type isn't explicitly allowed or extension unresolved, sniff bytes
-    def _is_png(data: bytes) -> bool:
-        return len(data) >= 8 and data[:8] == b"\x89PNG\r\n\x1a\n"
-
-    def _is_jpeg(data: bytes) -> bool:
-        return len(data) >= 2 and data[0:2] == b"\xff\xd8"
-
-    if content_type not in {"image/jpeg", "image/jpg", "image/png"} or not file_extension:
-        if _is_png(content):
-            content_type = "image/png"
-            file_extension = "png"
-        elif _is_jpeg(content):
-            content_type = "image/jpeg"
-            file_extension = "jpg"
-        else:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only JPEG and PNG are allowed")
 
-    if not file_extension:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Could not determine file extension from upload")
+    # The multipart parser already knows the part size; refuse before copying anything
+    if file.size is not None and file.size > AVATAR_MAX_BYTES:
+        raise _too_large()
+
+    # Only the first bytes are needed for type sniffing, the rest is streamed
+    head = await file.read(SNIFF_BYTES)
 
-    file_name = f"{uuid.uuid4()}.{file_extension}"
-    file_path = os.path.join(upload_dir, file_name)
+    # The stored extension, and with it the served media type, comes from the
+    # sniffed bytes only; a client filename or Content-Type could smuggle in
+    # html or svg that would be served from this origin
+    file_extension = sniff_image_extension(head)
+    if file_extension is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only JPEG and PNG are allowed")
 
+    tmp_path, content_hash, size = await _stream_to_temp(file, head)
+    loop = asyncio.get_running_loop()
     try:
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
+        blob = await _acquire_blob(content_hash, file_extension, size)
+    except BaseException:
+        await loop.run_in_executor(None, _remove_quietly, tmp_path)
+        raise
+    file_path = blob["path"]
 
-        database = get_db()
+    # Once the avatar document points at the blob, the reference taken above
+    # belongs to it and must survive any later failure
+    doc_written = False
+    try:
+        await loop.run_in_executor(None, _place_blob, tmp_path, file_path)
+        database = get_async_db()
         collection = database["avatar"]
 
         # Determine ObjectId form if possible
@@ -76,26 +312,24 @@ async def upload_avatar(file: UploadFile, current_user: Dict) -> avatarOut:
 
         # Find existing avatar by either ObjectId or string user_id
         if user_oid is not None:
-            existing_avatar = collection.find_one({"$or": [{"user_id": user_oid}, {"user_id_str": user_id}]})
+            existing_avatar = await collection.find_one({"$or": [{"user_id": user_oid}, {"user_id_str": user_id}]})
         else:
-            existing_avatar = collection.find_one({"user_id_str": user_id})
-        if existing_avatar and os.path.exists(existing_avatar.get("avatar_url", "")):
-            try:
-                os.remove(existing_avatar["avatar_url"])
-            except Exception:
-                pass
+            existing_avatar = await collection.find_one({"user_id_str": user_id})
 
         # Fetch user info to store alongside avatar
         employees = database["employees"]
         admins = database["admins"]
         user_doc = None
         if user_oid is not None:
-            user_doc = employees.find_one({"_id": user_oid}) or admins.find_one({"_id": user_oid})
+            user_doc = await employees.find_one({"_id": user_oid}) or await admins.find_one({"_id": user_oid})
 
         # Build new data to set/update
         data_to_set = {
             "user_id_str": user_id,
             "avatar_url": file_path,
+            "content_hash": content_hash,
+            # Filled in by the background thumbnail job for a new blob
+            "thumbnails": blob.get("thumbnails") or {},
             "user_info": {
                 "id": user_oid if user_oid is not None else None,
                 "employee_id": user_doc.get("employee_id") if user_doc else None,
@@ -111,93 +345,118 @@ async def upload_avatar(file: UploadFile, current_user: Dict) -> avatarOut:
 
         if existing_avatar:
             # Update existing doc without altering _id
-            collection.update_one({"_id": existing_avatar["_id"]}, {"$set": data_to_set})
+            await collection.update_one({"_id": existing_avatar["_id"]}, {"$set": data_to_set})
+            doc_written = True
             doc_id = existing_avatar["_id"]
             effective_user_id = existing_avatar.get("user_id", user_oid) or existing_avatar.get("user_id_str", user_id)
         else:
             # Insert new doc with new _id
             new_doc = {"_id": ObjectId(), **data_to_set}
-            collection.insert_one(new_doc)
+            await collection.insert_one(new_doc)
+            doc_written = True
             doc_id = new_doc["_id"]
             effective_user_id = new_doc.get("user_id", user_oid) or new_doc.get("user_id_str", user_id)
 
-        return avatarOut(id=str(doc_id), user_id=str(effective_user_id), avatar_url=data_to_set["avatar_url"])
+        avatar_url_cache.invalidate(user_id)
+        # The previous reference goes only once the document points at the new one
+        await _release_avatar(existing_avatar)
+        if not blob.get("thumbnails"):
+            _schedule_thumbnails(content_hash, file_path)
+
+        return avatarOut(
+            id=str(doc_id),
+            user_id=str(effective_user_id),
+            avatar_url=data_to_set["avatar_url"],
+            content_hash=content_hash,
+            thumbnails=data_to_set["thumbnails"],
+        )
     except HTTPException:
+        await loop.run_in_executor(None, _remove_quietly, tmp_path)
+        if not doc_written:
+            await _release_blob(content_hash)
         raise
     except Exception as e:
+        await loop.run_in_executor(None, _remove_quietly, tmp_path)
+        if not doc_written:
+            await _release_blob(content_hash)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to upload avatar: {str(e)}")
 
 
-def get_avatar(user_id: str, current_user: Dict) -> avatarOut:
-    database = get_db()
+async def get_avatar(user_id: str, current_user: Dict) -> avatarOut:
+    database = get_async_db()
     collection = database["avatar"]
     # Try by ObjectId first, fallback to string field
     found_avatar = None
     try:
         user_oid = ObjectId(user_id)
-        found_avatar = collection.find_one({"user_id": user_oid})
+        found_avatar = await collection.find_one({"user_id": user_oid})
     except Exception:
-        found_avatar = collection.find_one({"user_id_str": user_id})
+        found_avatar = await collection.find_one({"user_id_str": user_id})
     if not found_avatar:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
     if str(current_user.get("user_id")) != user_id and current_user.get("role") not in ["admin1", "admin2"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You can only get your own avatar")
-    return avatarOut(id=str(found_avatar["_id"]), user_id=str(found_avatar["user_id"]), avatar_url=found_avatar["avatar_url"])
+    return avatarOut(
+        id=str(found_avatar["_id"]),
+        user_id=str(found_avatar["user_id"]),
+        avatar_url=found_avatar["avatar_url"],
+        content_hash=found_avatar.get("content_hash"),
+        thumbnails=found_avatar.get("thumbnails") or {},
+    )
 
 
-def delete_avatar(user_id: str, current_user: Dict) -> Dict[str, str]:
+async def delete_avatar(user_id: str, current_user: Dict) -> Dict[str, str]:
     if str(current_user.get("user_id")) != user_id and current_user.get("role") not in ["admin1", "admin2"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You can only delete your own avatar")
 
-    database = get_db()
+    database = get_async_db()
     collection = database["avatar"]
     # Try by ObjectId first, fallback to string field
     found_avatar = None
     try:
         user_oid = ObjectId(user_id)
-        found_avatar = collection.find_one({"user_id": user_oid})
+        found_avatar = await collection.find_one({"user_id": user_oid})
     except Exception:
-        found_avatar = collection.find_one({"user_id_str": user_id})
+        found_avatar = await collection.find_one({"user_id_str": user_id})
     if not found_avatar:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
 
     try:
-        avatar_path = found_avatar.get("avatar_url", "")
-        if avatar_path and os.path.exists(avatar_path):
-            os.remove(avatar_path)
         if "_id" in found_avatar:
-            collection.delete_one({"_id": found_avatar["_id"]})
+            deleted = await collection.find_one_and_delete({"_id": found_avatar["_id"]})
         else:
-            collection.delete_one({"user_id_str": user_id})
+            deleted = await collection.find_one_and_delete({"user_id_str": user_id})
+        # Only the request that actually removed the document drops its reference
+        avatar_url_cache.invalidate(user_id)
+        await _release_avatar(deleted)
         return {"message": "Avatar deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
-def delete_my_avatar(current_user: Dict) -> Dict[str, str]:
+async def delete_my_avatar(current_user: Dict) -> Dict[str, str]:
     user_id = str(current_user.get("user_id"))
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
-    database = get_db()
+    database = get_async_db()
     collection = database["avatar"]
 
     # Try by ObjectId first, fallback to string
     found_avatar = None
     try:
         user_oid = ObjectId(user_id)
-        found_avatar = collection.find_one({"$or": [{"user_id": user_oid}, {"user_id_str": user_id}]})
+        found_avatar = await collection.find_one({"$or": [{"user_id": user_oid}, {"user_id_str": user_id}]})
     except Exception:
-        found_avatar = collection.find_one({"user_id_str": user_id})
+        found_avatar = await collection.find_one({"user_id_str": user_id})
 
     if not found_avatar:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
 
     try:
-        avatar_path = found_avatar.get("avatar_url", "")
-        if avatar_path and os.path.exists(avatar_path):
-            os.remove(avatar_path)
-        collection.delete_one({"_id": found_avatar["_id"]})
+        deleted = await collection.find_one_and_delete({"_id": found_avatar["_id"]})
+        avatar_url_cache.invalidate(user_id)
+        await _release_avatar(deleted)
         return {"message": "Avatar deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
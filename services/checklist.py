@@ -1,9 +1,12 @@
 from datetime import datetime
 from bson import ObjectId
 from fastapi import HTTPException, status
-from typing import Optional, List
+from pymongo import ReturnDocument
+from typing import Optional, List, Tuple
 from models.checklist import ChecklistCreate, ChecklistOut, ChecklistUpdate
-from utils.db import get_db
+from utils.db import get_async_db
+from utils.pagination import fetch_page
+from utils.versioning import version_filter, bump_version, version_conflict
 from services.log import logger, create_log
 from models.log import logCreate
 
@@ -23,11 +26,12 @@ def _map_document_to_checklist_out(document: dict) -> ChecklistOut:
         created_by=document["created_by"],
         created_at=document["created_at"],
         updated_at=document["updated_at"],
+        version=document.get("version", 0),
     )
     return result
 
-def create_checklist(data: ChecklistCreate, current_user: dict) -> ChecklistOut:
-    db = get_db("checklists_db")
+async def create_checklist(data: ChecklistCreate, current_user: dict) -> ChecklistOut:
+    db = get_async_db("checklists_db")
     collection = db["checklist"]
 
     now = datetime.now()
@@ -44,14 +48,15 @@ def create_checklist(data: ChecklistCreate, current_user: dict) -> ChecklistOut:
         "created_by": current_user.get("user_id"),
         "created_at": now,
         "updated_at": now,
+        "version": 0,
     }
 
-    result = collection.insert_one(checklist_data)
+    result = await collection.insert_one(checklist_data)
     checklist_data["_id"] = result.inserted_id
     checklist_data["checklist_id"] = str(result.inserted_id)
     try:
         if current_user and current_user.get("user_id"):
-            create_log(
+            await create_log(
                 logCreate(
                     action_type="checklist_create",
                     user_id=current_user["user_id"],
@@ -64,15 +69,16 @@ def create_checklist(data: ChecklistCreate, current_user: dict) -> ChecklistOut:
     return _map_document_to_checklist_out(checklist_data)
 
 
-def get_checklist(
+async def get_checklist(
     task_id: Optional[str] = None,
     title: Optional[str] = None,
     description: Optional[str] = None,
     limit: int = 20,
     offset: int = 0,
     current_user: dict = None,
-) -> List[ChecklistOut]:
-    db = get_db("checklists_db")
+    cursor: Optional[str] = None,
+) -> Tuple[List[ChecklistOut], Optional[str]]:
+    db = get_async_db("checklists_db")
     collection = db["checklist"]
 
     filter_query: dict = {}
@@ -92,64 +98,83 @@ def get_checklist(
         except Exception:
             filter_query["assigned_to"] = current_user["user_id"]
 
-    cursor = collection.find(filter_query).skip(offset).limit(limit)
+    documents, next_cursor = await fetch_page(collection, filter_query, limit=limit, cursor=cursor, offset=offset)
     items: List[ChecklistOut] = []
-    for document in cursor:
+    for document in documents:
         items.append(_map_document_to_checklist_out(document))
-    return items
+    return items, next_cursor
 
 
-def update_checklist(
+async def update_checklist(
     checklist_id: str, update_data: ChecklistUpdate, current_user: dict = None
 ) -> ChecklistOut:
-    db = get_db("checklists_db")
+    db = get_async_db("checklists_db")
     collection = db["checklist"]
 
-    existing = collection.find_one({"_id": ObjectId(checklist_id)})
-    if not existing:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Checklist not found",
-        )
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Access denied"
         )
     is_manager = current_user.get("role") in ["manager", "admin1", "admin2"]
     current_user_id = current_user.get("user_id")
-    is_owner = current_user_id in {existing.get("assigned_to"), existing.get("created_by")}
-    if not (is_manager or is_owner):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Access denied"
-        )
 
     update_fields = {k: v for k, v in update_data.model_dump(exclude_unset=True).items()}
+    expected_version = update_fields.pop("version", None)
+    query = {"_id": ObjectId(checklist_id)}
+    if not is_manager:
+        query["$or"] = [{"assigned_to": current_user_id}, {"created_by": current_user_id}]
+    if expected_version is not None:
+        query = {"$and": [query, version_filter(expected_version)]}
+
     if not update_fields:
+        updated = await collection.find_one(query)
+    else:
+        update_fields["updated_at"] = datetime.now()
+        updated = await collection.find_one_and_update(
+            query,
+            bump_version({"$set": update_fields}),
+            return_document=ReturnDocument.AFTER,
+        )
+    if not updated:
+        existing = await collection.find_one({"_id": ObjectId(checklist_id)})
+        if not existing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Checklist not found",
+            )
+        is_owner = current_user_id in {existing.get("assigned_to"), existing.get("created_by")}
+        if not (is_manager or is_owner):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN, detail="Access denied"
+            )
+        version_conflict(expected_version, existing)
+        if update_fields:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Checklist was modified concurrently",
+            )
         return _map_document_to_checklist_out(existing)
 
-    update_fields["updated_at"] = datetime.now()
-
-    collection.update_one({"_id": ObjectId(checklist_id)}, {"$set": update_fields})
-    updated = collection.find_one({"_id": ObjectId(checklist_id)})
-    try:
-        if current_user and current_user.get("user_id"):
-            create_log(
-                logCreate(
-                    action_type="checklist_update",
-                    user_id=current_user["user_id"],
-                    description=f"Updated checklist {checklist_id}"
-                ),
-                current_user,
-            )
-    except Exception:
-        pass
+    if update_fields:
+        try:
+            if current_user and current_user.get("user_id"):
+                await create_log(
+                    logCreate(
+                        action_type="checklist_update",
+                        user_id=current_user["user_id"],
+                        description=f"Updated checklist {checklist_id}"
+                    ),
+                    current_user,
+                )
+        except Exception:
+            pass
     return _map_document_to_checklist_out(updated)
 
 
-def delete_checklist(checklist_id: str, current_user: dict):
-    db = get_db("checklists_db")
+async def delete_checklist(checklist_id: str, current_user: dict):
+    db = get_async_db("checklists_db")
     collection = db["checklist"]
-    existing = collection.find_one({"_id": ObjectId(checklist_id)})
+    existing = await collection.find_one({"_id": ObjectId(checklist_id)})
     if not existing:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Checklist not found"
@@ -165,10 +190,10 @@ def delete_checklist(checklist_id: str, current_user: dict):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Access denied"
         )
-    collection.delete_one({"_id": ObjectId(checklist_id)})
+    await collection.delete_one({"_id": ObjectId(checklist_id)})
     try:
         if current_user and current_user.get("user_id"):
-            create_log(
+            await create_log(
                 logCreate(
                     action_type="checklist_delete",
                     user_id=current_user["user_id"],
@@ -1,13 +1,105 @@
-from typing import Dict
+import os
+from datetime import datetime
+from typing import Dict, Optional
 from fastapi import HTTPException, status
 from bson import ObjectId
 from models.dashboard import DashboardStats
-from utils.db import get_db
-from typing import Dict
-from services.avatar import get_avatar
+from utils.db import get_async_db
+from utils.cache import TTLCache
+from services.log import logger
 
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "5"))
+# Interval of the maintenance job that recounts the stats document to correct drift
+DASHBOARD_STATS_REBUILD_SECONDS = int(os.getenv("DASHBOARD_STATS_REBUILD_SECONDS", "3600"))
 
-def get_dashboard(current_user: dict) -> DashboardStats:
+STATS_DOC_ID = "global"
+COUNTED_COLLECTIONS = ("reports", "leave_requests")
+
+stats_cache = TTLCache(maxsize=1, ttl=DASHBOARD_CACHE_TTL)
+# Avatar URL per user id; users without an avatar are cached as None
+avatar_url_cache = TTLCache(maxsize=1024, ttl=DASHBOARD_CACHE_TTL)
+_MISSING = object()
+
+
+async def rebuild_dashboard_stats() -> dict:
+    """Recount reports and leave requests by status and store the result as the stats document"""
+    db = get_async_db()
+    stats = {"_id": STATS_DOC_ID, "rebuilt_at": datetime.now()}
+    for name in COUNTED_COLLECTIONS:
+        by_status: Dict[str, int] = {}
+        total = 0
+        async for doc in db[name].aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            total += doc["count"]
+            if doc.get("_id") is not None:
+                by_status[doc["_id"]] = doc["count"]
+        stats[name] = {"total": total, "by_status": by_status}
+    await db["dashboard_stats"].replace_one({"_id": STATS_DOC_ID}, stats, upsert=True)
+    return stats
+
+
+async def refresh_dashboard_stats() -> int:
+    """Maintenance job: rebuild the stats document and return how many documents were counted"""
+    stats = await rebuild_dashboard_stats()
+    stats_cache.invalidate(STATS_DOC_ID)
+    return sum(stats[name]["total"] for name in COUNTED_COLLECTIONS)
+
+
+async def record_status_change(collection: str, old_status: Optional[str], new_status: Optional[str]) -> None:
+    """Move the dashboard counters for one document of collection.
+
+    old_status is None for a newly created document and new_status is None for
+    a deleted one. The stats document is not upserted, a missing one is rebuilt
+    on the next dashboard read; drift is corrected by refresh_dashboard_stats.
+    """
+    delta: Dict[str, int] = {}
+    if old_status is None:
+        delta[f"{collection}.total"] = 1
+    else:
+        delta[f"{collection}.by_status.{old_status}"] = -1
+    if new_status is None:
+        delta[f"{collection}.total"] = delta.get(f"{collection}.total", 0) - 1
+    else:
+        key = f"{collection}.by_status.{new_status}"
+        delta[key] = delta.get(key, 0) + 1
+    delta = {field: value for field, value in delta.items() if value}
+    stats_cache.invalidate(STATS_DOC_ID)
+    if not delta:
+        return
+    try:
+        await get_async_db()["dashboard_stats"].update_one({"_id": STATS_DOC_ID}, {"$inc": delta})
+    except Exception as e:
+        logger.error(f"Error updating dashboard stats: {str(e)}")
+
+
+async def _load_stats() -> dict:
+    stats = stats_cache.get(STATS_DOC_ID)
+    if stats is not None:
+        return stats
+    stats = await get_async_db()["dashboard_stats"].find_one({"_id": STATS_DOC_ID})
+    if stats is None:
+        stats = await rebuild_dashboard_stats()
+    stats_cache.set(STATS_DOC_ID, stats)
+    return stats
+
+
+async def _load_avatar_url(user_id: Optional[str]) -> Optional[str]:
+    avatar_url = avatar_url_cache.get(user_id, _MISSING)
+    if avatar_url is not _MISSING:
+        return avatar_url
+    try:
+        avatar = await get_async_db()["avatar"].find_one({"user_id": ObjectId(user_id)}, {"avatar_url": 1})
+    except Exception:
+        return None
+    avatar_url = avatar.get("avatar_url") if avatar else None
+    avatar_url_cache.set(user_id, avatar_url)
+    return avatar_url
+
+
+def _positive_counts(counts: Optional[dict]) -> Dict[str, int]:
+    return {key: count for key, count in (counts or {}).items() if count > 0}
+
+
+async def get_dashboard(current_user: dict) -> DashboardStats:
     allowed_roles = {"manager_women", "manager_men", "admin1", "admin2"}
     if current_user.get("role") not in allowed_roles:
         raise HTTPException(
@@ -15,30 +107,17 @@ def get_dashboard(current_user: dict) -> DashboardStats:
             detail="No access to dashboard",
         )
 
-    db = get_db()
-
-    reports_coll = db["reports"]
-    total_reports = reports_coll.count_documents({})
-    reports_by_status_cursor = reports_coll.aggregate([
-        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
-    ])
-    reports_by_status: Dict[str, int] = {doc["_id"]: doc["count"] for doc in reports_by_status_cursor if doc.get("_id") is not None}
-
-    leaves_coll = db["leave_requests"]
-    total_leave_request = leaves_coll.count_documents({})
-    leave_by_status_cursor = leaves_coll.aggregate([
-        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
-    ])
-    leave_request_by_status: Dict[str, int] = {doc["_id"]: doc["count"] for doc in leave_by_status_cursor if doc.get("_id") is not None}
-    avatar_url=get_avatar(current_user["user_id"],current_user).avatar_url if db["avatar"].find_one({"user_id":ObjectId(current_user["user_id"])})else None
-    
+    stats = await _load_stats()
+    reports = stats.get("reports") or {}
+    leave_requests = stats.get("leave_requests") or {}
+
+    avatar_url = await _load_avatar_url(current_user.get("user_id"))
+
     return DashboardStats(
-        total_reports=total_reports,
-        reports_by_status=reports_by_status,
-        total_leave_request=total_leave_request,
-        leave_request_by_status=leave_request_by_status,
+        total_reports=reports.get("total", 0),
+        reports_by_status=_positive_counts(reports.get("by_status")),
+        total_leave_request=leave_requests.get("total", 0),
+        leave_request_by_status=_positive_counts(leave_requests.get("by_status")),
         user_id=str(current_user.get("user_id")) if current_user.get("user_id") is not None else None,
-        avatar_url=avatar_url    
-    
+        avatar_url=avatar_url
     )
-
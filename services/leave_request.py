@@ -3,18 +3,22 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from bson import ObjectId
 from fastapi import HTTPException, status
+from pymongo import ReturnDocument
 
 from models.leave_request import LeaveRequestCreate, LeaveRequestOut, LeaveRequestUpdate
-from utils.db import get_db
+from utils.db import get_async_db
+from utils.pagination import fetch_page
+from utils.versioning import version_filter, bump_version, version_conflict
 from services.log import logger, create_log
+from services.dashboard import record_status_change
 from models.log import logCreate
 
 
-def create_leave_request(data: LeaveRequestCreate, current_user: dict) -> dict:
-    db = get_db()
+async def create_leave_request(data: LeaveRequestCreate, current_user: dict) -> dict:
+    db = get_async_db()
     collection = db["leave_requests"]
     now = datetime.now()
     doc = {
@@ -26,13 +30,15 @@ def create_leave_request(data: LeaveRequestCreate, current_user: dict) -> dict:
         "created_by": current_user.get("user_id") if current_user else None,
         "created_at": now,
         "updated_at": now,
+        "version": 0,
     }
     try:
-        result = collection.insert_one(doc)
+        result = await collection.insert_one(doc)
+        await record_status_change("leave_requests", None, doc["status"])
         doc["_id"] = str(result.inserted_id)
         try:
             if current_user and current_user.get("user_id"):
-                create_log(
+                await create_log(
                     logCreate(
                         action_type="leave_create",
                         user_id=current_user["user_id"],
@@ -48,13 +54,14 @@ def create_leave_request(data: LeaveRequestCreate, current_user: dict) -> dict:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create leave request")
 
 
-def get_leave_requests(
+async def get_leave_requests(
     user_id: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
     current_user: dict = None,
-) -> List[dict]:
-    db = get_db()
+    cursor: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    db = get_async_db()
     collection = db["leave_requests"]
     query = {}
     if current_user and current_user.get("role") == "employee":
@@ -65,205 +72,235 @@ def get_leave_requests(
         except Exception:
             query["created_by"] = user_id
     try:
-        cursor = collection.find(query).skip(offset).limit(limit)
+        docs, next_cursor = await fetch_page(collection, query, limit=limit, cursor=cursor, offset=offset)
         results = []
-        for doc in cursor:
+        for doc in docs:
             doc["_id"] = str(doc["_id"])
             results.append(doc)
-        return results
+        return results, next_cursor
+    except HTTPException:
+        raise
     except Exception as exc:
         logger.exception("Error fetching leave requests: %s", exc)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch leave requests")
 
 
-def update_leave_request(leave_id: str, update_data: LeaveRequestUpdate, current_user: dict = None) -> dict:
-    db = get_db()
+async def update_leave_request(leave_id: str, update_data: LeaveRequestUpdate, current_user: dict = None) -> dict:
+    db = get_async_db()
     collection = db["leave_requests"]
-    existing = collection.find_one({"_id": ObjectId(leave_id)})
-    if not existing:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Leave request not found")
-
     update_fields = {k: v for k, v in update_data.dict(exclude_unset=True).items()}
+    expected_version = update_fields.pop("version", None)
+    query = {"_id": ObjectId(leave_id), **version_filter(expected_version)}
+
     if not update_fields:
+        existing = await collection.find_one({"_id": ObjectId(leave_id)})
+        if not existing:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Leave request not found")
+        version_conflict(expected_version, existing)
+        existing["_id"] = str(existing["_id"])
         return existing
 
     update_fields["updated_at"] = datetime.now()
     try:
-        collection.update_one({"_id": ObjectId(leave_id)}, {"$set": update_fields})
-        updated = collection.find_one({"_id": ObjectId(leave_id)})
-        if updated:
-            updated["_id"] = str(updated["_id"])
-        try:
-            if current_user and current_user.get("user_id"):
-                create_log(
-                    logCreate(
-                        action_type="leave_update",
-                        user_id=current_user["user_id"],
-                        description=f"Updated leave request {leave_id}"
-                    ),
-                    current_user,
-                )
-        except Exception:
-            pass
-        return updated
+        updated = await collection.find_one_and_update(
+            query,
+            bump_version({"$set": update_fields}),
+            return_document=ReturnDocument.AFTER,
+        )
     except Exception as exc:
         logger.exception("Error updating leave request %s: %s", leave_id, exc)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to update leave request")
+    if not updated:
+        existing = await collection.find_one({"_id": ObjectId(leave_id)})
+        if not existing:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Leave request not found")
+        version_conflict(expected_version, existing)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Leave request was modified concurrently")
+    updated["_id"] = str(updated["_id"])
+    try:
+        if current_user and current_user.get("user_id"):
+            await create_log(
+                logCreate(
+                    action_type="leave_update",
+                    user_id=current_user["user_id"],
+                    description=f"Updated leave request {leave_id}"
+                ),
+                current_user,
+            )
+    except Exception:
+        pass
+    return updated
 
 
-def delete_leave_request(leave_id: str, current_user: dict) -> dict:
-    db = get_db()
+async def delete_leave_request(leave_id: str, current_user: dict) -> dict:
+    db = get_async_db()
     collection = db["leave_requests"]
-    existing = collection.find_one({"_id": ObjectId(leave_id)})
-    if not existing:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Leave request not found")
+    query = {"_id": ObjectId(leave_id)}
+    if current_user and current_user.get("role") == "employee":
+        query["created_by"] = current_user.get("user_id")
     try:
-        res = collection.delete_one({"_id": ObjectId(leave_id)})
-        if res.deleted_count == 0:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to delete leave request")
-        try:
-            if current_user and current_user.get("user_id"):
-                create_log(
-                    logCreate(
-                        action_type="leave_delete",
-                        user_id=current_user["user_id"],
-                        description=f"Deleted leave request {leave_id}"
-                    ),
-                    current_user,
-                )
-        except Exception:
-            pass
-        return {"message": "Leave request deleted"}
+        deleted = await collection.find_one_and_delete(query, {"status": 1})
     except Exception as exc:
         logger.exception("Error deleting leave request %s: %s", leave_id, exc)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to delete leave request")
+    if not deleted:
+        existing = await collection.find_one({"_id": ObjectId(leave_id)}, {"created_by": 1})
+        if not existing:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Leave request not found")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    await record_status_change("leave_requests", deleted.get("status"), None)
+    try:
+        if current_user and current_user.get("user_id"):
+            await create_log(
+                logCreate(
+                    action_type="leave_delete",
+                    user_id=current_user["user_id"],
+                    description=f"Deleted leave request {leave_id}"
+                ),
+                current_user,
+            )
+    except Exception:
+        pass
+    return {"message": "Leave request deleted"}
 
 
-def approve_leave_phase1(leave_id: str, current_user: dict) -> dict:
-    db = get_db()
-    collection = db["leave_requests"]
+_ALLOWED_APPROVER_ROLES = {"manager_women", "manager_men", "admin1", "admin2"}
+
+
+async def _transition_leave(
+    leave_id: str,
+    current_user: dict,
+    from_statuses: Tuple[str, ...],
+    update_payload: dict,
+    invalid_state_detail: str,
+) -> dict:
+    """Move a leave request to a new state in one round trip, only if it is still in one of from_statuses"""
+    user_role = current_user.get("role") if current_user else None
+    if user_role not in _ALLOWED_APPROVER_ROLES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
     try:
-        existing = collection.find_one({"_id": ObjectId(leave_id)})
+        object_id = ObjectId(leave_id)
     except Exception:
-        existing = None
-    if not existing:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Leave request not found")
 
-    user_role = current_user.get("role") if current_user else None
-    allowed_roles = {"manager_women", "manager_men", "admin1", "admin2"}
-    if user_role not in allowed_roles:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    collection = get_async_db()["leave_requests"]
+    # The pre-image tells which state the request left, for the dashboard counters
+    previous = await collection.find_one_and_update(
+        {"_id": object_id, "status": {"$in": list(from_statuses)}},
+        bump_version({"$set": update_payload}),
+        return_document=ReturnDocument.BEFORE,
+    )
+    if not previous:
+        if not await collection.find_one({"_id": object_id}, {"_id": 1}):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Leave request not found")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=invalid_state_detail)
+    await record_status_change("leave_requests", previous.get("status"), update_payload["status"])
+    updated = {**previous, **update_payload, "version": previous.get("version", 0) + 1}
+    updated["_id"] = str(updated["_id"])
+    return updated
 
+
+async def approve_leave_phase1(leave_id: str, current_user: dict) -> dict:
+    now = datetime.now()
     try:
-        now = datetime.now()
-        update_payload = {
-            "status": "pending_phase2",
-            "approval_phase1_by": current_user.get("user_id"),
-            "approval_phase1_at": now,
-            "updated_at": now,
-        }
-        collection.update_one({"_id": ObjectId(leave_id)}, {"$set": update_payload})
-        updated = collection.find_one({"_id": ObjectId(leave_id)})
-        if updated:
-            updated["_id"] = str(updated["_id"])
-        try:
-            if current_user and current_user.get("user_id"):
-                create_log(
-                    logCreate(
-                        action_type="leave_approve_phase1",
-                        user_id=current_user["user_id"],
-                        description=f"Approved phase1 leave request {leave_id}"
-                    ),
-                    current_user,
-                )
-        except Exception:
-            pass
-        return updated
+        updated = await _transition_leave(
+            leave_id,
+            current_user,
+            ("pending_phase1",),
+            {
+                "status": "pending_phase2",
+                "approval_phase1_by": current_user.get("user_id"),
+                "approval_phase1_at": now,
+                "updated_at": now,
+            },
+            "Leave request is not awaiting phase1 approval",
+        )
+    except HTTPException:
+        raise
     except Exception as exc:
         logger.exception("Error approving leave (phase1) %s: %s", leave_id, exc)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to approve leave (phase1)")
+    try:
+        if current_user and current_user.get("user_id"):
+            await create_log(
+                logCreate(
+                    action_type="leave_approve_phase1",
+                    user_id=current_user["user_id"],
+                    description=f"Approved phase1 leave request {leave_id}"
+                ),
+                current_user,
+            )
+    except Exception:
+        pass
+    return updated
 
 
-def approve_leave_phase2(leave_id: str, current_user: dict) -> dict:
-    db = get_db()
-    collection = db["leave_requests"]
-    existing = collection.find_one({"_id": ObjectId(leave_id)})
-    if not existing:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Leave request not found")
-
-    user_role = current_user.get("role") if current_user else None
-    allowed_roles = {"manager_women", "manager_men", "admin1", "admin2"}
-    if user_role not in allowed_roles:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
-
+async def approve_leave_phase2(leave_id: str, current_user: dict) -> dict:
+    now = datetime.now()
     try:
-        now = datetime.now()
-        update_payload = {
-            "status": "approved",
-            "approval_phase2_by": current_user.get("user_id"),
-            "approval_phase2_at": now,
-            "updated_at": now,
-        }
-        collection.update_one({"_id": ObjectId(leave_id)}, {"$set": update_payload})
-        updated = collection.find_one({"_id": ObjectId(leave_id)})
-        if updated:
-            updated["_id"] = str(updated["_id"])
-        try:
-            if current_user and current_user.get("user_id"):
-                create_log(
-                    logCreate(
-                        action_type="leave_approve_phase2",
-                        user_id=current_user["user_id"],
-                        description=f"Approved phase2 leave request {leave_id}"
-                    ),
-                    current_user,
-                )
-        except Exception:
-            pass
-        return updated
+        updated = await _transition_leave(
+            leave_id,
+            current_user,
+            ("pending_phase2",),
+            {
+                "status": "approved",
+                "approval_phase2_by": current_user.get("user_id"),
+                "approval_phase2_at": now,
+                "updated_at": now,
+            },
+            "Leave request is not awaiting phase2 approval",
+        )
+    except HTTPException:
+        raise
     except Exception as exc:
         logger.exception("Error approving leave (phase2) %s: %s", leave_id, exc)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to approve leave (phase2)")
+    try:
+        if current_user and current_user.get("user_id"):
+            await create_log(
+                logCreate(
+                    action_type="leave_approve_phase2",
+                    user_id=current_user["user_id"],
+                    description=f"Approved phase2 leave request {leave_id}"
+                ),
+                current_user,
+            )
+    except Exception:
+        pass
+    return updated
 
 
-def reject_leave_request(leave_id: str, current_user: dict, reason: Optional[str] = None) -> dict:
-    db = get_db()
-    collection = db["leave_requests"]
-    existing = collection.find_one({"_id": ObjectId(leave_id)})
-    if not existing:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Leave request not found")
-
-    user_role = current_user.get("role") if current_user else None
-    allowed_roles = {"manager_women", "manager_men", "admin1", "admin2"}
-    if user_role not in allowed_roles:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
-
+async def reject_leave_request(leave_id: str, current_user: dict, reason: Optional[str] = None) -> dict:
+    now = datetime.now()
     try:
-        now = datetime.now()
-        update_payload = {
-            "status": "rejected",
-            "rejected_by": current_user.get("user_id"),
-            "rejected_at": now,
-            "rejection_reason": reason,
-            "updated_at": now,
-        }
-        collection.update_one({"_id": ObjectId(leave_id)}, {"$set": update_payload})
-        updated = collection.find_one({"_id": ObjectId(leave_id)})
-        if updated:
-            updated["_id"] = str(updated["_id"])
-        try:
-            if current_user and current_user.get("user_id"):
-                create_log(
-                    logCreate(
-                        action_type="leave_reject",
-                        user_id=current_user["user_id"],
-                        description=f"Rejected leave request {leave_id}"
-                    ),
-                    current_user,
-                )
-        except Exception:
-            pass
-        return updated
+        updated = await _transition_leave(
+            leave_id,
+            current_user,
+            ("pending_phase1", "pending_phase2"),
+            {
+                "status": "rejected",
+                "rejected_by": current_user.get("user_id"),
+                "rejected_at": now,
+                "rejection_reason": reason,
+                "updated_at": now,
+            },
+            "Leave request has already been decided",
+        )
+    except HTTPException:
+        raise
     except Exception as exc:
         logger.exception("Error rejecting leave %s: %s", leave_id, exc)
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to reject leave request")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to reject leave request")
+    try:
+        if current_user and current_user.get("user_id"):
+            await create_log(
+                logCreate(
+                    action_type="leave_reject",
+                    user_id=current_user["user_id"],
+                    description=f"Rejected leave request {leave_id}"
+                ),
+                current_user,
+            )
+    except Exception:
+        pass
+    return updated
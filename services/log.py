@@ -1,12 +1,16 @@
+import asyncio
+import functools
 import logging
+import os
 from fastapi import HTTPException, status
 from pymongo import MongoClient,collection
 from bson import ObjectId
 from datetime import datetime, timedelta
-from typing import Collection, List, Optional
+from typing import Collection, List, Optional, Tuple
 from models.log import logCreate, logOut
-from utils.db import get_db
-from pymongo import ASCENDING, DESCENDING
+from utils.db import get_async_db
+from utils.pagination import fetch_page
+from pymongo import DESCENDING
 
 
 logger = logging.getLogger("employee_app")
@@ -19,6 +23,17 @@ if not logger.handlers:
 
 
 def service_exception(func):
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except Exception as exc:
+                logger.exception("Service exception in %s: %s", func.__name__, exc)
+                raise
+        return async_wrapper
+
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
@@ -27,23 +42,105 @@ def service_exception(func):
             raise
     return wrapper
 
-def create_log_indexes():
-    try:
-        db = get_db()
-        collection = db["logs"]
-        collection.create_index([("created_at", DESCENDING)])
-        collection.create_index([("action_type", ASCENDING)])
-        collection.create_index([("user_id", ASCENDING)])
-        logger.info("Log indexes created successfully")
-    except Exception as e:
-        logger.error(f"Error creating log indexes: {str(e)}")
+AUDIT_LOG_MODE = os.getenv("AUDIT_LOG_MODE", "buffered")
+AUDIT_LOG_BATCH_SIZE = int(os.getenv("AUDIT_LOG_BATCH_SIZE", "100"))
+AUDIT_LOG_FLUSH_INTERVAL = float(os.getenv("AUDIT_LOG_FLUSH_INTERVAL", "1.0"))
+AUDIT_LOG_QUEUE_SIZE = int(os.getenv("AUDIT_LOG_QUEUE_SIZE", "10000"))
+AUDIT_LOG_ENQUEUE_TIMEOUT = float(os.getenv("AUDIT_LOG_ENQUEUE_TIMEOUT", "0.5"))
 
-create_log_indexes()
 
-def create_log(data:logCreate,current_user:dict)->logOut:
-    db=get_db()
-    collection=db["logs"]
+class AuditLogWriter:
+    """Buffers audit log entries in memory and writes them with insert_many.
+
+    A batch is flushed when it reaches batch_size entries or when
+    flush_interval seconds have passed since its first entry. When the queue
+    is full, submit() waits up to enqueue_timeout seconds and then writes the
+    entry directly, so producers are slowed down instead of dropping entries.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = AUDIT_LOG_BATCH_SIZE,
+        flush_interval: float = AUDIT_LOG_FLUSH_INTERVAL,
+        queue_size: int = AUDIT_LOG_QUEUE_SIZE,
+        enqueue_timeout: float = AUDIT_LOG_ENQUEUE_TIMEOUT,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.enqueue_timeout = enqueue_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run())
+        logger.info("Audit log writer started (batch_size=%s, flush_interval=%ss)", self.batch_size, self.flush_interval)
+
+    async def stop(self) -> None:
+        """Flush everything still queued and stop the background task"""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._queue = None
+        logger.info("Audit log writer stopped")
+
+    async def submit(self, entry: dict) -> None:
+        if not self.running:
+            await self._write([entry])
+            return
+        try:
+            await asyncio.wait_for(self._queue.put(entry), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Audit log queue is full, writing entry directly")
+            await self._write([entry])
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            entry = await self._queue.get()
+            if entry is None:
+                break
+            batch = [entry]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+            try:
+                await self._write(batch)
+            except Exception as e:
+                logger.error(f"Error writing {len(batch)} audit log entries: {str(e)}")
+
+    async def _write(self, entries: List[dict]) -> None:
+        collection = get_async_db()["logs"]
+        if len(entries) == 1:
+            await collection.insert_one(entries[0])
+        else:
+            await collection.insert_many(entries, ordered=False)
+
+
+audit_log_writer = AuditLogWriter()
+
 
+async def create_log(data:logCreate,current_user:dict)->logOut:
     log_data={
             "_id":ObjectId(),
             "action_type":data.action_type,
@@ -53,7 +150,10 @@ def create_log(data:logCreate,current_user:dict)->logOut:
     }
 
     try:
-        collection.insert_one(log_data)
+        if AUDIT_LOG_MODE == "sync":
+            await get_async_db()["logs"].insert_one(log_data)
+        else:
+            await audit_log_writer.submit(log_data)
         return logOut(
             _id=str(log_data["_id"]),
             action_type=log_data["action_type"],
@@ -65,12 +165,12 @@ def create_log(data:logCreate,current_user:dict)->logOut:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,detail=str(e))
 
 
-def get_logs(current_user:dict,limit : int=20,offset:int=0,recent_hours:Optional[int]=None)->list[logOut]:
+async def get_logs(current_user:dict,limit : int=20,offset:int=0,recent_hours:Optional[int]=None,cursor:Optional[str]=None)->Tuple[list[logOut],Optional[str]]:
     allowed_roles={"manager_men","manager_women","admin1","admin2"}
     if current_user.get("role") not in allowed_roles:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,detail="Access denied")
 
-    db=get_db()
+    db=get_async_db()
     collection=db["logs"]
     filter_query={}
     if recent_hours is not None and recent_hours>0:
@@ -78,15 +178,17 @@ def get_logs(current_user:dict,limit : int=20,offset:int=0,recent_hours:Optional
         filter_query["created_at"]={"$gte":from_time}
 
     try:
-        cursor=(
-            collection
-            .find(filter_query)
-            .sort("created_at",-1)
-            .skip(offset)
-            .limit(limit)
+        docs,next_cursor=await fetch_page(
+            collection,
+            filter_query,
+            sort_field="created_at",
+            direction=DESCENDING,
+            limit=limit,
+            cursor=cursor,
+            offset=offset,
         )
         results=[]
-        for doc in cursor:
+        for doc in docs:
             results.append(
                 logOut(
                     _id=str(doc.get("_id")),
@@ -96,7 +198,9 @@ def get_logs(current_user:dict,limit : int=20,offset:int=0,recent_hours:Optional
                     created_at=doc.get("created_at"),
                 )
             )
-        return results
+        return results,next_cursor
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Error fetching logs: %s", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,detail=str(e))
@@ -0,0 +1,46 @@
+import os
+from typing import Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from utils.db import get_async_db
+from utils.cache import TTLCache
+
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "15"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+PRINCIPAL_FIELDS = {"role": 1, "status": 1, "employee_id": 1, "full_name": 1}
+
+# user_id -> current role, status, employee_id and full_name of the employee or
+# admin behind a token. Writes in this process invalidate their entry; changes
+# made by other processes are picked up once the short TTL runs out.
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+
+async def load_principal(user_id: str) -> Optional[dict]:
+    """Current attributes of the employee or admin with this id, None when neither exists"""
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    try:
+        object_id = ObjectId(user_id)
+    except (InvalidId, TypeError):
+        return None
+    db = get_async_db()
+    doc = await db["employees"].find_one({"_id": object_id}, PRINCIPAL_FIELDS)
+    if doc is None:
+        doc = await db["admins"].find_one({"_id": object_id}, PRINCIPAL_FIELDS)
+    if doc is None:
+        return None
+    principal = {
+        "role": doc.get("role"),
+        "status": doc.get("status", "active"),
+        "employee_id": doc.get("employee_id"),
+        "full_name": doc.get("full_name"),
+    }
+    principal_cache.set(user_id, principal)
+    return principal
+
+
+def invalidate_principal(user_id: str) -> None:
+    principal_cache.invalidate(user_id)
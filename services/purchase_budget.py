@@ -0,0 +1,188 @@
+import os
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from models.purchase_item import BudgetLedgerOut
+from utils.db import get_async_db
+from services.log import logger
+
+BUDGET_COLLECTION = "budget_ledger"
+# Rebuilding overwrites totals that live writes are incrementing, so by
+# default the job is only registered and run on demand
+PURCHASE_BUDGET_RECONCILE_SECONDS = float(os.getenv("PURCHASE_BUDGET_RECONCILE_SECONDS", "0"))
+
+# Which ledger total an item counts towards in each status; canceled and
+# rejected items hold no budget
+COMMITTED_STATUSES = ("pending", "approved")
+SPENT_STATUSES = ("purchased", "delivered")
+
+
+def _budget_collection():
+    return get_async_db("purchases_db")[BUDGET_COLLECTION]
+
+
+def _ledger_entry(doc: Optional[Dict[str, Any]]) -> Optional[Tuple[str, str, float]]:
+    """(budget_code, total, amount) a purchase item holds in the ledger, or None"""
+    if not doc or not doc.get("budget_code"):
+        return None
+    item_status = doc.get("status")
+    item_status = item_status.value if isinstance(item_status, Enum) else item_status
+    if item_status in COMMITTED_STATUSES:
+        total = "committed"
+    elif item_status in SPENT_STATUSES:
+        total = "spent"
+    else:
+        return None
+    return doc["budget_code"], total, float(doc.get("total_price") or 0.0)
+
+
+def _within_limit(increase: float) -> Dict[str, Any]:
+    """Filter clause matching ledgers with no limit or room for increase more"""
+    return {
+        "$or": [
+            {"limit": None},
+            {"$expr": {"$lte": [
+                {"$add": [{"$ifNull": ["$committed", 0]}, {"$ifNull": ["$spent", 0]}, increase]},
+                "$limit",
+            ]}},
+        ]
+    }
+
+
+async def _apply(budget_code: str, inc: Dict[str, float], enforce: bool) -> None:
+    """One upserting $inc on a budget ledger, conditional on its limit when it grows"""
+    inc = {field: value for field, value in inc.items() if value}
+    if not inc:
+        return
+    increase = sum(inc.values())
+    query: Dict[str, Any] = {"_id": budget_code}
+    if enforce and increase > 0:
+        query.update(_within_limit(increase))
+    try:
+        await _budget_collection().update_one(
+            query,
+            {"$inc": inc, "$set": {"updated_at": datetime.now()}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # The ledger exists but failed the limit clause, so the upsert tried
+        # to insert a second document with the same budget code
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Budget limit exceeded for budget code {budget_code}"
+        )
+
+
+async def apply_budget_change(
+    before: Optional[Dict[str, Any]],
+    after: Optional[Dict[str, Any]],
+    enforce: bool = True,
+) -> None:
+    """Move a purchase item's share of the budget ledger from its before state to its after state.
+
+    before is None for a new item and after is None for a deleted one. When
+    the budget code is unchanged the release and the reservation are a single
+    $inc, so moving an approved item to purchased never trips the limit. With
+    enforce, a growing reservation raises 409 if it would take committed plus
+    spent over the limit; budget codes without a limit are only tracked.
+    """
+    old = _ledger_entry(before)
+    new = _ledger_entry(after)
+    if old and new and old[0] == new[0]:
+        inc = {old[1]: -old[2]}
+        inc[new[1]] = inc.get(new[1], 0.0) + new[2]
+        await _apply(new[0], inc, enforce)
+        return
+    # Reserve on the new budget code first so a rejection leaves the old one untouched
+    if new:
+        await _apply(new[0], {new[1]: new[2]}, enforce)
+    if old:
+        await _apply(old[0], {old[1]: -old[2]}, False)
+
+
+async def revert_budget_change(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+    """Undo apply_budget_change after the item write it guarded did not happen"""
+    try:
+        await apply_budget_change(after, before, enforce=False)
+    except Exception as e:
+        logger.error(f"Error reverting budget ledger change: {str(e)}")
+
+
+async def set_budget_limit(budget_code: str, limit: Optional[float]) -> BudgetLedgerOut:
+    """Set or clear (None) the limit of a budget code, creating its ledger if needed"""
+    now = datetime.now()
+    await _budget_collection().update_one(
+        {"_id": budget_code},
+        {"$set": {"limit": limit, "updated_at": now}, "$setOnInsert": {"committed": 0.0, "spent": 0.0}},
+        upsert=True,
+    )
+    return await get_budget(budget_code)
+
+
+def _doc_to_budget_out(doc: Dict[str, Any]) -> BudgetLedgerOut:
+    committed = round(doc.get("committed") or 0.0, 2)
+    spent = round(doc.get("spent") or 0.0, 2)
+    limit = doc.get("limit")
+    return BudgetLedgerOut(
+        budget_code=doc["_id"],
+        limit=limit,
+        committed=committed,
+        spent=spent,
+        available=None if limit is None else round(limit - committed - spent, 2),
+        updated_at=doc.get("updated_at"),
+    )
+
+
+async def get_budget(budget_code: str) -> BudgetLedgerOut:
+    doc = await _budget_collection().find_one({"_id": budget_code})
+    if not doc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Budget code not found"
+        )
+    return _doc_to_budget_out(doc)
+
+
+async def get_budgets() -> List[BudgetLedgerOut]:
+    docs = await _budget_collection().find({}).sort("_id", ASCENDING).to_list(None)
+    return [_doc_to_budget_out(doc) for doc in docs]
+
+
+async def rebuild_budget_ledger() -> int:
+    """Recompute committed and spent for every budget code from purchaseItems.
+
+    Limits are kept. Ledgers of budget codes that no longer have items are
+    reset to zero rather than deleted so their limit survives. Writes that land
+    while the aggregation runs can be overwritten, hence this runs on demand.
+    """
+    items = get_async_db("purchases_db")["purchaseItems"]
+    pipeline = [
+        {"$match": {"budget_code": {"$nin": [None, ""]}, "status": {"$in": [*COMMITTED_STATUSES, *SPENT_STATUSES]}}},
+        {"$group": {
+            "_id": "$budget_code",
+            "committed": {"$sum": {"$cond": [{"$in": ["$status", list(COMMITTED_STATUSES)]}, {"$ifNull": ["$total_price", 0]}, 0]}},
+            "spent": {"$sum": {"$cond": [{"$in": ["$status", list(SPENT_STATUSES)]}, {"$ifNull": ["$total_price", 0]}, 0]}},
+        }},
+    ]
+    totals = {doc["_id"]: doc async for doc in items.aggregate(pipeline)}
+    collection = _budget_collection()
+    existing = await collection.distinct("_id")
+    now = datetime.now()
+    operations = []
+    for budget_code in set(existing) | set(totals):
+        total = totals.get(budget_code, {})
+        operations.append(UpdateOne(
+            {"_id": budget_code},
+            {
+                "$set": {"committed": float(total.get("committed", 0.0)), "spent": float(total.get("spent", 0.0)), "updated_at": now},
+                "$setOnInsert": {"limit": None},
+            },
+            upsert=True,
+        ))
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+    return len(operations)
@@ -2,11 +2,14 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import json
+import re
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from enum import Enum
+from typing import List, Optional, Dict, Any, Tuple, AsyncIterator
 from bson import ObjectId
 from fastapi import HTTPException, status
-from pymongo import ASCENDING, DESCENDING
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
 
 from models.purchase_item import (
     PurchaseItemCreate,
@@ -14,46 +17,61 @@ from models.purchase_item import (
     PurchaseItemUpdate,
     PurchaseItemFilter,
     PurchaseItemSummary,
+    PurchaseItemFacetedResult,
     PurchaseStatus,
     PriorityLevel,
     PurchaseCategory
 )
 from services.auth import get_current_user
-from utils.db import get_db
+from utils.db import get_async_db
+from utils.pagination import fetch_page, fetch_text_page, keyset_filter, keyset_sort, encode_cursor, TEXT_SCORE_FIELD
+from utils.cache import TTLCache
+from utils.export import ExportFormat, encode_rows
+from utils.versioning import VERSION_FIELD, version_filter, version_conflict, next_version_expr
 from services.log import logger, create_log
+from services.purchase_spend import record_spend_change
+from services.purchase_budget import apply_budget_change, revert_budget_change
 from models.log import logCreate
 
+SUMMARY_DOC_ID = "summary"
+# Updates touching any of these can move the item's share of the budget ledger
+BUDGET_FIELDS = ("quantity", "unit_price", "status", "budget_code")
+PURCHASE_SUMMARY_REBUILD_SECONDS = int(os.getenv("PURCHASE_SUMMARY_REBUILD_SECONDS", "3600"))
+PURCHASE_SEARCH_BACKFILL_SECONDS = float(os.getenv("PURCHASE_SEARCH_BACKFILL_SECONDS", "300"))
+PURCHASE_FACET_CACHE_TTL = float(os.getenv("PURCHASE_FACET_CACHE_TTL", "10"))
+PURCHASE_FACET_CACHE_SIZE = int(os.getenv("PURCHASE_FACET_CACHE_SIZE", "1000"))
+SORTABLE_FIELDS = ["name", "quantity", "priority", "status", "category", "created_at", "updated_at"]
+FACET_FIELDS = ("category", "priority", "status")
+PURCHASE_EXPORT_BATCH_SIZE = int(os.getenv("PURCHASE_EXPORT_BATCH_SIZE", "1000"))
+EXPORT_COLUMNS = [
+    "item_id", "name", "description", "quantity", "unit_price", "total_price",
+    "category", "priority", "status", "notes", "supplier", "budget_code",
+    "required_date", "created_by", "created_at", "updated_at",
+]
+
+# Faceted search results keyed by the normalised filter and page. Writes in
+# this process clear it; other processes see them once the TTL runs out.
+facet_cache = TTLCache(maxsize=PURCHASE_FACET_CACHE_SIZE, ttl=PURCHASE_FACET_CACHE_TTL)
+
+
+def search_key(value: Any) -> str:
+    """Lower-cased, whitespace-collapsed name stored as name_key for exact and prefix lookups"""
+    return " ".join(str(value or "").split()).lower()
+
+
+def _facet_key(value: Any) -> str:
+    # Model defaults are left as enum members, so normalise to the stored value
+    return str(value.value if isinstance(value, Enum) else value)
+
 
 class PurchaseItemService:
     
     def __init__(self):
-        self.db = get_db("purchases_db")
+        self.db = get_async_db("purchases_db")
         self.collection = self.db["purchaseItems"]
-        self._create_indexes()
+        self.stats = self.db["purchase_stats"]
     
-    def _create_indexes(self):
-        try:
-            self.collection.create_index([("name", "text"), ("description", "text")])
-            self.collection.create_index([("category", ASCENDING)])
-            self.collection.create_index([("priority", ASCENDING)])
-            self.collection.create_index([("status", ASCENDING)])
-            self.collection.create_index([("created_by", ASCENDING)])
-            self.collection.create_index([("created_at", DESCENDING)])
-            self.collection.create_index([("required_date", ASCENDING)])
-            self.collection.create_index([("supplier", ASCENDING)])
-            self.collection.create_index([("budget_code", ASCENDING)])
-            
-            self.collection.create_index([
-                ("category", ASCENDING),
-                ("priority", ASCENDING),
-                ("status", ASCENDING)
-            ])
-            
-            logger.info("Purchase item indexes created successfully")
-        except Exception as e:
-            logger.error(f"Error creating indexes: {str(e)}")
-    
-    def create_purchase_item(self, data: PurchaseItemCreate, current_user: dict) -> PurchaseItemOut:
+    async def create_purchase_item(self, data: PurchaseItemCreate, current_user: dict) -> PurchaseItemOut:
         try:
             total_price = None
             if data.quantity and data.unit_price:
@@ -61,6 +79,7 @@ class PurchaseItemService:
             
             doc = {
                 "name": data.name,
+                "name_key": search_key(data.name),
                 "description": data.description,
                 "quantity": data.quantity,
                 "unit_price": data.unit_price,
@@ -75,14 +94,23 @@ class PurchaseItemService:
                 "created_by": current_user.get("user_id"),
                 "created_at": datetime.now(),
                 "updated_at": datetime.now(),
+                "version": 0,
             }
             
-            result = self.collection.insert_one(doc)
+            await apply_budget_change(None, doc)
+            try:
+                result = await self.collection.insert_one(doc)
+            except Exception:
+                await revert_budget_change(None, doc)
+                raise
+            await self._apply_summary_delta(None, doc)
+            await record_spend_change(None, doc)
+            facet_cache.clear()
             
             logger.info(f"Purchase item created: {result.inserted_id} by user: {current_user.get('user_id')}")
             try:
                 if current_user and current_user.get("user_id"):
-                    create_log(
+                    await create_log(
                         logCreate(
                             action_type="purchase_create",
                             user_id=current_user["user_id"],
@@ -95,6 +123,8 @@ class PurchaseItemService:
             
             return self._doc_to_purchase_item_out(doc, result.inserted_id)
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error creating purchase item: {str(e)}")
             raise HTTPException(
@@ -102,7 +132,7 @@ class PurchaseItemService:
                 detail="Error creating purchase item"
             )
     
-    def get_purchase_item_by_id(self, item_id: str, current_user: dict) -> PurchaseItemOut:
+    async def get_purchase_item_by_id(self, item_id: str, current_user: dict) -> PurchaseItemOut:
         try:
             if not ObjectId.is_valid(item_id):
                 raise HTTPException(
@@ -110,7 +140,7 @@ class PurchaseItemService:
                     detail="Invalid item ID"
                 )
             
-            doc = self.collection.find_one({"_id": ObjectId(item_id)})
+            doc = await self.collection.find_one({"_id": ObjectId(item_id)})
             if not doc:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -128,7 +158,7 @@ class PurchaseItemService:
                 detail="Error getting purchase item"
             )
     
-    def get_purchase_items(
+    async def get_purchase_items(
         self,
         filters: Optional[PurchaseItemFilter] = None,
         limit: int = 20,
@@ -136,21 +166,42 @@ class PurchaseItemService:
         sort_by: str = "created_at",
         sort_order: str = "desc",
         current_user: Optional[dict] = None,
-    ) -> List[PurchaseItemOut]:
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[PurchaseItemOut], Optional[str]]:
         try:
             filter_query = self._build_filter_query(filters)
             
-            sort_direction = DESCENDING if sort_order.lower() == "desc" else ASCENDING
-            sort_field = sort_by if sort_by in ["name", "quantity", "priority", "status", "category", "created_at", "updated_at"] else "created_at"
-            
-            cursor = self.collection.find(filter_query).sort(sort_field, sort_direction).skip(offset).limit(limit)
+            if "$text" in filter_query:
+                # Relevance ranking replaces sort_by for full-text searches
+                docs, next_cursor = await fetch_text_page(
+                    self.collection,
+                    filter_query,
+                    limit=limit,
+                    cursor=cursor,
+                    offset=offset,
+                )
+                return [self._doc_to_purchase_item_out(doc, doc["_id"]) for doc in docs], next_cursor
+            
+            sort_field, sort_direction = self._sort_spec(sort_by, sort_order)
+            
+            docs, next_cursor = await fetch_page(
+                self.collection,
+                filter_query,
+                sort_field=sort_field,
+                direction=sort_direction,
+                limit=limit,
+                cursor=cursor,
+                offset=offset,
+            )
             
             items = []
-            for doc in cursor:
+            for doc in docs:
                 items.append(self._doc_to_purchase_item_out(doc, doc["_id"]))
             
-            return items
+            return items, next_cursor
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error getting purchase items: {str(e)}")
             raise HTTPException(
@@ -158,7 +209,137 @@ class PurchaseItemService:
                 detail="Error getting purchase items"
             )
     
-    def update_purchase_item(
+    async def search_purchase_items_faceted(
+        self,
+        filters: Optional[PurchaseItemFilter] = None,
+        limit: int = 20,
+        sort_by: str = "created_at",
+        sort_order: str = "desc",
+        cursor: Optional[str] = None,
+    ) -> PurchaseItemFacetedResult:
+        """One $facet aggregation returning a page of items and the facet counts of the whole filtered set.
+
+        The filter runs once in the leading $match, where a category/priority/
+        status filter can use the compound index; every facet branch then works
+        on that result.
+        """
+        cache_key = self._facet_cache_key(filters, limit, sort_by, sort_order, cursor)
+        cached = facet_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        try:
+            filter_query = self._build_filter_query(filters)
+            pipeline: List[Dict[str, Any]] = [{"$match": filter_query}]
+            if "$text" in filter_query:
+                sort_field, sort_direction = TEXT_SCORE_FIELD, DESCENDING
+                pipeline.append({"$addFields": {TEXT_SCORE_FIELD: {"$meta": "textScore"}}})
+            else:
+                sort_field, sort_direction = self._sort_spec(sort_by, sort_order)
+            
+            page: List[Dict[str, Any]] = []
+            if cursor:
+                page.append({"$match": keyset_filter(sort_field, sort_direction, cursor)})
+            page.append({"$sort": dict(keyset_sort(sort_field, sort_direction))})
+            page.append({"$limit": limit + 1})
+            
+            branches: Dict[str, Any] = {"items": page, "total": [{"$count": "count"}]}
+            for field in FACET_FIELDS:
+                branches[field] = [{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}]
+            pipeline.append({"$facet": branches})
+            
+            result = (await self.collection.aggregate(pipeline).to_list(1))[0]
+            docs = result["items"]
+            next_cursor = None
+            if len(docs) > limit:
+                docs = docs[:limit]
+                next_cursor = encode_cursor(docs[-1], sort_field)
+            faceted = PurchaseItemFacetedResult(
+                items=[self._doc_to_purchase_item_out(doc, doc["_id"]) for doc in docs],
+                total=result["total"][0]["count"] if result["total"] else 0,
+                facets={
+                    field: {_facet_key(bucket["_id"]): bucket["count"] for bucket in result[field] if bucket["_id"] is not None}
+                    for field in FACET_FIELDS
+                },
+                next_cursor=next_cursor,
+            )
+            facet_cache.set(cache_key, faceted)
+            return faceted
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error searching purchase items: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error searching purchase items"
+            )
+    
+    async def export_purchase_items(
+        self,
+        filters: Optional[PurchaseItemFilter],
+        export_format: ExportFormat,
+        compress: bool,
+        current_user: dict,
+    ) -> AsyncIterator[bytes]:
+        """Encoded export of every item matching filters, read through one server cursor"""
+        filter_query = self._build_filter_query(filters)
+        try:
+            if current_user and current_user.get("user_id"):
+                await create_log(
+                    logCreate(
+                        action_type="purchase_export",
+                        user_id=current_user["user_id"],
+                        description=f"Exported purchase items as {export_format}"
+                    ),
+                    current_user,
+                )
+        except Exception:
+            pass
+        return encode_rows(self._iter_export_rows(filter_query), EXPORT_COLUMNS, export_format, compress)
+    
+    async def _iter_export_rows(self, filter_query: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        # Only the exported fields travel over the wire, in batches of
+        # PURCHASE_EXPORT_BATCH_SIZE per getMore
+        projection = {column: 1 for column in EXPORT_COLUMNS if column != "item_id"}
+        cursor = self.collection.find(filter_query, projection).sort("_id", ASCENDING).batch_size(PURCHASE_EXPORT_BATCH_SIZE)
+        try:
+            async for doc in cursor:
+                doc["item_id"] = doc.pop("_id")
+                yield doc
+        finally:
+            # Also reached when the client disconnects mid-download
+            await cursor.close()
+    
+    @staticmethod
+    def _sort_spec(sort_by: str, sort_order: str) -> Tuple[str, int]:
+        sort_direction = DESCENDING if sort_order.lower() == "desc" else ASCENDING
+        sort_field = sort_by if sort_by in SORTABLE_FIELDS else "created_at"
+        return sort_field, sort_direction
+    
+    def _facet_cache_key(
+        self,
+        filters: Optional[PurchaseItemFilter],
+        limit: int,
+        sort_by: str,
+        sort_order: str,
+        cursor: Optional[str],
+    ) -> str:
+        """Equivalent requests share an entry: unset fields are dropped and the name search is normalised"""
+        normalized = filters.model_dump(mode="json", exclude_none=True) if filters else {}
+        if "name" in normalized:
+            normalized["name"] = search_key(normalized["name"])
+        else:
+            normalized.pop("name_match", None)
+        sort_field, sort_direction = self._sort_spec(sort_by, sort_order)
+        if normalized.get("name_match") == "text":
+            sort_field, sort_direction = TEXT_SCORE_FIELD, DESCENDING
+        return json.dumps(
+            {"f": normalized, "s": [sort_field, sort_direction], "l": limit, "c": cursor},
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+    
+    async def update_purchase_item(
         self, item_id: str, update_data: PurchaseItemUpdate, current_user: dict
     ) -> PurchaseItemOut:
         try:
@@ -168,36 +349,90 @@ class PurchaseItemService:
                     detail="Invalid item ID"
                 )
             
-            doc = self.collection.find_one({"_id": ObjectId(item_id)})
-            if not doc:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Purchase item not found"
-                )
-            
             update_fields = update_data.model_dump(exclude_unset=True)
+            expected_version = update_fields.pop("version", None)
+            query = {"_id": ObjectId(item_id), **version_filter(expected_version)}
             if not update_fields:
+                doc = await self.collection.find_one({"_id": ObjectId(item_id)})
+                if not doc:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Purchase item not found"
+                    )
+                version_conflict(expected_version, doc)
                 return self._doc_to_purchase_item_out(doc, doc["_id"])
             
-            if "quantity" in update_fields or "unit_price" in update_fields:
-                quantity = update_fields.get("quantity", doc.get("quantity"))
-                unit_price = update_fields.get("unit_price", doc.get("unit_price"))
-                if quantity and unit_price:
-                    update_fields["total_price"] = quantity * unit_price
-            
             update_fields["updated_at"] = datetime.now()
+            if "name" in update_fields:
+                update_fields["name_key"] = search_key(update_fields["name"])
             
-            self.collection.update_one(
-                {"_id": ObjectId(item_id)},
-                {"$set": update_fields}
-            )
+            # A pipeline update lets the server derive total_price from the
+            # stored quantity/unit_price, so no read is needed unless the
+            # item's budget share can change.
+            stage = {field: {"$literal": value} for field, value in update_fields.items()}
+            if "quantity" in update_fields or "unit_price" in update_fields:
+                quantity = stage.get("quantity", "$quantity")
+                unit_price = stage.get("unit_price", "$unit_price")
+                stage["total_price"] = {
+                    "$cond": [
+                        {"$and": [quantity, unit_price]},
+                        {"$multiply": [quantity, unit_price]},
+                        "$total_price",
+                    ]
+                }
+            stage[VERSION_FIELD] = next_version_expr()
+            
+            # A change to the budget share has to be reserved before the write,
+            # so the current state is read and the update pinned to its version.
+            current_doc = planned_doc = None
+            if any(field in update_fields for field in BUDGET_FIELDS):
+                current_doc = await self.collection.find_one({"_id": ObjectId(item_id)})
+                if not current_doc:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Purchase item not found"
+                    )
+                version_conflict(expected_version, current_doc)
+                query = {"_id": ObjectId(item_id), **version_filter(current_doc.get(VERSION_FIELD, 0))}
+                planned_doc = self._apply_update(current_doc, update_fields)
+                await apply_budget_change(current_doc, planned_doc)
             
-            updated_doc = self.collection.find_one({"_id": ObjectId(item_id)})
+            # The pre-image is needed to move the summary counters; the new
+            # state is derived from it locally with the same rules as the stage.
+            try:
+                previous_doc = await self.collection.find_one_and_update(
+                    query,
+                    [{"$set": stage}],
+                    return_document=ReturnDocument.BEFORE,
+                )
+            except Exception:
+                if current_doc is not None:
+                    await revert_budget_change(current_doc, planned_doc)
+                raise
+            if not previous_doc:
+                if current_doc is not None:
+                    await revert_budget_change(current_doc, planned_doc)
+                doc = await self.collection.find_one({"_id": ObjectId(item_id)}, {VERSION_FIELD: 1})
+                if not doc:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Purchase item not found"
+                    )
+                version_conflict(expected_version, doc)
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Purchase item was modified concurrently"
+                )
+            
+            updated_doc = self._apply_update(previous_doc, update_fields)
+            await self._apply_summary_delta(previous_doc, updated_doc)
+            await record_spend_change(previous_doc, updated_doc)
+            facet_cache.clear()
             
             logger.info(f"Purchase item updated: {item_id} by user: {current_user.get('user_id')}")
             try:
                 if current_user and current_user.get("user_id"):
-                    create_log(
+                    await create_log(
                         logCreate(
                             action_type="purchase_update",
                             user_id=current_user["user_id"],
@@ -219,7 +454,17 @@ class PurchaseItemService:
                 detail="Error updating purchase item"
             )
     
-    def delete_purchase_item(self, item_id: str, current_user: dict) -> Dict[str, Any]:
+    @staticmethod
+    def _apply_update(doc: Dict[str, Any], update_fields: Dict[str, Any]) -> Dict[str, Any]:
+        """The stored document after update_fields, derived with the same rules as the update stage"""
+        updated_doc = {**doc, **update_fields}
+        if "quantity" in update_fields or "unit_price" in update_fields:
+            if updated_doc.get("quantity") and updated_doc.get("unit_price"):
+                updated_doc["total_price"] = updated_doc["quantity"] * updated_doc["unit_price"]
+        updated_doc[VERSION_FIELD] = doc.get(VERSION_FIELD, 0) + 1
+        return updated_doc
+    
+    async def delete_purchase_item(self, item_id: str, current_user: dict) -> Dict[str, Any]:
         try:
             if not ObjectId.is_valid(item_id):
                 raise HTTPException(
@@ -227,35 +472,31 @@ class PurchaseItemService:
                     detail="Invalid item ID"
                 )
             
-            doc = self.collection.find_one({"_id": ObjectId(item_id)})
+            doc = await self.collection.find_one_and_delete({"_id": ObjectId(item_id)})
             if not doc:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Purchase item not found"
                 )
             
-            result = self.collection.delete_one({"_id": ObjectId(item_id)})
-            
-            if result.deleted_count > 0:
-                logger.info(f"Purchase item deleted: {item_id} by user: {current_user.get('user_id')}")
-                try:
-                    if current_user and current_user.get("user_id"):
-                        create_log(
-                            logCreate(
-                                action_type="purchase_delete",
-                                user_id=current_user["user_id"],
-                                description=f"Deleted purchase item {item_id}"
-                            ),
-                            current_user,
-                        )
-                except Exception:
-                    pass
-                return {"message": "Purchase item successfully deleted"}
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Error deleting purchase item"
-                )
+            await apply_budget_change(doc, None, enforce=False)
+            await self._apply_summary_delta(doc, None)
+            await record_spend_change(doc, None)
+            facet_cache.clear()
+            logger.info(f"Purchase item deleted: {item_id} by user: {current_user.get('user_id')}")
+            try:
+                if current_user and current_user.get("user_id"):
+                    await create_log(
+                        logCreate(
+                            action_type="purchase_delete",
+                            user_id=current_user["user_id"],
+                            description=f"Deleted purchase item {item_id}"
+                        ),
+                        current_user,
+                    )
+            except Exception:
+                pass
+            return {"message": "Purchase item successfully deleted"}
                 
         except HTTPException:
             raise
@@ -266,45 +507,12 @@ class PurchaseItemService:
                 detail="Error deleting purchase item"
             )
     
-    def get_purchase_summary(self, current_user: dict) -> PurchaseItemSummary:
+    async def get_purchase_summary(self, current_user: dict, refresh: bool = False) -> PurchaseItemSummary:
         try:
-            total_items = self.collection.count_documents({})
-            pending_items = self.collection.count_documents({"status": PurchaseStatus.PENDING})
-            approved_items = self.collection.count_documents({"status": PurchaseStatus.APPROVED})
-            purchased_items = self.collection.count_documents({"status": PurchaseStatus.PURCHASED})
-            
-            pipeline = [
-                {"$match": {"total_price": {"$exists": True, "$ne": None}}},
-                {"$group": {"_id": None, "total": {"$sum": "$total_price"}}}
-            ]
-            budget_result = list(self.collection.aggregate(pipeline))
-            total_budget = budget_result[0]["total"] if budget_result else 0.0
-            
-            category_pipeline = [
-                {"$group": {"_id": "$category", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}}
-            ]
-            category_breakdown = {}
-            for item in self.collection.aggregate(category_pipeline):
-                category_breakdown[item["_id"]] = item["count"]
-            
-            priority_pipeline = [
-                {"$group": {"_id": "$priority", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}}
-            ]
-            priority_breakdown = {}
-            for item in self.collection.aggregate(priority_pipeline):
-                priority_breakdown[item["_id"]] = item["count"]
-            
-            return PurchaseItemSummary(
-                total_items=total_items,
-                pending_items=pending_items,
-                approved_items=approved_items,
-                purchased_items=purchased_items,
-                total_budget=total_budget,
-                category_breakdown=category_breakdown,
-                priority_breakdown=priority_breakdown
-            )
+            summary = None if refresh else await self.stats.find_one({"_id": SUMMARY_DOC_ID})
+            if summary is None or self._summary_is_stale(summary):
+                summary = await self.rebuild_purchase_summary()
+            return self._summary_doc_to_out(summary)
             
         except Exception as e:
             logger.error(f"Error getting purchase summary: {str(e)}")
@@ -313,6 +521,98 @@ class PurchaseItemService:
                 detail="Error getting purchase summary"
             )
     
+    async def backfill_search_keys(self, batch_size: int = 500) -> int:
+        """Set name_key on items written before it existed, one batch per call"""
+        docs = await self.collection.find(
+            {"name_key": {"$exists": False}}, {"name": 1}
+        ).limit(batch_size).to_list(batch_size)
+        if not docs:
+            return 0
+        result = await self.collection.bulk_write(
+            [UpdateOne({"_id": doc["_id"]}, {"$set": {"name_key": search_key(doc.get("name"))}}) for doc in docs],
+            ordered=False,
+        )
+        return result.modified_count
+    
+    async def rebuild_purchase_summary(self) -> Dict[str, Any]:
+        """Recompute the materialized summary from purchaseItems with a single $facet scan"""
+        pipeline = [
+            {"$facet": {
+                "totals": [
+                    {"$group": {"_id": None, "count": {"$sum": 1}, "budget": {"$sum": "$total_price"}}}
+                ],
+                "status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+                "category": [{"$group": {"_id": "$category", "count": {"$sum": 1}}}],
+                "priority": [{"$group": {"_id": "$priority", "count": {"$sum": 1}}}],
+            }}
+        ]
+        result = await self.collection.aggregate(pipeline).to_list(1)
+        facets = result[0] if result else {}
+        totals = facets.get("totals") or [{}]
+        summary = {
+            "_id": SUMMARY_DOC_ID,
+            "total_items": totals[0].get("count", 0),
+            "total_budget": totals[0].get("budget") or 0.0,
+            "rebuilt_at": datetime.now(),
+        }
+        for facet in ("status", "category", "priority"):
+            summary[facet] = {_facet_key(item["_id"]): item["count"] for item in facets.get(facet, [])}
+        await self.stats.replace_one({"_id": SUMMARY_DOC_ID}, summary, upsert=True)
+        return summary
+    
+    def _summary_is_stale(self, summary: Dict[str, Any]) -> bool:
+        if PURCHASE_SUMMARY_REBUILD_SECONDS <= 0:
+            return False
+        rebuilt_at = summary.get("rebuilt_at")
+        return rebuilt_at is None or (datetime.now() - rebuilt_at).total_seconds() > PURCHASE_SUMMARY_REBUILD_SECONDS
+    
+    @staticmethod
+    def _summary_contribution(doc: Dict[str, Any], sign: int) -> Dict[str, Any]:
+        contribution = {"total_items": sign}
+        for facet in ("status", "category", "priority"):
+            contribution[f"{facet}.{_facet_key(doc.get(facet))}"] = sign
+        if doc.get("total_price") is not None:
+            contribution["total_budget"] = sign * doc["total_price"]
+        return contribution
+    
+    async def _apply_summary_delta(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+        """Move the materialized summary from the before state of an item to its after state.
+
+        The summary document is never upserted here: when it does not exist yet
+        the next read rebuilds it from the collection, so increments cannot be
+        applied on top of an incomplete baseline.
+        """
+        delta: Dict[str, Any] = {}
+        for doc, sign in ((before, -1), (after, 1)):
+            if doc is None:
+                continue
+            for field, value in self._summary_contribution(doc, sign).items():
+                delta[field] = delta.get(field, 0) + value
+        delta = {field: value for field, value in delta.items() if value}
+        if not delta:
+            return
+        try:
+            await self.stats.update_one({"_id": SUMMARY_DOC_ID}, {"$inc": delta})
+        except Exception as e:
+            logger.error(f"Error updating purchase summary: {str(e)}")
+    
+    @staticmethod
+    def _summary_doc_to_out(summary: Dict[str, Any]) -> PurchaseItemSummary:
+        def breakdown(facet: str) -> Dict[str, int]:
+            counts = [(key, count) for key, count in (summary.get(facet) or {}).items() if count > 0]
+            return dict(sorted(counts, key=lambda item: item[1], reverse=True))
+        
+        status_counts = summary.get("status") or {}
+        return PurchaseItemSummary(
+            total_items=summary.get("total_items", 0),
+            pending_items=status_counts.get(PurchaseStatus.PENDING.value, 0),
+            approved_items=status_counts.get(PurchaseStatus.APPROVED.value, 0),
+            purchased_items=status_counts.get(PurchaseStatus.PURCHASED.value, 0),
+            total_budget=round(summary.get("total_budget") or 0.0, 2),
+            category_breakdown=breakdown("category"),
+            priority_breakdown=breakdown("priority")
+        )
+    
     def _build_filter_query(self, filters: Optional[PurchaseItemFilter]) -> Dict[str, Any]:
         if not filters:
             return {}
@@ -320,10 +620,14 @@ class PurchaseItemService:
         query = {}
         
         if filters.name:
-            query["$or"] = [
-                {"name": {"$regex": filters.name, "$options": "i"}},
-                {"description": {"$regex": filters.name, "$options": "i"}}
-            ]
+            # exact and prefix are answered from the name_key index; an anchored
+            # regex without options is a range scan on it
+            if filters.name_match == "exact":
+                query["name_key"] = search_key(filters.name)
+            elif filters.name_match == "prefix":
+                query["name_key"] = {"$regex": "^" + re.escape(search_key(filters.name))}
+            else:
+                query["$text"] = {"$search": filters.name}
         
         if filters.category:
             query["category"] = filters.category
@@ -386,33 +690,35 @@ class PurchaseItemService:
             required_date=doc.get("required_date"),
             created_by=doc["created_by"],
             created_at=doc["created_at"],
-            updated_at=doc["updated_at"]
+            updated_at=doc["updated_at"],
+            version=doc.get(VERSION_FIELD, 0)
         )
 
 
 purchase_item_service = PurchaseItemService()
 
 
-def create_purchase_item(data: PurchaseItemCreate, current_user: dict) -> PurchaseItemOut:
-    return purchase_item_service.create_purchase_item(data, current_user)
+async def create_purchase_item(data: PurchaseItemCreate, current_user: dict) -> PurchaseItemOut:
+    return await purchase_item_service.create_purchase_item(data, current_user)
 
 
-def get_purchase_items(
+async def get_purchase_items(
     item_id: Optional[str] = None,
     limit: int = 20,
     offset: int = 0,
     current_user: Optional[dict] = None,
-) -> List[PurchaseItemOut]:
+    cursor: Optional[str] = None,
+) -> Tuple[List[PurchaseItemOut], Optional[str]]:
     if item_id:
-        return [purchase_item_service.get_purchase_item_by_id(item_id, current_user)]
-    return purchase_item_service.get_purchase_items(limit=limit, offset=offset, current_user=current_user)
+        return [await purchase_item_service.get_purchase_item_by_id(item_id, current_user)], None
+    return await purchase_item_service.get_purchase_items(limit=limit, offset=offset, current_user=current_user, cursor=cursor)
 
 
-def update_purchase_item(
+async def update_purchase_item(
     item_id: str, update_data: PurchaseItemUpdate, current_user: dict
 ) -> PurchaseItemOut:
-    return purchase_item_service.update_purchase_item(item_id, update_data, current_user)
+    return await purchase_item_service.update_purchase_item(item_id, update_data, current_user)
 
 
-def delete_purchase_item(item_id: str, current_user: dict) -> dict:
-    return purchase_item_service.delete_purchase_item(item_id, current_user)
\ No newline at end of file
+async def delete_purchase_item(item_id: str, current_user: dict) -> dict:
+    return await purchase_item_service.delete_purchase_item(item_id, current_user)
\ No newline at end of file
@@ -0,0 +1,193 @@
+import os
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Any, Dict, List, Optional
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from models.purchase_item import SpendBucket, SpendDimension, SpendGranularity
+from utils.db import get_async_db
+from services.log import logger
+
+SPEND_COLLECTION = "purchase_spend"
+SPEND_DIMENSIONS = ("budget_code", "supplier", "category")
+SPEND_GRANULARITIES = ("day", "week", "month")
+PURCHASE_SPEND_RECONCILE_SECONDS = float(os.getenv("PURCHASE_SPEND_RECONCILE_SECONDS", "86400"))
+SPEND_WRITE_BATCH = 1000
+
+# Rollup value stored for items that have no budget code or supplier
+UNASSIGNED = ""
+
+
+def _spend_collection():
+    return get_async_db("purchases_db")[SPEND_COLLECTION]
+
+
+def period_start(moment: datetime, granularity: str) -> datetime:
+    """Start of the day, ISO week (Monday) or month containing moment"""
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _dimension_value(value: Any) -> str:
+    if value is None:
+        return UNASSIGNED
+    return str(value.value if isinstance(value, Enum) else value)
+
+
+def _rollup_id(granularity: str, period: datetime, dimension: str, value: str) -> str:
+    return f"{granularity}|{period:%Y-%m-%d}|{dimension}|{value}"
+
+
+def _contributions(doc: Dict[str, Any], sign: int) -> Dict[str, Dict[str, Any]]:
+    """Every rollup bucket an item counts towards, with its signed share"""
+    created_at = doc.get("created_at")
+    if not isinstance(created_at, datetime):
+        return {}
+    amount = sign * (doc.get("total_price") or 0.0)
+    item_status = _dimension_value(doc.get("status"))
+    buckets: Dict[str, Dict[str, Any]] = {}
+    for granularity in SPEND_GRANULARITIES:
+        period = period_start(created_at, granularity)
+        for dimension in SPEND_DIMENSIONS:
+            value = _dimension_value(doc.get(dimension))
+            buckets[_rollup_id(granularity, period, dimension, value)] = {
+                "key": {"granularity": granularity, "period": period, "dimension": dimension, "value": value},
+                "inc": {"amount": amount, "count": sign, f"by_status.{item_status}": amount},
+            }
+    return buckets
+
+
+async def record_spend_change(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+    """Move the spend rollups from the before state of a purchase item to its after state.
+
+    before is None for a new item and after is None for a deleted one. Unlike
+    the summary document, buckets are upserted: a new day or supplier simply
+    starts a new bucket. Drift from failed increments is corrected by
+    rebuild_spend_rollups.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for doc, sign in ((before, -1), (after, 1)):
+        if doc is None:
+            continue
+        for rollup_id, share in _contributions(doc, sign).items():
+            entry = merged.setdefault(rollup_id, {"key": share["key"], "inc": {}})
+            for field, value in share["inc"].items():
+                entry["inc"][field] = entry["inc"].get(field, 0) + value
+    now = datetime.now()
+    operations = []
+    for rollup_id, entry in merged.items():
+        inc = {field: value for field, value in entry["inc"].items() if value}
+        if not inc:
+            continue
+        operations.append(UpdateOne(
+            {"_id": rollup_id},
+            {"$inc": inc, "$set": {"updated_at": now}, "$setOnInsert": {**entry["key"], "created_at": now}},
+            upsert=True,
+        ))
+    if not operations:
+        return
+    try:
+        await _spend_collection().bulk_write(operations, ordered=False)
+    except Exception as e:
+        logger.error(f"Error updating purchase spend rollups: {str(e)}")
+
+
+async def _write_batch(collection, operations: List[UpdateOne]) -> int:
+    try:
+        result = await collection.bulk_write(operations, ordered=False)
+        return result.upserted_count + result.modified_count
+    except BulkWriteError as e:
+        # Duplicate keys come from buckets a write path created meanwhile; those are skipped on purpose
+        logger.warning(f"Purchase spend reconcile skipped {len(e.details.get('writeErrors', []))} buckets")
+        return e.details.get("nUpserted", 0) + e.details.get("nModified", 0)
+
+
+def _untouched_since(moment: datetime) -> Dict[str, Any]:
+    return {"$or": [{"updated_at": {"$lt": moment}}, {"updated_at": {"$exists": False}}]}
+
+
+async def rebuild_spend_rollups() -> int:
+    """Recompute the rollup buckets from purchaseItems and drop buckets that no longer have items.
+
+    Only items last written before the rebuild started are folded in, and
+    only buckets no write path has touched since then are overwritten, each
+    with an update conditional on that. Any item written during the rebuild
+    moved its buckets through record_spend_change, so those buckets keep
+    their live values and are corrected by a later run. Items are streamed
+    with only the fields the rollups need, so memory grows with the number
+    of buckets, not items.
+    """
+    now = datetime.now()
+    # MongoDB keeps milliseconds; truncate so stored timestamps compare cleanly
+    started = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    collection = _spend_collection()
+    existing = set(await collection.distinct("_id"))
+
+    items = get_async_db("purchases_db")["purchaseItems"]
+    projection = {"created_at": 1, "total_price": 1, "status": 1, **{dimension: 1 for dimension in SPEND_DIMENSIONS}}
+    buckets: Dict[str, Dict[str, Any]] = {}
+    async for doc in items.find(_untouched_since(started), projection).batch_size(SPEND_WRITE_BATCH):
+        for rollup_id, share in _contributions(doc, 1).items():
+            bucket = buckets.setdefault(rollup_id, {**share["key"], "amount": 0.0, "count": 0, "by_status": {}})
+            bucket["amount"] += share["inc"]["amount"]
+            bucket["count"] += 1
+            item_status = _dimension_value(doc.get("status"))
+            bucket["by_status"][item_status] = bucket["by_status"].get(item_status, 0.0) + share["inc"]["amount"]
+
+    touched = 0
+    operations: List[UpdateOne] = []
+    for rollup_id, bucket in buckets.items():
+        operations.append(UpdateOne(
+            {"_id": rollup_id, **_untouched_since(started)},
+            {
+                "$set": {**bucket, "updated_at": started, "reconciled_at": started},
+                "$setOnInsert": {"created_at": started},
+            },
+            upsert=rollup_id not in existing,
+        ))
+        if len(operations) >= SPEND_WRITE_BATCH:
+            touched += await _write_batch(collection, operations)
+            operations = []
+    if operations:
+        touched += await _write_batch(collection, operations)
+    # Every rebuilt bucket now carries updated_at == started, so what is left
+    # untouched had no items and saw no writes
+    result = await collection.delete_many(_untouched_since(started))
+    return touched + result.deleted_count
+
+
+async def get_spend_rollups(
+    dimension: SpendDimension,
+    granularity: SpendGranularity,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    value: Optional[str] = None,
+) -> List[SpendBucket]:
+    """Spend per period and dimension value for periods starting in [start, end)"""
+    query: Dict[str, Any] = {"dimension": dimension, "granularity": granularity}
+    if start or end:
+        period_query: Dict[str, Any] = {}
+        if start:
+            period_query["$gte"] = period_start(start, granularity)
+        if end:
+            period_query["$lt"] = end
+        query["period"] = period_query
+    if value is not None:
+        query["value"] = value
+    docs = await _spend_collection().find(query).sort([("period", ASCENDING), ("value", ASCENDING)]).to_list(None)
+    return [
+        SpendBucket(
+            period=doc["period"],
+            value=doc["value"],
+            amount=round(doc.get("amount", 0.0), 2),
+            count=doc.get("count", 0),
+            by_status={key: round(amount, 2) for key, amount in (doc.get("by_status") or {}).items() if amount},
+        )
+        for doc in docs
+        if doc.get("count", 0) > 0
+    ]
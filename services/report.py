@@ -3,40 +3,38 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from bson import ObjectId
 from fastapi import HTTPException, status
+from pymongo import ReturnDocument
 
 from models.report import report_create, report_update, report_out
-from utils.db import get_db
-from services.log import logger, create_log
+from utils.db import get_async_db
+from utils.pagination import fetch_page
+from utils.versioning import version_filter, bump_version, version_conflict
+from services.log import create_log
+from services.dashboard import record_status_change
 from models.log import logCreate
-from pymongo import ASCENDING, DESCENDING
 
 
-def create_report_indexes():
-    try:
-        db = get_db()
-        report_collection = db["reports"]
-        
-        report_collection.create_index([("created_by", ASCENDING)])
-        report_collection.create_index([("status", ASCENDING)])
-        report_collection.create_index([("created_at", DESCENDING)])
-        report_collection.create_index([("approved_by", ASCENDING)])
-        
-        logger.info("Report indexes created successfully")
-    except Exception as e:
-        logger.error(f"Error creating report indexes: {str(e)}")
-
-
-create_report_indexes()
+def _doc_to_report_out(doc: dict) -> report_out:
+    return report_out(
+        _id=str(doc["_id"]),
+        created_by=str(doc["created_by"]),
+        content=doc["content"],
+        approved_by=doc.get("approved_by"),
+        status=doc["status"],
+        created_at=doc["created_at"],
+        updated_at=doc.get("updated_at"),
+        version=doc.get("version", 0),
+    )
 
 
-def create_report(data: report_create, current_user: dict) -> report_out:
+async def create_report(data: report_create, current_user: dict) -> report_out:
     if current_user.get("role") not in ["employee", "manager_women", "manager_men", "admin1", "admin2"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
 
-    db = get_db()
+    db = get_async_db()
     report_collection = db["reports"]
 
     report_data = {
@@ -47,12 +45,14 @@ def create_report(data: report_create, current_user: dict) -> report_out:
         "status": "pending",
         "created_at": datetime.now(),
         "updated_at": None,
+        "version": 0,
     }
 
-    result = report_collection.insert_one(report_data)
+    result = await report_collection.insert_one(report_data)
+    await record_status_change("reports", None, report_data["status"])
     try:
         if current_user and current_user.get("user_id"):
-            create_log(
+            await create_log(
                 logCreate(
                     action_type="report_create",
                     user_id=current_user["user_id"],
@@ -63,25 +63,18 @@ def create_report(data: report_create, current_user: dict) -> report_out:
     except Exception:
         pass
 
-    return report_out(
-        _id=str(result.inserted_id),
-        created_by=str(report_data["created_by"]),
-        content=report_data["content"],
-        approved_by=report_data["approved_by"],
-        status=report_data["status"],
-        created_at=report_data["created_at"],
-        updated_at=report_data["updated_at"],
-    )
+    return _doc_to_report_out(report_data)
 
 
-def get_reports(
+async def get_reports(
     user_id: Optional[str] = None,
     report_status: Optional[str] = None,
     limit: int = 20,
     offset: int = 0,
     current_user: Optional[dict] = None,
-) -> List[report_out]:
-    db = get_db()
+    cursor: Optional[str] = None,
+) -> Tuple[List[report_out], Optional[str]]:
+    db = get_async_db()
     report_collection = db["reports"]
 
     filter_query: dict = {}
@@ -97,140 +90,126 @@ def get_reports(
             if report_status:
                 filter_query["status"] = report_status
 
-    cursor = report_collection.find(filter_query).skip(offset).limit(limit)
+    docs, next_cursor = await fetch_page(report_collection, filter_query, limit=limit, cursor=cursor, offset=offset)
     items: List[report_out] = []
-    for doc in cursor:
-        items.append(
-            report_out(
-                _id=str(doc["_id"]),
-                created_by=str(doc["created_by"]),
-                content=doc["content"],
-                approved_by=doc.get("approved_by"),
-                status=doc["status"],
-                created_at=doc["created_at"],
-                updated_at=doc.get("updated_at"),
-            )
-        )
-    return items
+    for doc in docs:
+        items.append(_doc_to_report_out(doc))
+    return items, next_cursor
 
 
-def update_report(
+async def update_report(
     report_id: str, update_data: report_update, current_user: dict
 ) -> report_out:
-    db = get_db()
+    db = get_async_db()
     report_collection = db["reports"]
-    existing_report = report_collection.find_one({"_id": ObjectId(report_id)})
-    if not existing_report:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Report Not Found"
-        )
-    if current_user.get("role") == "employee" and str(existing_report["created_by"]) != current_user.get("user_id"):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
-
     update_fields = update_data.model_dump(exclude_unset=True)
-    if not update_fields:
-        return report_out(
-            _id=str(existing_report["_id"]),
-            created_by=str(existing_report["created_by"]),
-            content=existing_report["content"],
-            approved_by=existing_report.get("approved_by"),
-            status=existing_report["status"],
-            created_at=existing_report["created_at"],
-            updated_at=existing_report.get("updated_at"),
-        )
+    expected_version = update_fields.pop("version", None)
 
-    update_fields["updated_at"] = datetime.now()
-    report_collection.update_one({"_id": ObjectId(report_id)}, {"$set": update_fields})
-    updated_doc = report_collection.find_one({"_id": ObjectId(report_id)})
-    try:
-        if current_user and current_user.get("user_id"):
-            create_log(
-                logCreate(
-                    action_type="report_update",
-                    user_id=current_user["user_id"],
-                    description=f"Updated report {report_id}"
-                ),
-                current_user,
-            )
-    except Exception:
-        pass
-    return report_out(
-        _id=str(updated_doc["_id"]),
-        created_by=str(updated_doc["created_by"]),
-        content=updated_doc["content"],
-        approved_by=updated_doc.get("approved_by"),
-        status=updated_doc["status"],
-        created_at=updated_doc["created_at"],
-        updated_at=updated_doc.get("updated_at"),
-    )
+    query = {"_id": ObjectId(report_id), **version_filter(expected_version)}
+    if current_user.get("role") == "employee":
+        query["created_by"] = current_user.get("user_id")
 
-
-def delete_report(report_id: str, current_user: dict) -> dict:
-    db = get_db()
-    report_collection = db["reports"]
-    doc = report_collection.find_one({"_id": ObjectId(report_id)})
-    if not doc:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Report Not Found"
+    if not update_fields:
+        updated_doc = await report_collection.find_one(query)
+    else:
+        update_fields["updated_at"] = datetime.now()
+        updated_doc = await report_collection.find_one_and_update(
+            query,
+            bump_version({"$set": update_fields}),
+            return_document=ReturnDocument.AFTER,
         )
-    if current_user.get("role") == "employee" and str(doc["created_by"]) != current_user.get("user_id"):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
-    result = report_collection.delete_one({"_id": ObjectId(report_id)})
-    if result.deleted_count > 0:
+    if not updated_doc:
+        existing_report = await report_collection.find_one({"_id": ObjectId(report_id)})
+        if not existing_report:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Report Not Found"
+            )
+        if current_user.get("role") == "employee" and str(existing_report["created_by"]) != current_user.get("user_id"):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+        version_conflict(expected_version, existing_report)
+        if update_fields:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Report was modified concurrently"
+            )
+        updated_doc = existing_report
+    elif update_fields:
         try:
             if current_user and current_user.get("user_id"):
-                create_log(
+                await create_log(
                     logCreate(
-                        action_type="report_delete",
+                        action_type="report_update",
                         user_id=current_user["user_id"],
-                        description=f"Deleted report {report_id}"
+                        description=f"Updated report {report_id}"
                     ),
                     current_user,
                 )
         except Exception:
             pass
-        return {"message": "Report successfully deleted."}
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to delete report"
-        )
+    return _doc_to_report_out(updated_doc)
 
 
-def approve_report(report_id: str, current_user: dict) -> report_out:
+async def delete_report(report_id: str, current_user: dict) -> dict:
+    db = get_async_db()
+    report_collection = db["reports"]
+    query = {"_id": ObjectId(report_id)}
+    if current_user.get("role") == "employee":
+        query["created_by"] = current_user.get("user_id")
+    deleted = await report_collection.find_one_and_delete(query, {"status": 1})
+    if not deleted:
+        existing_report = await report_collection.find_one({"_id": ObjectId(report_id)}, {"created_by": 1})
+        if not existing_report:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Report Not Found"
+            )
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    await record_status_change("reports", deleted.get("status"), None)
+    try:
+        if current_user and current_user.get("user_id"):
+            await create_log(
+                logCreate(
+                    action_type="report_delete",
+                    user_id=current_user["user_id"],
+                    description=f"Deleted report {report_id}"
+                ),
+                current_user,
+            )
+    except Exception:
+        pass
+    return {"message": "Report successfully deleted."}
+
+
+async def approve_report(report_id: str, current_user: dict) -> report_out:
     if current_user.get("role") not in ["manager_women", "manager_men", "admin1", "admin2"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
-    db = get_db()
+    db = get_async_db()
     report_collection = db["reports"]
-    
+
     try:
-        doc = report_collection.find_one({"_id": ObjectId(report_id)})
+        object_id = ObjectId(report_id)
     except Exception:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid report ID format")
-    
-    if not doc:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report Not Found")
-    
-    if doc["status"] != "pending":
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid state for approval")
-    
+
     update_data = {
         "approved_by": current_user.get("user_id"),
         "status": "approved",
         "updated_at": datetime.now(),
     }
-    
-    report_collection.update_one(
-        {"_id": ObjectId(report_id)},
-        {"$set": update_data}
+    updated = await report_collection.find_one_and_update(
+        {"_id": object_id, "status": "pending"},
+        bump_version({"$set": update_data}),
+        return_document=ReturnDocument.AFTER,
     )
-    
-    updated = report_collection.find_one({"_id": ObjectId(report_id)})
-    
+    if not updated:
+        if not await report_collection.find_one({"_id": object_id}, {"_id": 1}):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report Not Found")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid state for approval")
+    await record_status_change("reports", "pending", "approved")
+
     try:
         if current_user and current_user.get("user_id"):
-            create_log(
+            await create_log(
                 logCreate(
                     action_type="report_approve",
                     user_id=current_user["user_id"],
@@ -240,13 +219,5 @@ def approve_report(report_id: str, current_user: dict) -> report_out:
             )
     except Exception:
         pass
-    
-    return report_out(
-        _id=str(updated["_id"]),
-        created_by=str(updated["created_by"]),
-        content=updated["content"],
-        approved_by=updated.get("approved_by"),
-        status=updated["status"],
-        created_at=updated["created_at"],
-        updated_at=updated.get("updated_at"),
-    )
\ No newline at end of file
+
+    return _doc_to_report_out(updated)
@@ -1,14 +1,26 @@
 from datetime import datetime, timedelta
 from typing import Optional
 import hashlib
-from utils.db import get_db
+import os
+from pymongo import ReturnDocument
+from utils.db import get_async_db
+from utils.cache import TTLCache
 from services.log import service_exception, logger
 
+TOKEN_GENERATION_CACHE_TTL = float(os.getenv("TOKEN_GENERATION_CACHE_TTL", "30"))
+TOKEN_GENERATION_CACHE_SIZE = int(os.getenv("TOKEN_GENERATION_CACHE_SIZE", "10000"))
+TOKEN_CLEANUP_INTERVAL_SECONDS = float(os.getenv("TOKEN_CLEANUP_INTERVAL_SECONDS", "3600"))
+
+# user_id -> current token generation. A token whose "gen" claim is below the
+# user's generation has been revoked; entries are revalidated after the TTL so
+# bumps made by other processes are picked up.
+generation_cache = TTLCache(maxsize=TOKEN_GENERATION_CACHE_SIZE, ttl=TOKEN_GENERATION_CACHE_TTL)
+
 
 @service_exception
-def create_token(user_id: str, token: str, expires_in_minutes: int = 30) -> bool:
+async def create_token(user_id: str, token: str, expires_in_minutes: int = 30) -> bool:
     try:
-        db = get_db()
+        db = get_async_db()
         tokens_collection = db.tokens
         
         token_hash = hashlib.sha256(token.encode()).hexdigest()
@@ -23,7 +35,7 @@ def create_token(user_id: str, token: str, expires_in_minutes: int = 30) -> bool
             "created_at": datetime.utcnow()
         }
         
-        result = tokens_collection.insert_one(token_doc)
+        result = await tokens_collection.insert_one(token_doc)
         return result.inserted_id is not None
         
     except Exception as e:
@@ -32,14 +44,14 @@ def create_token(user_id: str, token: str, expires_in_minutes: int = 30) -> bool
 
 
 @service_exception
-def verify_stored_token(token: str, user_id: str) -> bool:
+async def verify_stored_token(token: str, user_id: str) -> bool:
     try:
-        db = get_db()
+        db = get_async_db()
         tokens_collection = db.tokens
         
         token_hash = hashlib.sha256(token.encode()).hexdigest()
         
-        token_doc = tokens_collection.find_one({
+        token_doc = await tokens_collection.find_one({
             "user_id": user_id,
             "token_hash": token_hash,
             "is_active": True,
@@ -54,14 +66,14 @@ def verify_stored_token(token: str, user_id: str) -> bool:
 
 
 @service_exception
-def deactivate_token(token: str, user_id: str) -> bool:
+async def deactivate_token(token: str, user_id: str) -> bool:
     try:
-        db = get_db()
+        db = get_async_db()
         tokens_collection = db.tokens
         
         token_hash = hashlib.sha256(token.encode()).hexdigest()
         
-        result = tokens_collection.update_one(
+        result = await tokens_collection.update_one(
             {
                 "user_id": user_id,
                 "token_hash": token_hash,
@@ -80,12 +92,12 @@ def deactivate_token(token: str, user_id: str) -> bool:
 
 
 @service_exception
-def deactivate_user_tokens(user_id: str) -> int:
+async def deactivate_user_tokens(user_id: str) -> int:
     try:
-        db = get_db()
+        db = get_async_db()
         tokens_collection = db.tokens
         
-        result = tokens_collection.update_many(
+        result = await tokens_collection.update_many(
             {
                 "user_id": user_id,
                 "is_active": True
@@ -103,13 +115,18 @@ def deactivate_user_tokens(user_id: str) -> int:
 
 
 @service_exception
-def cleanup_expired_tokens() -> int:
+async def cleanup_expired_tokens() -> int:
     try:
-        db = get_db()
+        db = get_async_db()
         tokens_collection = db.tokens
         
-        result = tokens_collection.delete_many({
-            "expires_at": {"$lt": datetime.utcnow()}
+        # The TTL index on expires_at removes expired rows eventually; this also
+        # drops deactivated ones, which verify_stored_token never accepts again
+        result = await tokens_collection.delete_many({
+            "$or": [
+                {"expires_at": {"$lt": datetime.utcnow()}},
+                {"is_active": False},
+            ]
         })
         
         return result.deleted_count
@@ -117,3 +134,54 @@ def cleanup_expired_tokens() -> int:
     except Exception as e:
         logger.exception("Error cleaning up expired tokens: %s", e)
         return 0
+
+
+@service_exception
+async def cleanup_refresh_families() -> int:
+    try:
+        result = await get_async_db()["refresh_families"].delete_many({
+            "$or": [
+                {"expires_at": {"$lt": datetime.utcnow()}},
+                {"revoked": True},
+            ]
+        })
+        return result.deleted_count
+
+    except Exception as e:
+        logger.exception("Error cleaning up refresh families: %s", e)
+        return 0
+
+
+async def get_token_generation(user_id: str) -> int:
+    generation = generation_cache.get(user_id)
+    if generation is None:
+        doc = await get_async_db()["token_generations"].find_one({"_id": user_id}, {"gen": 1})
+        generation = doc.get("gen", 0) if doc else 0
+        generation_cache.set(user_id, generation)
+    return generation
+
+
+async def bump_token_generation(user_id: str) -> int:
+    """Revoke every token issued to the user so far and return the new generation"""
+    doc = await get_async_db()["token_generations"].find_one_and_update(
+        {"_id": user_id},
+        {"$inc": {"gen": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    generation = doc["gen"]
+    generation_cache.set(user_id, generation)
+    return generation
+
+
+async def is_token_revoked(payload: dict) -> bool:
+    user_id = payload.get("user_id")
+    if not user_id:
+        return False
+    token_generation = payload.get("gen", 0)
+    current = await get_token_generation(user_id)
+    if token_generation > current:
+        # Issued after a bump this process has not seen yet
+        generation_cache.set(user_id, token_generation)
+        return False
+    return token_generation < current
@@ -2,31 +2,33 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from pymongo import errors
+from pymongo import errors, ReturnDocument
 from datetime import datetime
 from bson import ObjectId
 from fastapi import HTTPException, status
 from models.user import employee_create, employee_out, employee_out_with_password, employee_out_with_token, employee_update, PyObjectId
-from services.token import create_token
-from utils.db import get_db
+from services.token import create_token, bump_token_generation
+from services.principal import invalidate_principal
+from utils.db import get_async_db
 from typing import List
-from utils.password_hash import hash_password
+from utils.password_hash import hash_password_async
 from services.log import create_log
 from models.log import logCreate
 from utils.helpers import mask_password
+from utils.versioning import version_filter, bump_version, version_conflict
 
 
-def create_user(user: employee_create, current_user: dict, return_token: bool = True):
+async def create_user(user: employee_create, current_user: dict, return_token: bool = True):
     if current_user.get("role") not in ("admin1", "admin2"):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admin1/admin2 can create a new user",
         )
 
-    db = get_db()
+    db = get_async_db()
     
     user_collection = db["employees"]
-    if user_collection.find_one({"employee_id": user.employee_id}):
+    if await user_collection.find_one({"employee_id": user.employee_id}):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="employee_id already exists")
 
     now = datetime.now()
@@ -39,7 +41,9 @@ def create_user(user: employee_create, current_user: dict, return_token: bool =
     hashed_password: str | None = None
     if user.password:
         try:
-            hashed_password = hash_password(user.password)
+            hashed_password = await hash_password_async(user.password)
+        except HTTPException:
+            raise
         except Exception:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid password provided")
     user_data = {
@@ -54,7 +58,7 @@ def create_user(user: employee_create, current_user: dict, return_token: bool =
     }
 
     try:
-        user_collection.insert_one(user_data)
+        await user_collection.insert_one(user_data)
     except errors.DuplicateKeyError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -71,7 +75,7 @@ def create_user(user: employee_create, current_user: dict, return_token: bool =
             token = "mock-token-for-new-user"
 
         try:
-            create_token(str(user_data["_id"]), token, expires_in_minutes=30)
+            await create_token(str(user_data["_id"]), token, expires_in_minutes=30)
         except Exception as e:
             print(f"Warning: Could not store token in database: {e}")
 
@@ -97,7 +101,7 @@ def create_user(user: employee_create, current_user: dict, return_token: bool =
         )
         try:
             if current_user and current_user.get("user_id"):
-                create_log(
+                await create_log(
                     logCreate(
                         action_type="create_user",
                         user_id=current_user["user_id"],
@@ -110,19 +114,19 @@ def create_user(user: employee_create, current_user: dict, return_token: bool =
         return result
 
 
-def get_all_users(current_user: dict) -> List[employee_out_with_password]:
+async def get_all_users(current_user: dict) -> List[employee_out_with_password]:
     if current_user.get("role") not in ("admin1", "admin2", "manager_women", "manager_men"):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admin1, admin2, manager_women, or manager_men can view all users",
         )
 
-    db = get_db()
+    db = get_async_db()
     
     user_collection = db["employees"]
     
     try:
-        users = list(user_collection.find())
+        users = await user_collection.find().to_list(None)
         return [
             employee_out_with_password(
                 id=str(user["_id"]),
@@ -133,6 +137,7 @@ def get_all_users(current_user: dict) -> List[employee_out_with_password]:
                 password_hash=mask_password(len(user.get("password_hash") or "")),
                 created_at=user["created_at"],
                 updated_at=user["updated_at"],
+                version=user.get("version", 0),
             )
             for user in users
         ]
@@ -143,25 +148,27 @@ def get_all_users(current_user: dict) -> List[employee_out_with_password]:
         )
 
 
-def delete_user(user_id: str, current_user: dict):
+async def delete_user(user_id: str, current_user: dict):
     if current_user.get("role") != "admin1":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only the administrator can delete a user",
         )
 
-    db = get_db()
+    db = get_async_db()
     
     user_collection = db["employees"]
-    result = user_collection.delete_one({"_id": ObjectId(user_id)})
+    result = await user_collection.delete_one({"_id": ObjectId(user_id)})
     if result.deleted_count == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found",
         )
+    invalidate_principal(user_id)
+    await bump_token_generation(user_id)
     try:
         if current_user and current_user.get("user_id"):
-            create_log(
+            await create_log(
                 logCreate(
                     action_type="delete_user",
                     user_id=current_user["user_id"],
@@ -174,24 +181,17 @@ def delete_user(user_id: str, current_user: dict):
     return {"message": "user deleted"}
 
 
-def update_user(user_id: str, user_data: employee_update, current_user: dict):
+async def update_user(user_id: str, user_data: employee_update, current_user: dict):
     if current_user.get("role") != "admin1":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only the administrator can update a user",
         )
 
-    db = get_db()
+    db = get_async_db()
     
     user_collection = db["employees"]
 
-    result = user_collection.find_one({"_id": ObjectId(user_id)})
-    if not result:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-
     update_fields = {"updated_at": datetime.now()}
 
     if user_data.full_name is not None:
@@ -202,16 +202,32 @@ def update_user(user_id: str, user_data: employee_update, current_user: dict):
         update_fields["status"] = user_data.status
     if user_data.password is not None:
         try:
-            update_fields["password_hash"] = hash_password(user_data.password)
+            update_fields["password_hash"] = await hash_password_async(user_data.password)
+        except HTTPException:
+            raise
         except Exception:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid password provided")
 
-    user_collection.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$set": update_fields}
+    updated_user = await user_collection.find_one_and_update(
+        {"_id": ObjectId(user_id), **version_filter(user_data.version)},
+        bump_version({"$set": update_fields}),
+        return_document=ReturnDocument.AFTER,
     )
+    if not updated_user:
+        existing = await user_collection.find_one({"_id": ObjectId(user_id)}, {"version": 1})
+        if not existing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        version_conflict(user_data.version, existing)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="User was modified concurrently")
+    invalidate_principal(str(updated_user["_id"]))
+
+    if user_data.password is not None or user_data.role is not None or user_data.status is not None:
+        # Tokens carry the role and must not outlive a credential or access change
+        await bump_token_generation(str(updated_user["_id"]))
 
-    updated_user = user_collection.find_one({"_id": ObjectId(user_id)})
     result = employee_out_with_password(
         id=str(updated_user["_id"]),
         employee_id=updated_user["employee_id"],
@@ -221,10 +237,11 @@ def update_user(user_id: str, user_data: employee_update, current_user: dict):
         password_hash=mask_password(len(updated_user.get("password_hash", "") or "")),
         created_at=updated_user["created_at"],
         updated_at=updated_user["updated_at"],
+        version=updated_user.get("version", 0),
     )
     try:
         if current_user and current_user.get("user_id"):
-            create_log(
+            await create_log(
                 logCreate(
                     action_type="update_user",
                     user_id=current_user["user_id"],
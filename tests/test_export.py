@@ -0,0 +1,37 @@
+import csv
+import io
+import json
+
+import pytest
+
+from utils.export import encode_csv, encode_ndjson
+
+
+async def _rows(*rows):
+    for row in rows:
+        yield row
+
+
+async def _collect(stream):
+    return b"".join([chunk async for chunk in stream]).decode("utf-8")
+
+
+@pytest.mark.parametrize("value, cell", [
+    ("=HYPERLINK(\"http://x\")", "'=HYPERLINK(\"http://x\")"),
+    ("+1", "'+1"),
+    ("-2+3", "'-2+3"),
+    ("@SUM(A1)", "'@SUM(A1)"),
+    ("\tcmd", "'\tcmd"),
+    ("\rcmd", "'\rcmd"),
+    ("a=b", "a=b"),
+    (-5, "-5"),
+    (None, ""),
+])
+async def test_csv_escapes_formula_cells(value, cell):
+    body = await _collect(encode_csv(_rows({"name": value}), ["name"]))
+    assert list(csv.reader(io.StringIO(body, newline=""))) == [["name"], [cell]]
+
+
+async def test_ndjson_keeps_values_unchanged():
+    body = await _collect(encode_ndjson(_rows({"name": "=1+1"}), ["name"]))
+    assert json.loads(body) == {"name": "=1+1"}
@@ -0,0 +1,98 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING
+
+from utils.pagination import decode_cursor, encode_cursor, keyset_filter
+
+
+def _matches(doc, query):
+    """Evaluate the subset of the query language keyset_filter emits"""
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(doc, clause) for clause in condition):
+                return False
+            continue
+        value = doc.get(field)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+        for op, operand in condition.items():
+            # Comparisons with a non-null operand never match null or missing fields
+            if op == "$gt" and not (value is not None and value > operand):
+                return False
+            if op == "$lt" and not (value is not None and value < operand):
+                return False
+            if op == "$ne" and value == operand:
+                return False
+    return True
+
+
+def _mongo_order(docs, field, direction):
+    # Null and missing values sort before every other value
+    key = lambda doc: (doc.get(field) is not None, doc.get(field) or 0, doc["_id"])
+    return sorted(docs, key=key, reverse=direction == DESCENDING)
+
+
+def _walk(docs, field, direction, limit=2):
+    ordered = _mongo_order(docs, field, direction)
+    seen, cursor = [], None
+    while True:
+        remaining = [doc for doc in ordered if cursor is None or _matches(doc, keyset_filter(field, direction, cursor))]
+        page = remaining[:limit]
+        seen.extend(page)
+        if len(remaining) <= limit:
+            return [doc["_id"] for doc in ordered], [doc["_id"] for doc in seen]
+        cursor = encode_cursor(page[-1], field)
+
+
+@pytest.fixture
+def docs():
+    values = [None, 3, 1, None, 3, 2, None, 5, 1]
+    return [
+        {"_id": ObjectId(f"{index + 1:024x}"), "quantity": value}
+        if value is not None or index % 2 else {"_id": ObjectId(f"{index + 1:024x}")}
+        for index, value in enumerate(values)
+    ]
+
+
+@pytest.mark.parametrize("direction", [ASCENDING, DESCENDING])
+@pytest.mark.parametrize("field", ["quantity", "_id"])
+def test_keyset_pages_cover_every_document_once(docs, field, direction):
+    expected, seen = _walk(docs, field, direction)
+    assert seen == expected
+
+
+@pytest.mark.parametrize("direction", [ASCENDING, DESCENDING])
+def test_keyset_pages_with_only_null_sort_keys(direction):
+    docs = [{"_id": ObjectId(f"{index + 1:024x}"), "quantity": None} for index in range(5)]
+    expected, seen = _walk(docs, "quantity", direction)
+    assert seen == expected
+
+
+@pytest.mark.parametrize("value", [None, 0, 2.5, "name", datetime(2026, 1, 31, 23, 59, 59, 999000)])
+def test_cursor_round_trip(value):
+    doc = {"_id": ObjectId(), "field": value}
+    assert decode_cursor(encode_cursor(doc, "field"), "field") == (value, doc["_id"])
+
+
+def test_cursor_round_trip_id_order():
+    doc = {"_id": ObjectId()}
+    assert decode_cursor(encode_cursor(doc), "_id") == (None, doc["_id"])
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", "e30"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, "_id")
+    assert exc.value.status_code == 400
+
+
+def test_cursor_for_other_sort_field_is_rejected():
+    cursor = encode_cursor({"_id": ObjectId(), "name": "a"}, "name")
+    with pytest.raises(HTTPException) as exc:
+        keyset_filter("created_at", ASCENDING, cursor)
+    assert exc.value.status_code == 400
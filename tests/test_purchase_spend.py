@@ -0,0 +1,124 @@
+from datetime import datetime
+
+import pytest
+
+from services.purchase_spend import _contributions, _rollup_id, period_start
+
+
+@pytest.mark.parametrize("moment, expected", [
+    (datetime(2026, 10, 18, 23, 59, 59, 999999), datetime(2026, 10, 18)),
+    (datetime(2026, 10, 18), datetime(2026, 10, 18)),
+])
+def test_period_start_day(moment, expected):
+    assert period_start(moment, "day") == expected
+
+
+@pytest.mark.parametrize("moment, expected", [
+    # Monday starts its own week
+    (datetime(2026, 10, 12, 0, 0), datetime(2026, 10, 12)),
+    # Sunday belongs to the week that started six days earlier
+    (datetime(2026, 10, 18, 23, 59), datetime(2026, 10, 12)),
+    # Weeks cross month and year boundaries
+    (datetime(2026, 10, 1, 12, 0), datetime(2026, 9, 28)),
+    (datetime(2027, 1, 1, 8, 30), datetime(2026, 12, 28)),
+    (datetime(2024, 3, 1), datetime(2024, 2, 26)),
+])
+def test_period_start_week(moment, expected):
+    assert period_start(moment, "week") == expected
+    assert period_start(moment, "week").weekday() == 0
+
+
+@pytest.mark.parametrize("moment, expected", [
+    (datetime(2026, 10, 1), datetime(2026, 10, 1)),
+    (datetime(2026, 10, 31, 23, 59, 59), datetime(2026, 10, 1)),
+    (datetime(2024, 2, 29, 12, 0), datetime(2024, 2, 1)),
+    (datetime(2026, 12, 31, 23, 59), datetime(2026, 12, 1)),
+])
+def test_period_start_month(moment, expected):
+    assert period_start(moment, "month") == expected
+
+
+def test_contributions_cover_every_granularity_and_dimension():
+    doc = {
+        "created_at": datetime(2026, 10, 18, 9, 0),
+        "total_price": 12.5,
+        "status": "approved",
+        "budget_code": "OPS",
+        "supplier": None,
+        "category": "furniture",
+    }
+    buckets = _contributions(doc, 1)
+    assert len(buckets) == 9
+    week = buckets[_rollup_id("week", datetime(2026, 10, 12), "supplier", "")]
+    assert week["inc"] == {"amount": 12.5, "count": 1, "by_status.approved": 12.5}
+    removed = _contributions(doc, -1)[_rollup_id("month", datetime(2026, 10, 1), "budget_code", "OPS")]
+    assert removed["inc"] == {"amount": -12.5, "count": -1, "by_status.approved": -12.5}
+
+
+def test_contributions_skip_items_without_created_at():
+    assert _contributions({"total_price": 3.0}, 1) == {}
+
+
+class _HookedCursor:
+    def __init__(self, cursor, hook):
+        self.cursor = cursor
+        self.hook = hook
+
+    def batch_size(self, size):
+        return self
+
+    async def __aiter__(self):
+        await self.hook()
+        async for doc in self.cursor:
+            yield doc
+
+
+class _HookedCollection:
+    """Runs hook once a scan starts iterating, i.e. after the rebuild took its start time"""
+
+    def __init__(self, collection, hook):
+        self.collection = collection
+        self.hook = hook
+
+    def find(self, *args, **kwargs):
+        return _HookedCursor(self.collection.find(*args, **kwargs), self.hook)
+
+
+async def test_rebuild_keeps_writes_made_while_it_runs(monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from services import purchase_spend
+
+    client = mongomock_motor.AsyncMongoMockClient()
+    items = client["purchases_db"]["purchaseItems"]
+    spend = client["purchases_db"][purchase_spend.SPEND_COLLECTION]
+    created_at = datetime(2026, 10, 14, 9, 0)
+    old = datetime(2026, 10, 14, 9, 0)
+    steady = {"_id": 1, "created_at": created_at, "updated_at": old, "total_price": 4.0, "status": "pending", "budget_code": "A"}
+    moving = {"_id": 2, "created_at": created_at, "updated_at": old, "total_price": 10.0, "status": "pending", "budget_code": "B"}
+
+    async def write_during_scan():
+        # The write path of update_purchase_item: item first, then the rollups
+        updated = {**moving, "total_price": 15.0, "updated_at": datetime.now()}
+        await items.replace_one({"_id": 2}, updated)
+        await purchase_spend.record_spend_change(moving, updated)
+
+    def fake_db(name="employee_db"):
+        return {"purchaseItems": _HookedCollection(items, write_during_scan), purchase_spend.SPEND_COLLECTION: spend}
+
+    monkeypatch.setattr(purchase_spend, "get_async_db", lambda name="employee_db": client[name])
+    await items.insert_many([steady, moving])
+    await purchase_spend.record_spend_change(None, steady)
+    await purchase_spend.record_spend_change(None, moving)
+    # Drift the steady bucket so the rebuild has something to correct
+    steady_month = _rollup_id("month", datetime(2026, 10, 1), "budget_code", "A")
+    await spend.update_one({"_id": steady_month}, {"$inc": {"amount": 100.0, "count": 3}})
+    await spend.insert_one({"_id": "orphan", "count": 1, "amount": 1.0, "updated_at": old})
+
+    monkeypatch.setattr(purchase_spend, "get_async_db", fake_db)
+    await purchase_spend.rebuild_spend_rollups()
+
+    moving_month = await spend.find_one({"_id": _rollup_id("month", datetime(2026, 10, 1), "budget_code", "B")})
+    assert (moving_month["amount"], moving_month["count"]) == (15.0, 1)
+    steady_bucket = await spend.find_one({"_id": steady_month})
+    assert (steady_bucket["amount"], steady_bucket["count"]) == (4.0, 1)
+    assert await spend.find_one({"_id": "orphan"}) is None
@@ -0,0 +1,58 @@
+import pytest
+from fastapi import HTTPException
+
+from services import auth
+from utils.rate_limit import MemoryWindowStore, SlidingWindowLimiter
+
+
+@pytest.fixture
+def limiters(monkeypatch):
+    account = SlidingWindowLimiter(3, 3600, MemoryWindowStore(max_keys=50))
+    ip = SlidingWindowLimiter(10, 3600, MemoryWindowStore(max_keys=50))
+    monkeypatch.setattr(auth, "account_login_limiter", account)
+    monkeypatch.setattr(auth, "ip_login_limiter", ip)
+    return account, ip
+
+
+async def test_flood_of_distinct_ids_from_one_ip_leaves_others_able_to_log_in(limiters):
+    account, _ = limiters
+    rejected = 0
+    for employee_id in range(500):
+        try:
+            await auth.check_login_rate_limit(str(employee_id), "10.0.0.66")
+        except HTTPException as e:
+            assert e.status_code == 429
+            rejected += 1
+    assert rejected == 490
+    # Once the IP is over its limit no further account keys are created
+    assert account.store._size == 10
+
+    for employee_id in ("alice", "bob"):
+        await auth.check_login_rate_limit(employee_id, "10.0.0.7")
+
+
+async def test_full_account_store_does_not_lock_out_new_accounts(limiters):
+    account, _ = limiters
+    for employee_id in range(50):
+        await auth.check_login_rate_limit(str(employee_id), f"10.1.0.{employee_id}")
+    assert account.store._size == 50
+    await auth.check_login_rate_limit("carol", "10.2.0.1")
+
+
+async def test_tracked_account_keeps_its_limit_when_the_store_is_full(limiters):
+    for _ in range(3):
+        await auth.check_login_rate_limit("dave", "10.3.0.1")
+    for employee_id in range(60):
+        await auth.check_login_rate_limit(str(employee_id), f"10.4.0.{employee_id}")
+    with pytest.raises(HTTPException) as exc:
+        await auth.check_login_rate_limit("dave", "10.3.0.2")
+    assert exc.value.status_code == 429
+
+
+async def test_full_store_evicts_from_the_previous_window():
+    store = MemoryWindowStore(max_keys=2)
+    await store.hit("a", 1, 60)
+    await store.hit("b", 1, 60)
+    assert await store.hit("c", 2, 60) == (0, 1)
+    assert await store.hit("b", 2, 60) == (1, 1)
+    assert store._size == 2
@@ -0,0 +1,104 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.requests import Request
+
+from utils.static_files import _etag_matches, _parse_range, conditional_file_response
+
+SIZE = 1000
+
+
+def _request(**headers: str) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=0-0", (0, 0)),
+    ("bytes=500-", (500, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=999-999", (999, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-1", (999, 999)),
+    ("bytes=-5000", (0, 999)),
+    (" bytes=10-19 ", (10, 19)),
+])
+def test_parse_range_satisfiable(header, expected):
+    assert _parse_range(header, SIZE) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=1000-1001", "bytes=-0", "bytes=5-2"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(HTTPException) as exc:
+        _parse_range(header, SIZE)
+    assert exc.value.status_code == 416
+    assert exc.value.headers == {"Content-Range": f"bytes */{SIZE}"}
+
+
+@pytest.mark.parametrize("header", ["bytes=-", "bytes=0-1,5-6", "items=0-1", "bytes=a-b", ""])
+def test_parse_range_ignored(header):
+    assert _parse_range(header, SIZE) is None
+
+
+@pytest.mark.parametrize("header, matches", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz", W/"abc"', True),
+    ("*", True),
+    ('"abcd"', False),
+    ('"xyz"', False),
+    ("abc", False),
+])
+def test_etag_matches(header, matches):
+    assert _etag_matches(header, '"abc"') is matches
+
+
+@pytest.fixture
+def avatar_file(tmp_path):
+    path = tmp_path / "avatar.png"
+    path.write_bytes(bytes(range(256)) * 4)
+    return str(path)
+
+
+async def test_conditional_response_range(avatar_file):
+    response = await conditional_file_response(_request(range="bytes=10-19"), avatar_file, "private", etag="h1")
+    assert isinstance(response, StreamingResponse)
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 10-19/1024"
+    assert response.headers["content-length"] == "10"
+    assert response.headers["x-content-type-options"] == "nosniff"
+
+
+async def test_conditional_response_if_range_match(avatar_file):
+    response = await conditional_file_response(_request(range="bytes=-24", if_range='"h1"'), avatar_file, "private", etag="h1")
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 1000-1023/1024"
+
+
+async def test_conditional_response_if_range_mismatch(avatar_file):
+    response = await conditional_file_response(_request(range="bytes=10-19", if_range='"old"'), avatar_file, "private", etag="h1")
+    assert isinstance(response, FileResponse)
+    assert response.status_code == 200
+    assert "content-range" not in response.headers
+
+
+async def test_conditional_response_not_modified(avatar_file):
+    response = await conditional_file_response(_request(if_none_match='W/"h1"'), avatar_file, "private", etag="h1")
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"h1"'
+
+
+async def test_conditional_response_explicit_media_type(avatar_file):
+    response = await conditional_file_response(_request(), avatar_file, "private", media_type="application/octet-stream")
+    assert response.media_type == "application/octet-stream"
+
+
+async def test_conditional_response_missing_file(tmp_path):
+    with pytest.raises(HTTPException) as exc:
+        await conditional_file_response(_request(), str(tmp_path / "gone.png"), "private")
+    assert exc.value.status_code == 404
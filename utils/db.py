@@ -1,6 +1,101 @@
+import os
+import threading
+from typing import Dict, Optional
 from pymongo import MongoClient
+from pymongo.database import Database
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
+from utils.db_profiler import DB_PROFILING, query_profiler
 
-def get_db(db_name: str = "employee_db"):
-    client = MongoClient("mongodb://localhost:27017")
-    return client[db_name]
\ No newline at end of file
+MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017/")
+DATABASE_NAMES = ("employee_db", "purchases_db", "checklists_db")
+
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "300000"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
+
+_client: Optional[MongoClient] = None
+_databases: Dict[str, Database] = {}
+_async_client: Optional[AsyncIOMotorClient] = None
+_async_databases: Dict[str, AsyncIOMotorDatabase] = {}
+_lock = threading.RLock()
+
+
+def _client_options() -> dict:
+    options = {
+        "maxPoolSize": MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": MONGODB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGODB_MAX_IDLE_TIME_MS,
+        "serverSelectionTimeoutMS": MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGODB_CONNECT_TIMEOUT_MS,
+    }
+    if DB_PROFILING:
+        options["event_listeners"] = [query_profiler]
+    return options
+
+
+def get_client() -> MongoClient:
+    """Return the process-wide MongoClient, creating it on first use"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = MongoClient(MONGODB_URL, **_client_options())
+    return _client
+
+
+def get_db(db_name: str = "employee_db") -> Database:
+    """Return a database handle backed by the shared connection pool"""
+    database = _databases.get(db_name)
+    if database is None:
+        with _lock:
+            database = _databases.get(db_name)
+            if database is None:
+                database = get_client()[db_name]
+                _databases[db_name] = database
+    return database
+
+
+def get_async_client() -> AsyncIOMotorClient:
+    """Return the process-wide Motor client, creating it on first use"""
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                _async_client = AsyncIOMotorClient(MONGODB_URL, **_client_options())
+    return _async_client
+
+
+def get_async_db(db_name: str = "employee_db") -> AsyncIOMotorDatabase:
+    """Return an async database handle backed by the shared Motor client"""
+    database = _async_databases.get(db_name)
+    if database is None:
+        with _lock:
+            database = _async_databases.get(db_name)
+            if database is None:
+                database = get_async_client()[db_name]
+                _async_databases[db_name] = database
+    return database
+
+
+def init_db() -> None:
+    """Create the shared clients and register the known databases at startup"""
+    for db_name in DATABASE_NAMES:
+        get_db(db_name)
+        get_async_db(db_name)
+
+
+def close_db() -> None:
+    """Close the shared clients and drop every cached database handle"""
+    global _client, _async_client
+    with _lock:
+        _databases.clear()
+        _async_databases.clear()
+        if _client is not None:
+            _client.close()
+            _client = None
+        if _async_client is not None:
+            _async_client.close()
+            _async_client = None
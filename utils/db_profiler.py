@@ -0,0 +1,145 @@
+import contextvars
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+import bson
+from pymongo import monitoring
+
+logger = logging.getLogger("employee_app")
+
+DB_PROFILING = os.getenv("DB_PROFILING", "0") == "1"
+DB_QUERY_BUDGET = int(os.getenv("DB_QUERY_BUDGET", "10"))
+# Byte counts re-encode every command and reply, which for export batches
+# and $facet replies costs as much as the query; measure them only on request
+DB_PROFILING_BYTES = os.getenv("DB_PROFILING_BYTES", "0") == "1"
+
+# Requests that matched no route share one bucket so arbitrary URLs cannot
+# grow the per-route table
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestStats:
+    """Database work done while serving a single HTTP request"""
+
+    __slots__ = ("route", "commands", "duration_ms", "bytes_sent", "bytes_received", "by_command")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.commands = 0
+        self.duration_ms = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.by_command: Dict[str, int] = {}
+
+    def record(self, command_name: str, duration_ms: float, sent: int, received: int) -> None:
+        self.commands += 1
+        self.duration_ms += duration_ms
+        self.bytes_sent += sent
+        self.bytes_received += received
+        self.by_command[command_name] = self.by_command.get(command_name, 0) + 1
+
+
+class RouteStats:
+    """Aggregated database usage of every request served by one route"""
+
+    def __init__(self):
+        self.requests = 0
+        self.commands = 0
+        self.max_commands = 0
+        self.duration_ms = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.over_budget = 0
+
+    def add(self, stats: RequestStats, budget: int) -> None:
+        self.requests += 1
+        self.commands += stats.commands
+        self.max_commands = max(self.max_commands, stats.commands)
+        self.duration_ms += stats.duration_ms
+        self.bytes_sent += stats.bytes_sent
+        self.bytes_received += stats.bytes_received
+        if stats.commands > budget:
+            self.over_budget += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        requests = self.requests or 1
+        return {
+            "requests": self.requests,
+            "commands": self.commands,
+            "avg_commands": round(self.commands / requests, 2),
+            "max_commands": self.max_commands,
+            "total_db_ms": round(self.duration_ms, 3),
+            "avg_db_ms": round(self.duration_ms / requests, 3),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "over_budget": self.over_budget,
+        }
+
+
+_request_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("db_request_stats", default=None)
+
+
+class QueryProfiler(monitoring.CommandListener):
+    """pymongo command listener that attributes every command to the current request.
+
+    The request is tracked through a context variable, which Motor copies into
+    the executor thread that runs the command, so commands issued from
+    background tasks (no active request) are ignored.
+    """
+
+    def __init__(self, budget: int = DB_QUERY_BUDGET, measure_bytes: bool = DB_PROFILING_BYTES):
+        self.budget = budget
+        self.measure_bytes = measure_bytes
+        self._lock = threading.Lock()
+        self._routes: Dict[str, RouteStats] = {}
+        self._pending: Dict[Tuple[Any, int], Tuple[RequestStats, int]] = {}
+
+    def begin_request(self, route: str = UNMATCHED_ROUTE) -> Tuple[RequestStats, contextvars.Token]:
+        stats = RequestStats(route)
+        return stats, _request_stats.set(stats)
+
+    def end_request(self, stats: RequestStats, token: contextvars.Token, route: Optional[str] = None) -> None:
+        _request_stats.reset(token)
+        stats.route = route or UNMATCHED_ROUTE
+        if stats.commands > self.budget:
+            logger.warning(
+                "Query budget exceeded on %s: %s commands (budget %s) %s",
+                stats.route, stats.commands, self.budget, stats.by_command,
+            )
+        with self._lock:
+            self._routes.setdefault(stats.route, RouteStats()).add(stats, self.budget)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = {route: stats.to_dict() for route, stats in sorted(self._routes.items())}
+        return {"query_budget": self.budget, "bytes_measured": self.measure_bytes, "routes": routes}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        stats = _request_stats.get()
+        if stats is None:
+            return
+        sent = len(bson.encode(event.command)) if self.measure_bytes else 0
+        self._pending[(event.connection_id, event.request_id)] = (stats, sent)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        stats, sent = pending
+        received = len(bson.encode(event.reply)) if self.measure_bytes else 0
+        stats.record(event.command_name, event.duration_micros / 1000.0, sent, received)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        stats, sent = pending
+        stats.record(event.command_name, event.duration_micros / 1000.0, sent, 0)
+
+
+query_profiler = QueryProfiler()
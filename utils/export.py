@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, Literal, Sequence
+from bson import ObjectId
+
+ExportFormat = Literal["csv", "ndjson"]
+
+# Rows are encoded into a buffer and handed to the response once it holds
+# about this much, so the client sees few large writes instead of one per row
+EXPORT_FLUSH_BYTES = 64 * 1024
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
+
+# Spreadsheets evaluate cells starting with these as formulas
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_cell(value: Any) -> Any:
+    """Plain cell value, with text that would start a formula quoted by a leading apostrophe"""
+    if value is None:
+        return ""
+    value = _plain(value)
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+async def encode_csv(rows: AsyncIterator[Dict[str, Any]], columns: Sequence[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for row in rows:
+        writer.writerow([_csv_cell(row.get(column)) for column in columns])
+        if buffer.tell() >= EXPORT_FLUSH_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def encode_ndjson(rows: AsyncIterator[Dict[str, Any]], columns: Sequence[str]) -> AsyncIterator[bytes]:
+    parts = []
+    size = 0
+    async for row in rows:
+        line = json.dumps({column: _plain(row.get(column)) for column in columns}, ensure_ascii=False) + "\n"
+        parts.append(line)
+        size += len(line)
+        if size >= EXPORT_FLUSH_BYTES:
+            yield "".join(parts).encode("utf-8")
+            parts, size = [], 0
+    if parts:
+        yield "".join(parts).encode("utf-8")
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Compress a byte stream incrementally into a single gzip member"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def encode_rows(
+    rows: AsyncIterator[Dict[str, Any]],
+    columns: Sequence[str],
+    export_format: ExportFormat,
+    compress: bool = False,
+) -> AsyncIterator[bytes]:
+    stream = encode_csv(rows, columns) if export_format == "csv" else encode_ndjson(rows, columns)
+    return gzip_stream(stream) if compress else stream
+
+
+def export_headers(basename: str, export_format: ExportFormat, compress: bool) -> Dict[str, str]:
+    filename = f"{basename}.{export_format}" + (".gz" if compress else "")
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
+def export_media_type(export_format: ExportFormat, compress: bool) -> str:
+    return "application/gzip" if compress else MEDIA_TYPES[export_format]
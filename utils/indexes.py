@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import sys
+from typing import Dict, Iterator, List, Tuple
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+from utils.db import get_db, get_async_db
+
+logger = logging.getLogger("employee_app")
+
+# Every index the services rely on, keyed by (database, collection). Names are
+# left to MongoDB's defaults so existing indexes created by older releases are
+# recognised instead of conflicting.
+INDEX_REGISTRY: Dict[Tuple[str, str], List[IndexModel]] = {
+    ("employee_db", "employees"): [
+        IndexModel([("employee_id", ASCENDING)]),
+        IndexModel([("role", ASCENDING)]),
+    ],
+    ("employee_db", "admins"): [
+        IndexModel([("employee_id", ASCENDING)]),
+    ],
+    ("employee_db", "leave_requests"): [
+        IndexModel([("created_by", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("status", ASCENDING)]),
+    ],
+    ("employee_db", "reports"): [
+        IndexModel([("created_by", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING)]),
+        IndexModel([("approved_by", ASCENDING)]),
+    ],
+    ("employee_db", "logs"): [
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("action_type", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING)]),
+    ],
+    ("employee_db", "tokens"): [
+        IndexModel([("user_id", ASCENDING), ("token_hash", ASCENDING), ("is_active", ASCENDING), ("expires_at", ASCENDING)]),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    ("employee_db", "login_attempts"): [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    ("employee_db", "refresh_families"): [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    ("employee_db", "avatar"): [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+        IndexModel([("user_id_str", ASCENDING)]),
+        IndexModel([("content_hash", ASCENDING)]),
+    ],
+    ("employee_db", "avatar_blobs"): [
+        IndexModel([("refcount", ASCENDING), ("released_at", ASCENDING)]),
+    ],
+    ("purchases_db", "purchaseItems"): [
+        IndexModel([("name", TEXT), ("description", TEXT)]),
+        IndexModel([("name_key", ASCENDING)]),
+        IndexModel([("category", ASCENDING)]),
+        IndexModel([("priority", ASCENDING)]),
+        IndexModel([("status", ASCENDING)]),
+        IndexModel([("created_by", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("required_date", ASCENDING)]),
+        IndexModel([("supplier", ASCENDING)]),
+        IndexModel([("budget_code", ASCENDING)]),
+        IndexModel([("category", ASCENDING), ("priority", ASCENDING), ("status", ASCENDING)]),
+    ],
+    ("purchases_db", "purchase_spend"): [
+        IndexModel([("dimension", ASCENDING), ("granularity", ASCENDING), ("period", ASCENDING), ("value", ASCENDING)]),
+    ],
+    ("checklists_db", "checklist"): [
+        IndexModel([("assigned_to", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("task_id", ASCENDING)]),
+    ],
+}
+
+
+def _describe(db_name: str, collection: str) -> str:
+    return f"{db_name}.{collection}"
+
+
+def _index_plan() -> Iterator[Tuple[int, str, str, List[IndexModel], str]]:
+    """(position, db_name, collection, models, target) for every registered collection"""
+    for position, ((db_name, collection), models) in enumerate(INDEX_REGISTRY.items(), start=1):
+        yield position, db_name, collection, models, _describe(db_name, collection)
+
+
+def _record_created(created: Dict[str, List[str]], position: int, target: str, names: List[str]) -> None:
+    created[target] = names
+    logger.info("Indexes [%s/%s] %s: %s", position, len(INDEX_REGISTRY), target, ", ".join(names))
+
+
+def _record_finished(created: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    logger.info("Index build finished for %s of %s collections", len(created), len(INDEX_REGISTRY))
+    return created
+
+
+async def ensure_indexes() -> Dict[str, List[str]]:
+    """Create every registered index through the async client, one collection at a time"""
+    created: Dict[str, List[str]] = {}
+    for position, db_name, collection, models, target in _index_plan():
+        try:
+            _record_created(created, position, target, await get_async_db(db_name)[collection].create_indexes(models))
+        except Exception as e:
+            logger.error(f"Error creating indexes for {target}: {str(e)}")
+    return _record_finished(created)
+
+
+def ensure_indexes_sync() -> Dict[str, List[str]]:
+    """Blocking variant of ensure_indexes for scripts and the command line"""
+    created: Dict[str, List[str]] = {}
+    for position, db_name, collection, models, target in _index_plan():
+        try:
+            _record_created(created, position, target, get_db(db_name)[collection].create_indexes(models))
+        except Exception as e:
+            logger.error(f"Error creating indexes for {target}: {str(e)}")
+    return _record_finished(created)
+
+
+def start_index_build() -> asyncio.Task:
+    """Schedule ensure_indexes on the running loop without blocking startup"""
+    return asyncio.create_task(ensure_indexes())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    result = ensure_indexes_sync()
+    sys.exit(0 if len(result) == len(INDEX_REGISTRY) else 1)
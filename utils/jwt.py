@@ -51,20 +51,21 @@ def create_access_token(
     except Exception as e:
         raise ValueError(f"Failed to create token: {str(e)}")
 
-def create_refresh_token(subject: str) -> str:
+def create_refresh_token(subject: str, claims: Optional[Dict[str, Any]] = None) -> str:
     if not subject:
         raise ValueError("Subject is required for refresh token")
     
     now = datetime.now(timezone.utc)
     expire = now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     
-    to_encode = {
+    to_encode = dict(claims or {})
+    to_encode.update({
         "exp": expire,
         "iat": now,
         "nbf": now,
         "sub": subject,
         "type": "refresh"
-    }
+    })
     
     try:
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
@@ -0,0 +1,54 @@
+import bisect
+import threading
+from typing import Any, Dict, Sequence
+
+DEFAULT_LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    """Cumulative fixed-bucket latency histogram, values in milliseconds"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS_MS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        index = bisect.bisect_left(self.buckets, value_ms)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total_ms += value_ms
+            self.max_ms = max(self.max_ms, value_ms)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = q * self.count
+            seen = 0
+            for bound, count in zip(self.buckets, self._counts):
+                seen += count
+                if seen >= rank:
+                    return float(bound)
+            return self.max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts)
+            count, total, maximum = self.count, self.total_ms, self.max_ms
+        buckets = {f"le_{bound}": sum(counts[: i + 1]) for i, bound in enumerate(self.buckets)}
+        buckets["le_inf"] = count
+        return {
+            "count": count,
+            "avg_ms": round(total / count, 3) if count else 0.0,
+            "max_ms": round(maximum, 3),
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": buckets,
+        }
@@ -0,0 +1,132 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, status
+from pymongo import ASCENDING, DESCENDING
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TEXT_SCORE_FIELD = "score"
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "$date" in value:
+            return datetime.fromisoformat(value["$date"])
+        if "$oid" in value:
+            return ObjectId(value["$oid"])
+    return value
+
+
+def encode_cursor(doc: Dict[str, Any], sort_field: str = "_id") -> str:
+    """Build an opaque cursor pointing just after the given document"""
+    payload = {"f": sort_field, "id": str(doc["_id"])}
+    if sort_field != "_id":
+        payload["v"] = _encode_value(doc.get(sort_field))
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_field: str = "_id") -> Tuple[Any, ObjectId]:
+    """Return the (sort value, _id) pair stored in a cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if payload.get("f") != sort_field:
+            raise ValueError("cursor was issued for a different sort order")
+        return _decode_value(payload.get("v")), ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, InvalidId, binascii.Error, UnicodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def keyset_filter(sort_field: str, direction: int, cursor: str) -> Dict[str, Any]:
+    """Filter matching the documents that come after the cursor in (sort_field, _id) order"""
+    value, last_id = decode_cursor(cursor, sort_field)
+    op = "$gt" if direction == ASCENDING else "$lt"
+    if sort_field == "_id":
+        return {"_id": {op: last_id}}
+    # Missing/null values sort before everything else in MongoDB
+    if value is None:
+        if direction == ASCENDING:
+            return {"$or": [{sort_field: None, "_id": {op: last_id}}, {sort_field: {"$ne": None}}]}
+        return {sort_field: None, "_id": {op: last_id}}
+    clauses = [{sort_field: {op: value}}, {sort_field: value, "_id": {op: last_id}}]
+    if direction == DESCENDING:
+        clauses.append({sort_field: None})
+    return {"$or": clauses}
+
+
+def keyset_sort(sort_field: str, direction: int) -> List[Tuple[str, int]]:
+    if sort_field == "_id":
+        return [("_id", direction)]
+    return [(sort_field, direction), ("_id", direction)]
+
+
+async def fetch_page(
+    collection,
+    query: Dict[str, Any],
+    sort_field: str = "_id",
+    direction: int = ASCENDING,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Fetch one page ordered by (sort_field, _id) and the cursor for the next one.
+
+    When a cursor is given the page starts right after it and offset is
+    ignored; offset is only honoured for callers that have not moved to
+    cursors yet.
+    """
+    if cursor:
+        after = keyset_filter(sort_field, direction, cursor)
+        query = {"$and": [query, after]} if query else after
+    find_cursor = collection.find(query).sort(keyset_sort(sort_field, direction))
+    if offset and not cursor:
+        find_cursor = find_cursor.skip(offset)
+    docs = await find_cursor.limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort_field)
+    return docs, next_cursor
+
+
+async def fetch_text_page(
+    collection,
+    query: Dict[str, Any],
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """fetch_page for a query containing $text, ordered by (textScore, _id) descending.
+
+    The score is only available inside the query, so the page is read with an
+    aggregation that exposes it as a field the keyset filter can compare.
+    """
+    pipeline: List[Dict[str, Any]] = [
+        {"$match": query},
+        {"$addFields": {TEXT_SCORE_FIELD: {"$meta": "textScore"}}},
+    ]
+    if cursor:
+        pipeline.append({"$match": keyset_filter(TEXT_SCORE_FIELD, DESCENDING, cursor)})
+    pipeline.append({"$sort": {TEXT_SCORE_FIELD: DESCENDING, "_id": DESCENDING}})
+    if offset and not cursor:
+        pipeline.append({"$skip": offset})
+    pipeline.append({"$limit": limit + 1})
+    docs = await collection.aggregate(pipeline).to_list(limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], TEXT_SCORE_FIELD)
+    return docs, next_cursor
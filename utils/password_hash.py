@@ -1,10 +1,143 @@
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
 import bcrypt
+from fastapi import HTTPException, status
 
-def hash_password(password: str) -> str:
+from utils.metrics import LatencyHistogram
+
+logger = logging.getLogger("employee_app")
+
+PASSWORD_POOL_SIZE = int(os.getenv("PASSWORD_POOL_SIZE", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", "32"))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", "0"))
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 16
+
+_rounds = BCRYPT_ROUNDS
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_in_flight = 0
+_rejected = 0
+hash_latency = LatencyHistogram()
+verify_latency = LatencyHistogram()
+
+
+def hash_password(password: str, rounds: Optional[int] = None) -> str:
     """Hash a password using bcrypt"""
-    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds or _rounds))
     return hashed.decode('utf-8')
 
 def verify_password(password: str, hashed: str) -> bool:
     """Verify a password against its hash using bcrypt"""
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+def _timed_hash(rounds: int) -> float:
+    started = time.perf_counter()
+    bcrypt.hashpw(b"calibration-password", bcrypt.gensalt(rounds))
+    return (time.perf_counter() - started) * 1000.0
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if PASSWORD_POOL_SIZE <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Workers are spawned, not forked: by now the Mongo client has
+                # started its monitor threads, which a forked child would inherit
+                # in whatever state they were in
+                _pool = ProcessPoolExecutor(
+                    max_workers=PASSWORD_POOL_SIZE,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+async def _run(histogram: LatencyHistogram, fn, *args):
+    """Run fn in the password pool, shedding load once the queue is full"""
+    global _in_flight, _rejected
+    if _in_flight >= max(PASSWORD_POOL_SIZE, 1) + PASSWORD_QUEUE_LIMIT:
+        _rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password operations in progress, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    _in_flight += 1
+    started = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_pool(), fn, *args)
+    finally:
+        _in_flight -= 1
+        histogram.observe((time.perf_counter() - started) * 1000.0)
+
+
+async def hash_password_async(password: str, rounds: Optional[int] = None) -> str:
+    """hash_password on the bounded password pool"""
+    return await _run(hash_latency, hash_password, password, rounds or _rounds)
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    """verify_password on the bounded password pool"""
+    return await _run(verify_latency, verify_password, password, hashed)
+
+
+async def calibrate_rounds(target_ms: float) -> int:
+    """Pick the bcrypt cost whose hash time on this host is closest to target_ms without exceeding it.
+
+    Every extra round doubles the work, so one timing at the minimum cost is
+    enough to extrapolate.
+    """
+    global _rounds
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(_get_pool(), _timed_hash, 4)
+    measured = await loop.run_in_executor(_get_pool(), _timed_hash, BCRYPT_MIN_ROUNDS)
+    rounds = BCRYPT_MIN_ROUNDS
+    if measured > 0 and target_ms > measured:
+        rounds += int(math.floor(math.log2(target_ms / measured)))
+    _rounds = max(BCRYPT_MIN_ROUNDS, min(BCRYPT_MAX_ROUNDS, rounds))
+    logger.info(
+        "bcrypt calibrated to %s rounds (%.1f ms at %s rounds, target %.1f ms)",
+        _rounds, measured, BCRYPT_MIN_ROUNDS, target_ms,
+    )
+    return _rounds
+
+
+async def start_password_pool() -> None:
+    """Create the pool at startup and calibrate the cost factor when BCRYPT_TARGET_MS is set"""
+    _get_pool()
+    if BCRYPT_TARGET_MS > 0:
+        try:
+            await calibrate_rounds(BCRYPT_TARGET_MS)
+        except Exception as e:
+            logger.error(f"bcrypt calibration failed, keeping {_rounds} rounds: {str(e)}")
+
+
+def stop_password_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def password_pool_stats() -> Dict[str, Any]:
+    return {
+        "pool_size": PASSWORD_POOL_SIZE,
+        "queue_limit": PASSWORD_QUEUE_LIMIT,
+        "in_flight": _in_flight,
+        "rejected": _rejected,
+        "rounds": _rounds,
+        "hash": hash_latency.snapshot(),
+        "verify": verify_latency.snapshot(),
+    }
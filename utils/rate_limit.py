@@ -0,0 +1,113 @@
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+from pymongo import ReturnDocument
+
+from utils.db import get_async_db
+
+logger = logging.getLogger("employee_app")
+
+
+class WindowStoreFull(Exception):
+    """A window store at capacity could not start counting a new key"""
+
+
+class MemoryWindowStore:
+    """Per-process window counters, the default when workers do not need to share state.
+
+    Counters are grouped by window so expired windows are dropped whole. Only
+    the current and previous window are kept. At max_keys a new key evicts the
+    oldest key of the previous window, which only still weighs in on the
+    estimate; when every key belongs to the current window the new key is
+    refused and the limiter lets it through uncounted.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._windows: Dict[Tuple[float, int], Dict[str, int]] = {}
+        self._size = 0
+
+    def _expire(self, window: int, window_seconds: float) -> None:
+        for entry in [entry for entry in self._windows if entry[0] == window_seconds and entry[1] < window - 1]:
+            self._size -= len(self._windows.pop(entry))
+
+    def _evict_previous(self, window: int, window_seconds: float) -> None:
+        previous = self._windows.get((window_seconds, window - 1))
+        if not previous:
+            raise WindowStoreFull(f"{self._size} keys in the current window")
+        del previous[next(iter(previous))]
+        self._size -= 1
+
+    async def hit(self, key: str, window: int, window_seconds: float) -> Tuple[int, int]:
+        self._expire(window, window_seconds)
+        counts = self._windows.setdefault((window_seconds, window), {})
+        previous = self._windows.get((window_seconds, window - 1), {}).get(key, 0)
+        if key not in counts:
+            if self._size >= self.max_keys:
+                self._evict_previous(window, window_seconds)
+            self._size += 1
+        counts[key] = counts.get(key, 0) + 1
+        return previous, counts[key]
+
+
+class MongoWindowStore:
+    """Window counters shared by every worker through a collection with a TTL index on expires_at"""
+
+    def __init__(self, collection_name: str = "login_attempts", db_name: str = "employee_db"):
+        self.collection_name = collection_name
+        self.db_name = db_name
+
+    async def hit(self, key: str, window: int, window_seconds: float) -> Tuple[int, int]:
+        collection = get_async_db(self.db_name)[self.collection_name]
+        doc = await collection.find_one_and_update(
+            {"_id": f"{key}|{window}"},
+            {
+                "$inc": {"count": 1},
+                "$setOnInsert": {"key": key, "expires_at": datetime.utcnow() + timedelta(seconds=2 * window_seconds)},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        previous = await collection.find_one({"_id": f"{key}|{window - 1}"}, {"count": 1})
+        return (previous or {}).get("count", 0), doc["count"]
+
+
+class SlidingWindowLimiter:
+    """Sliding-window counter: the previous window's count is weighted by how much of it still overlaps"""
+
+    def __init__(self, limit: int, window_seconds: float, store):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.store = store
+        self.rejected = 0
+
+    async def hit(self, key: str) -> Tuple[bool, float]:
+        """Record one attempt for key and return (allowed, seconds until the next attempt may pass)"""
+        if self.limit <= 0:
+            return True, 0.0
+        now = time.time()
+        window = int(now // self.window_seconds)
+        elapsed = (now % self.window_seconds) / self.window_seconds
+        try:
+            previous, current = await self.store.hit(key, window, self.window_seconds)
+        except WindowStoreFull as e:
+            # Fail open for the untracked key: a store filled by one client must
+            # not turn into a lockout of everyone else. Counters already in the
+            # store, including the flooding client's own, keep applying.
+            logger.warning(f"Rate limit store full, not counting {key}: {str(e)}")
+            return True, 0.0
+        except Exception as e:
+            # Fail open: an unavailable counter store must not lock everyone out
+            logger.error(f"Rate limit store error for {key}: {str(e)}")
+            return True, 0.0
+        estimated = previous * (1 - elapsed) + current
+        if estimated <= self.limit:
+            return True, 0.0
+        self.rejected += 1
+        retry_after = (1 - elapsed) * self.window_seconds
+        if previous and current <= self.limit:
+            # Over only because of the previous window, which keeps sliding out
+            retry_after = min(retry_after, (estimated - self.limit) / previous * self.window_seconds)
+        return False, max(1.0, math.ceil(retry_after))
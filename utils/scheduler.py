@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from pymongo.errors import DuplicateKeyError
+
+from utils.db import get_async_db
+
+logger = logging.getLogger("employee_app")
+
+MAINTENANCE_ENABLED = os.getenv("MAINTENANCE_ENABLED", "1") == "1"
+# Longest a run may hold its job before another worker may assume it died
+MAINTENANCE_LEASE_SECONDS = float(os.getenv("MAINTENANCE_LEASE_SECONDS", "900"))
+MAINTENANCE_LOCKS_COLLECTION = "maintenance_locks"
+
+
+class MaintenanceLease:
+    """Per-job lease in MongoDB so that one worker runs each job per interval.
+
+    Every worker schedules every job; the lease document records who is
+    running it (running_until) and when the next scheduled run is due
+    (next_due). Acquiring is one conditional upsert: when the conditions fail
+    on an existing lease the upsert collides on _id and the run is skipped.
+    """
+
+    def __init__(self, collection_name: str = MAINTENANCE_LOCKS_COLLECTION, db_name: str = "employee_db"):
+        self.collection_name = collection_name
+        self.db_name = db_name
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def _collection(self):
+        return get_async_db(self.db_name)[self.collection_name]
+
+    async def acquire(self, name: str, scheduled: bool) -> bool:
+        """Take the lease for one run; scheduled runs also wait until the job is due"""
+        now = datetime.utcnow()
+        query: Dict[str, Any] = {"_id": name, "running_until": {"$lte": now}}
+        if scheduled:
+            query["next_due"] = {"$lte": now}
+        try:
+            await self._collection().update_one(
+                query,
+                {"$set": {
+                    "owner": self.owner,
+                    "started_at": now,
+                    "running_until": now + timedelta(seconds=MAINTENANCE_LEASE_SECONDS),
+                }, "$setOnInsert": {"next_due": now}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def release(self, name: str, started_at: datetime, interval: float) -> None:
+        """Free the job and make the next scheduled run due one interval after this one started"""
+        update: Dict[str, Any] = {"running_until": datetime.utcnow()}
+        if interval > 0:
+            update["next_due"] = started_at + timedelta(seconds=interval)
+        await self._collection().update_one({"_id": name, "owner": self.owner}, {"$set": update})
+
+
+class MaintenanceJob:
+    """One periodic job and the outcome of its recent runs"""
+
+    def __init__(
+        self,
+        name: str,
+        interval: float,
+        func: Callable[[], Awaitable[Optional[int]]],
+        initial_delay: float = 0.0,
+        lease: Optional[MaintenanceLease] = None,
+    ):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.initial_delay = initial_delay
+        self.lease = lease
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        # Whether the latest call found the job leased by another worker
+        self.last_skipped = False
+        self.total_rows = 0
+        self.last_rows: Optional[int] = None
+        self.last_duration_ms: Optional[float] = None
+        self.max_duration_ms = 0.0
+        self.last_started_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self._lock = asyncio.Lock()
+
+    async def run(self, scheduled: bool = False) -> Optional[int]:
+        """Run the job once; concurrent calls wait for the run in progress instead of overlapping.
+
+        With a lease, the run is skipped when another worker holds the job or,
+        for scheduled runs, when it already ran during the current interval.
+        """
+        async with self._lock:
+            if self.lease is not None:
+                try:
+                    acquired = await self.lease.acquire(self.name, scheduled)
+                except Exception as e:
+                    logger.error(f"Maintenance job {self.name} could not take its lease: {str(e)}")
+                    acquired = False
+                self.last_skipped = not acquired
+                if not acquired:
+                    self.skipped += 1
+                    return None
+            try:
+                return await self._run()
+            finally:
+                if self.lease is not None:
+                    try:
+                        await self.lease.release(self.name, self.last_started_at, self.interval)
+                    except Exception as e:
+                        logger.error(f"Maintenance job {self.name} could not release its lease: {str(e)}")
+
+    async def _run(self) -> Optional[int]:
+        self.last_started_at = datetime.utcnow()
+        started = time.perf_counter()
+        try:
+            rows = await self.func()
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            logger.error(f"Maintenance job {self.name} failed: {str(e)}")
+            rows = None
+        else:
+            self.last_error = None
+        finally:
+            self.runs += 1
+            self.last_duration_ms = round((time.perf_counter() - started) * 1000.0, 3)
+            self.max_duration_ms = max(self.max_duration_ms, self.last_duration_ms)
+        if rows is not None:
+            self.last_rows = rows
+            self.total_rows += rows
+            logger.info("Maintenance job %s touched %s rows in %.1f ms", self.name, rows, self.last_duration_ms)
+        return rows
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_started_at": self.last_started_at,
+            "last_duration_ms": self.last_duration_ms,
+            "max_duration_ms": self.max_duration_ms,
+            "last_rows": self.last_rows,
+            "total_rows": self.total_rows,
+            "last_error": self.last_error,
+        }
+
+
+class MaintenanceScheduler:
+    """Runs registered jobs on fixed intervals as asyncio tasks of the application loop.
+
+    Each job sleeps for its interval after a run finishes, so a slow run delays
+    the next one instead of piling up. An interval of 0 or less registers the
+    job without scheduling it; it can still be triggered through run_now(),
+    which takes the lease too but does not wait for the job to be due.
+    """
+
+    def __init__(self, lease: Optional[MaintenanceLease] = None):
+        self.lease = lease
+        self.jobs: Dict[str, MaintenanceJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def add_job(self, name: str, interval: float, func: Callable[[], Awaitable[Optional[int]]], initial_delay: float = 0.0) -> MaintenanceJob:
+        job = MaintenanceJob(name, interval, func, initial_delay, self.lease)
+        self.jobs[name] = job
+        return job
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks.values())
+
+    async def _loop(self, job: MaintenanceJob) -> None:
+        if job.initial_delay > 0:
+            await asyncio.sleep(job.initial_delay)
+        while True:
+            await job.run(scheduled=True)
+            await asyncio.sleep(job.interval)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        for name, job in self.jobs.items():
+            if job.interval > 0:
+                self._tasks[name] = asyncio.create_task(self._loop(job))
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run_now(self, name: str) -> Optional[int]:
+        return await self.jobs[name].run()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": MAINTENANCE_ENABLED,
+            "running": self.running,
+            "jobs": {name: job.stats() for name, job in self.jobs.items()},
+        }
+
+
+# Every worker process schedules the jobs; the shared lease lets one of them run each
+maintenance_scheduler = MaintenanceScheduler(MaintenanceLease())
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Sequence
+
+logger = logging.getLogger("employee_app")
+
+THUMBNAIL_POOL_SIZE = int(os.getenv("THUMBNAIL_POOL_SIZE", "1"))
+AVATAR_THUMBNAIL_SIZES = tuple(
+    sorted(int(size) for size in os.getenv("AVATAR_THUMBNAIL_SIZES", "32,64,128").split(",") if size.strip())
+)
+AVATAR_THUMBNAIL_FORMAT = os.getenv("AVATAR_THUMBNAIL_FORMAT", "webp").lower()
+AVATAR_THUMBNAIL_QUALITY = int(os.getenv("AVATAR_THUMBNAIL_QUALITY", "80"))
+
+_EXTENSIONS = {"webp": "webp", "jpeg": "jpg", "jpg": "jpg"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def thumbnail_path(source_path: str, size: int, image_format: str = AVATAR_THUMBNAIL_FORMAT) -> str:
+    stem = os.path.splitext(source_path)[0]
+    return f"{stem}_{size}.{_EXTENSIONS.get(image_format, image_format)}"
+
+
+def render_thumbnails(source_path: str, sizes: Sequence[int], image_format: str, quality: int) -> Dict[str, str]:
+    """Write square thumbnails of source_path next to it and return {size: path}.
+
+    Runs inside the thumbnail worker process. Sizes are rendered from the
+    largest down, each one resampled from the previous rendition instead of
+    the full-size original.
+    """
+    from PIL import Image, ImageOps
+
+    pil_format = "JPEG" if image_format in ("jpeg", "jpg") else image_format.upper()
+    written: Dict[str, str] = {}
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGB" if pil_format == "JPEG" else "RGBA")
+        for size in sorted(sizes, reverse=True):
+            image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+            target = thumbnail_path(source_path, size, image_format)
+            tmp_path = f"{target}.tmp"
+            image.save(tmp_path, format=pil_format, quality=quality)
+            os.replace(tmp_path, target)
+            written[str(size)] = target
+    return written
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if THUMBNAIL_POOL_SIZE <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Spawned rather than forked so workers never inherit the Mongo
+                # client's monitor threads
+                _pool = ProcessPoolExecutor(
+                    max_workers=THUMBNAIL_POOL_SIZE,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+async def generate_thumbnails(source_path: str) -> Dict[str, str]:
+    """render_thumbnails with the configured sizes and format on the thumbnail pool"""
+    return await asyncio.get_running_loop().run_in_executor(
+        _get_pool(),
+        render_thumbnails,
+        source_path,
+        AVATAR_THUMBNAIL_SIZES,
+        AVATAR_THUMBNAIL_FORMAT,
+        AVATAR_THUMBNAIL_QUALITY,
+    )
+
+
+def start_thumbnail_pool() -> None:
+    _get_pool()
+
+
+def stop_thumbnail_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,37 @@
+from typing import Any, Dict, Optional
+from fastapi import HTTPException, status
+
+VERSION_FIELD = "version"
+
+
+def version_filter(expected: Optional[int]) -> Dict[str, Any]:
+    """Filter clause matching documents still at the expected version.
+
+    Documents written before versioning was introduced have no version field
+    and are treated as version 0.
+    """
+    if expected is None:
+        return {}
+    if expected == 0:
+        return {"$or": [{VERSION_FIELD: 0}, {VERSION_FIELD: {"$exists": False}}]}
+    return {VERSION_FIELD: expected}
+
+
+def bump_version(update: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the version increment to a classic update document"""
+    update.setdefault("$inc", {})[VERSION_FIELD] = 1
+    return update
+
+
+def next_version_expr() -> Dict[str, Any]:
+    """Aggregation expression for the incremented version in pipeline updates"""
+    return {"$add": [{"$ifNull": [f"${VERSION_FIELD}", 0]}, 1]}
+
+
+def version_conflict(expected: Optional[int], doc: Dict[str, Any]) -> None:
+    """Raise 409 when a caller-supplied version no longer matches the stored document"""
+    if expected is not None and doc.get(VERSION_FIELD, 0) != expected:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Document was modified by another request, reload and retry",
+        )